@@ -1,27 +1,153 @@
 import os
+import queue
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import customtkinter as ctk
-import whisper
-import spacy
-import nltk
-import librosa
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from pydub import AudioSegment
 import pygame
 import io
 import threading
 import time
-import hashlib
-from fpdf import FPDF
-from datetime import datetime
 import random
 import colorsys
+import bisect
+from raio_core import (
+    AudioAnalyzer,
+    SentenceStore,
+    CASE_EXTENSION,
+    EXPORT_FORMATS,
+    Tracer,
+    TranscriptionCancelled,
+    WaveformEnvelope,
+    PCM_SAMPLE_RATE,
+    decode_to_pcm,
+    open_pcm,
+    WHISPER_MODELS,
+    whisper_checkpoint_available
+)
+
+
+# Buffer do mixer do pygame, em amostras (512 amostras = 32 ms a 16 kHz)
+MIXER_BUFFER = 512
+
+
+def init_mixer():
+    """
+    Inicializa o mixer do pygame no mesmo formato do PCM decodificado. A reprodução
+    usa o mesmo PCM do Whisper (mono, 16 kHz), limitado a frequências até 8 kHz:
+    suficiente para a voz, mas sem a fidelidade do arquivo original.
+    """
+    pygame.mixer.init(
+        frequency=PCM_SAMPLE_RATE,
+        size=-16,
+        channels=1,
+        buffer=MIXER_BUFFER,
+        allowedchanges=0
+    )
+
+
+def format_duration(seconds):
+    """Duração no formato h:mm:ss (ou m:ss abaixo de uma hora)"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class PcmPlayer:
+    """
+    Reproduz trechos do PCM mapeado em memória pelo mixer do pygame.
+    O trecho é enviado ao canal em blocos curtos, convertidos para int16 à
+    medida que tocam, de modo que a memória usada não depende do tamanho
+    do trecho nem do arquivo. O primeiro bloco é bem curto e vai para o
+    mixer na própria chamada de play, para que o som comece logo após o clique.
+    """
+
+    def __init__(self, samples, sample_rate=PCM_SAMPLE_RATE, block_seconds=0.5,
+                 first_block_seconds=0.05):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.block_samples = int(block_seconds * sample_rate)
+        self.first_block_samples = int(first_block_seconds * sample_rate)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        
+        # Estimativa da latência: tempo até o primeiro bloco chegar ao mixer mais o
+        # buffer do mixer. A latência medida até o som fica na etapa playback do raio_bench
+        self.last_latency = None
+
+    def make_sound(self, start, end):
+        """Cria um Sound a partir de uma view do PCM, sem passar por WAV"""
+        block = np.clip(self.samples[start:end], -1.0, 1.0)
+        return pygame.sndarray.make_sound((block * 32767).astype(np.int16))
+
+    def play(self, start_time=0.0, end_time=None, on_finish=None):
+        """Interrompe a reprodução atual e toca o trecho [start_time, end_time)"""
+        requested = time.perf_counter()
+        self.stop()
+        start = max(0, int(start_time * self.sample_rate))
+        end = len(self.samples)
+        if end_time is not None:
+            end = min(end, int(end_time * self.sample_rate))
+        if end <= start:
+            if on_finish:
+                on_finish()
+            return
+        
+        # O primeiro bloco é enviado ao mixer já nesta chamada
+        first_end = min(start + self.first_block_samples, end)
+        stop_event = threading.Event()
+        with self.lock:
+            self.stop_event = stop_event
+            pygame.mixer.Channel(0).play(self.make_sound(start, first_end))
+        
+        self.last_latency = time.perf_counter() - requested + MIXER_BUFFER / self.sample_rate
+        
+        threading.Thread(
+            target=self.stream,
+            args=(first_end, end, stop_event, on_finish),
+            daemon=True
+        ).start()
+
+    def stream(self, start, end, stop_event, on_finish):
+        """Envia os blocos ao canal do mixer, mantendo sempre um bloco na fila"""
+        channel = pygame.mixer.Channel(0)
+        try:
+            for pos in range(start, end, self.block_samples):
+                sound = self.make_sound(pos, min(pos + self.block_samples, end))
+                while not stop_event.is_set():
+                    with self.lock:
+                        if stop_event.is_set():
+                            break
+                        if not channel.get_busy():
+                            channel.play(sound)
+                            break
+                        if channel.get_queue() is None:
+                            channel.queue(sound)
+                            break
+                    time.sleep(0.01)
+                if stop_event.is_set():
+                    return
+            
+            # Aguarda o último bloco terminar
+            while channel.get_busy() and not stop_event.is_set():
+                time.sleep(0.01)
+        except Exception as e:
+            print(f"Error playing audio: {e}")
+        finally:
+            # Só avisa o fim natural; uma reprodução interrompida não chama on_finish
+            if on_finish and not stop_event.is_set():
+                on_finish()
+
+    def stop(self):
+        with self.lock:
+            self.stop_event.set()
+            pygame.mixer.Channel(0).stop()
+
 
 class ProgressWindow(ctk.CTkToplevel):
-    def __init__(self, parent):
+    def __init__(self, parent, on_cancel=None):
         super().__init__(parent)
         self.title("Processando...")
         
@@ -55,78 +181,396 @@ class ProgressWindow(ctk.CTkToplevel):
         self.progress_bar.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="ew")
         self.progress_bar.set(0)
         
+        # Botão de cancelar, quando a operação pode ser interrompida
+        self.cancel_button = None
+        if on_cancel is not None:
+            self.geometry(f'{window_width}x{window_height + 40}+{center_x}+{center_y}')
+            self.cancel_button = ctk.CTkButton(main_frame, text="Cancelar", command=on_cancel)
+            self.cancel_button.grid(row=2, column=0, padx=10, pady=(0, 10))
+        
         # Configura a janela
         self.transient(parent)
         self.grab_set()
-        self.protocol("WM_DELETE_WINDOW", lambda: None)  # Desabilita o botão de fechar
+        # Sem cancelamento, o botão de fechar fica desabilitado
+        self.protocol("WM_DELETE_WINDOW", on_cancel or (lambda: None))
         
     def update_progress(self, value, status):
         self.progress_bar.set(value)
         self.status_label.configure(text=status)
-        self.update()
+        self.update_idletasks()
+        
+    def disable_cancel(self, status=None):
+        """Desabilita o cancelamento (pedido já feito ou etapa que não pode ser interrompida)"""
+        if self.cancel_button is not None:
+            self.cancel_button.configure(state="disabled")
+        self.protocol("WM_DELETE_WINDOW", lambda: None)
+        if status:
+            self.status_label.configure(text=status)
+        
+    def show_summary(self, summary):
+        """Mostra o resumo do rastreamento e deixa a janela ser fechada pelo usuário"""
+        self.title("Desempenho")
+        self.geometry("560x360")
+        main_frame = self.status_label.master
+        if self.cancel_button is not None:
+            self.cancel_button.grid_forget()
+        main_frame.grid_rowconfigure(2, weight=1)
+        
+        summary_text = ctk.CTkTextbox(main_frame, wrap="none", height=200)
+        summary_text.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        summary_text.insert("1.0", summary)
+        summary_text.configure(state="disabled")
+        
+        close_button = ctk.CTkButton(main_frame, text="Fechar", command=self.destroy)
+        close_button.grid(row=3, column=0, padx=10, pady=(0, 10))
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+class SearchWindow(ctk.CTkToplevel):
+    """
+    Busca em todas as gravações já analisadas (índice de busca do AudioAnalyzer).
+    A busca roda em uma thread; clicar em um resultado reproduz o trecho.
+    """
+
+    # Rótulo exibido -> modo de SearchIndex.search
+    MODES = {
+        "Palavras": "keywords",
+        "Frase exata": "phrase",
+        "Proximidade": "near",
+        "Semântica": "semantic"
+    }
+
+    def __init__(self, app):
+        super().__init__(app.root)
+        self.app = app
+        self.title("Buscar nas Gravações")
+        self.geometry("700x500")
+        self.searching = False
+        
+        # Consulta, modo e filtro pelos temas marcados
+        query_frame = ctk.CTkFrame(self)
+        query_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        self.query_entry = ctk.CTkEntry(query_frame, placeholder_text="Ex.: pistola dinheiro")
+        self.query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.query_entry.bind("<Return>", lambda event: self.search())
+        
+        self.mode_menu = ctk.CTkOptionMenu(query_frame, values=list(self.MODES), width=130)
+        self.mode_menu.pack(side=tk.LEFT, padx=5)
+        
+        self.search_button = ctk.CTkButton(query_frame, text="Buscar", width=80, command=self.search)
+        self.search_button.pack(side=tk.LEFT, padx=5)
+        
+        self.topics_only = tk.BooleanVar(value=False)
+        topics_checkbox = ctk.CTkCheckBox(
+            self,
+            text="Somente sentenças com os temas marcados",
+            variable=self.topics_only,
+            text_color="white"
+        )
+        topics_checkbox.pack(anchor=tk.W, padx=15)
+        
+        self.status_label = ctk.CTkLabel(self, text="", text_color="gray")
+        self.status_label.pack(anchor=tk.W, padx=15, pady=5)
+        
+        # Resultados: um botão por trecho encontrado
+        self.results_frame = ctk.CTkScrollableFrame(self)
+        self.results_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.result_buttons = []
+        
+        self.query_entry.focus_set()
+
+    def search(self):
+        """Lê a consulta na thread do Tk e executa a busca em segundo plano"""
+        query = self.query_entry.get().strip()
+        if self.searching or not query:
+            return
+        mode = self.MODES[self.mode_menu.get()]
+        topics = None
+        if self.topics_only.get():
+            topics, _ = self.app.get_topic_filter()
+        
+        self.searching = True
+        self.search_button.configure(state="disabled")
+        if mode == "semantic" and not self.app.models_ready.is_set():
+            # A busca semântica precisa do spaCy para o vetor da consulta
+            self.app.start_loading_models()
+            self.status_label.configure(text="Carregando modelos...")
+        else:
+            self.status_label.configure(text="Buscando...")
+        
+        def run():
+            started = time.perf_counter()
+            try:
+                if mode == "semantic":
+                    self.app.wait_for_models()
+                hits = self.app.search_recordings(query, mode, topics)
+                error = None
+            except Exception as e:
+                hits, error = [], str(e)
+            elapsed = time.perf_counter() - started
+            self.after(0, lambda: self.show_results(hits, elapsed, error))
+        
+        threading.Thread(target=run, daemon=True).start()
+
+    def show_results(self, hits, elapsed, error=None):
+        self.searching = False
+        self.search_button.configure(state="normal")
+        if error is not None:
+            self.status_label.configure(text=f"Erro na busca: {error}")
+            return
+        self.status_label.configure(
+            text=f"{len(hits)} resultado(s) em {elapsed * 1000:.0f} ms "
+                 f"({len(self.app.search_index)} gravação(ões) indexada(s))"
+        )
+        
+        for button in self.result_buttons:
+            button.destroy()
+        self.result_buttons = []
+        for hit in hits:
+            text = f"{os.path.basename(hit['file'])}  [{format_duration(hit['start'])}]  {hit['text']}"
+            button = ctk.CTkButton(
+                self.results_frame,
+                text=text if len(text) <= 110 else text[:107] + "...",
+                anchor="w",
+                fg_color="transparent",
+                border_width=1,
+                command=lambda hit=hit: self.app.open_search_hit(hit)
+            )
+            button.pack(fill=tk.X, padx=5, pady=2)
+            self.result_buttons.append(button)
+
+
+class TranscriptRow(ctk.CTkFrame):
+    """Linha reutilizável da transcrição: botão de reprodução, texto e temas"""
+
+    def __init__(self, master, transcript_list):
+        super().__init__(master, height=transcript_list.ROW_HEIGHT - 4)
+        self.transcript_list = transcript_list
+        self.index = None
+        self.item_key = None
+        
+        # Botão de reprodução
+        self.play_btn = ctk.CTkButton(
+            self,
+            text="▶",
+            width=30,
+            command=self.play
+        )
+        self.play_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Frame para o texto com fundo preto
+        text_frame = ctk.CTkFrame(self, fg_color="black")
+        text_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        # Texto editável da transcrição
+        self.text_entry = ctk.CTkTextbox(
+            text_frame,
+            fg_color="black",
+            text_color="white",
+            height=60,
+            wrap=tk.WORD
+        )
+        self.text_entry.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # Labels dos temas encontrados, reaproveitados entre sentenças
+        self.topics_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.topics_frame.pack(side=tk.RIGHT, padx=5)
+        self.topic_labels = []
+
+    def play(self):
+        if self.index is not None:
+            sentences = self.transcript_list.app.processed_sentences
+            self.transcript_list.app.play_segment(
+                float(sentences.starts[self.index]),
+                float(sentences.ends[self.index])
+            )
 
-class AudioAnalyzerApp:
+    def save_edit(self):
+        """Guarda o texto editado pelo usuário antes de reutilizar a linha"""
+        if self.index is not None and self.text_entry.edit_modified():
+            self.transcript_list.edits[self.index] = self.text_entry.get("1.0", "end-1c")
+
+    def show(self, index, active_themes):
+        """Associa a linha a uma sentença, atualizando só o que mudou"""
+        item_key = (index, tuple(active_themes))
+        if item_key == self.item_key:
+            return
+        
+        app = self.transcript_list.app
+        sentences = app.processed_sentences
+        if index != self.index:
+            self.save_edit()
+            self.index = index
+            header = f"[{sentences.starts[index]:.2f}s - {sentences.ends[index]:.2f}s]"
+            speaker = sentences.speaker(index)
+            if speaker:
+                header = f"{header} {speaker}:"
+            text = self.transcript_list.edits.get(index, f"{header} {sentences.texts[index]}")
+            self.text_entry.delete("1.0", tk.END)
+            self.text_entry.insert("1.0", text)
+            self.text_entry.edit_modified(False)
+        
+        for label in self.topic_labels:
+            label.pack_forget()
+        for i, topic in enumerate(active_themes):
+            if i == len(self.topic_labels):
+                self.topic_labels.append(ctk.CTkLabel(
+                    self.topics_frame,
+                    text_color="white",
+                    corner_radius=6,
+                    padx=6,
+                    pady=2
+                ))
+            self.topic_labels[i].configure(text=topic, fg_color=app.topic_colors[topic])
+            self.topic_labels[i].pack(side=tk.LEFT, padx=2)
+        self.item_key = item_key
+
+
+class VirtualTranscriptList(ctk.CTkFrame):
+    """
+    Lista virtualizada da transcrição.
+    Só existem widgets para as linhas visíveis na área de rolagem; ao rolar,
+    as mesmas linhas são reposicionadas e associadas a outras sentenças. Mudanças
+    de filtro apenas trocam a lista de itens exibidos, sem recriar widgets.
+    """
+
+    ROW_HEIGHT = 80
+
+    def __init__(self, master, app, **kwargs):
+        super().__init__(master, **kwargs)
+        self.app = app
+        self.items = []  # Índices das sentenças exibidas, em ordem crescente
+        self.selected_topics = []  # Temas cujas etiquetas aparecem nas linhas
+        self.edits = {}  # Textos editados pelo usuário, por índice da sentença
+        self.rows = []
+        self.offset = 0
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.viewport.bind("<Configure>", lambda event: self.render())
+        
+        # O customtkinter não permite bind_all nos seus widgets; usa o tkinter direto
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tk.Misc.bind_all(self, sequence, self.on_mousewheel, add="+")
+
+    def clear(self):
+        for row in self.rows:
+            row.index = None
+            row.item_key = None
+        self.edits.clear()
+        self.set_items([], self.selected_topics)
+
+    def set_items(self, items, selected_topics):
+        """Troca as sentenças exibidas (ex.: após mudar o filtro de temas)"""
+        self.items = list(items)
+        self.selected_topics = selected_topics
+        self.render()
+
+    def append_item(self, index):
+        """Acrescenta uma sentença ao final da lista"""
+        self.items.append(index)
+        self.render()
+
+    def scroll_to_sentence(self, index):
+        """Rola a lista até a sentença, se ela estiver entre as exibidas"""
+        position = bisect.bisect_left(self.items, index)
+        if position < len(self.items) and self.items[position] == index:
+            self.offset = position * self.ROW_HEIGHT
+            self.render()
+
+    def viewport_height(self):
+        """Altura visível em unidades do customtkinter (sem a escala de DPI)"""
+        return int(self.viewport.winfo_height() / ctk.ScalingTracker.get_widget_scaling(self))
+
+    def render(self):
+        """Posiciona as linhas visíveis e associa cada uma à sentença correspondente"""
+        height = self.viewport_height()
+        total = len(self.items) * self.ROW_HEIGHT
+        self.offset = max(0, min(self.offset, total - height))
+        
+        first = self.offset // self.ROW_HEIGHT
+        count = min(len(self.items) - first, height // self.ROW_HEIGHT + 2)
+        while len(self.rows) < count:
+            self.rows.append(TranscriptRow(self.viewport, self))
+        
+        for i, row in enumerate(self.rows):
+            if i < count:
+                index = self.items[first + i]
+                row.show(index, self.app.processed_sentences.themes(index, self.selected_topics))
+                row.place(x=0, y=(first + i) * self.ROW_HEIGHT - self.offset, relwidth=1.0)
+            else:
+                row.place_forget()
+        
+        if total > 0:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def on_scrollbar(self, action, value, unit=None):
+        total = len(self.items) * self.ROW_HEIGHT
+        if action == "moveto":
+            self.offset = int(float(value) * total)
+        elif action == "scroll":
+            step = self.ROW_HEIGHT if unit == "units" else self.viewport_height()
+            self.offset += int(value) * step
+        self.render()
+
+    def on_mousewheel(self, event):
+        """Rola a lista quando o cursor está sobre ela"""
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self)):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.offset -= self.ROW_HEIGHT
+        else:
+            self.offset += self.ROW_HEIGHT
+        self.render()
+
+
+class AudioAnalyzerApp(AudioAnalyzer):
     def __init__(self, root):
         self.root = root
         self.root.title("RAIO - Projeto de Processamento de Áudio com IA")
         self.root.geometry("1200x800")
         
-        # Initialize Whisper model
-        self.model = whisper.load_model("medium")
+        # Modelos, caches e parâmetros da análise (compartilhados com o modo em lote);
+        # os modelos são carregados em segundo plano por load_models, só quando um
+        # áudio é aberto para análise (reabrir um caso salvo não os carrega)
+        AudioAnalyzer.__init__(self)
+        
+        # Quantização int8 opcional do Whisper na CPU
+        self.quantize_int8 = tk.BooleanVar(value=False)
+        self.models_ready = threading.Event()
+        self.models_thread = None
+        self.models_error = None
         
-        # Initialize Spacy with medium model that includes word vectors
-        self.nlp = spacy.load("pt_core_news_md")
+        # Uso do cache das transcrições, endereçado pelo hash do áudio
+        self.use_transcription_cache = tk.BooleanVar(value=True)
+        self.file_hash = None
         
-        # Similarity threshold for topic detection
-        self.similarity_threshold = 0.5
+        # Rastreamento de desempenho por etapa, gravado em ~/.raio/traces
+        self.tracing = tk.BooleanVar(value=False)
+        self.trace_path = None
+        
+        # Janela da busca entre gravações (uma de cada vez)
+        self.search_window = None
+        
+        # Fila de resultados do processamento em segundo plano
+        self.processing_queue = None
+        self.processing_thread = None
+        self.cancel_event = threading.Event()
+        
+        # Tokens da transcrição atual, reutilizados ao analisar novos temas
+        self.token_store = None
+        
+        # Resultado do Whisper e sua chave no cache, guardados no caso salvo
+        self.transcription = None
+        self.transcription_key = None
         
         # Estrutura para armazenar resultados pré-processados
-        self.processed_sentences = []  # Lista de dicionários com informações das sentenças
-        
-        # Dictionary of related words for each topic
-        self.topic_related_words = {
-            "Nenhum": [],
-            "Drogas": [
-                "cocaína", "maconha", "crack", "heroína", "tráfico",
-                "vício", "substância", "entorpecente", "dependente", "overdose"
-            ],
-            "Morte": [
-                "falecimento", "assassinato", "homicídio", "suicídio", "funeral",
-                "velório", "cemitério", "luto", "óbito", "cadáver"
-            ],
-            "Crimes Sexuais": [
-                "estupro", "abuso", "assédio", "pedofilia", "violência",
-                "exploração", "atentado", "violação", "molestamento", "agressão"
-            ],
-            "Família": [
-                "pai", "mãe", "filho", "irmão", "parente",
-                "casamento", "divórcio", "adoção", "guarda", "pensão"
-            ],
-            "Palavras Ofensivas": [
-                "merda", "porra", "caralho", "puta", "viado",
-                "buceta", "idiota", "imbecil", "babaca", "cuzão"
-            ],
-            "Violência": [
-                "agressão", "briga", "pancada", "espancamento", "soco",
-                "chute", "arma", "facada", "tiro", "ameaça"
-            ],
-            "Dinheiro": [
-                "roubo", "fraude", "propina", "suborno", "extorsão",
-                "lavagem", "desvio", "corrupção", "sonegação", "golpe"
-            ],
-            "Armas": [
-                "revólver", "pistola", "fuzil", "metralhadora", "munição",
-                "explosivo", "granada", "bomba", "armamento", "calibre"
-            ],
-            "Tráfico Humano": [
-                "escravidão", "exploração", "sequestro", "cárcere", "prostituição",
-                "aliciamento", "contrabando", "coação", "trabalho forçado", "servidão"
-            ],
-            "Discriminação": [
-                "racismo", "homofobia", "preconceito", "xenofobia", "intolerância",
-                "machismo", "segregação", "bullying", "injúria", "difamação"
-            ]
-        }
+        self.processed_sentences = SentenceStore()  # Sentenças, tempos e temas em formato colunar
         
         # Cores para cada tema sensível (tons mais escuros para a interface)
         self.topic_colors = {
@@ -143,33 +587,18 @@ class AudioAnalyzerApp:
             "Discriminação": "#B22222"  # Vermelho tijolo
         }
         
-        # Cores claras para highlight no PDF
-        self.pdf_highlight_colors = {
-            "Nenhum": "#E0E0E0",      # Cinza claro
-            "Drogas": "#FFB6C1",      # Rosa claro
-            "Morte": "#B0C4DE",       # Azul claro
-            "Crimes Sexuais": "#98FB98", # Verde claro
-            "Família": "#DDA0DD",     # Roxo claro
-            "Palavras Ofensivas": "#F0E68C", # Amarelo claro
-            "Violência": "#F08080",   # Vermelho claro
-            "Dinheiro": "#87CEEB",    # Azul céu claro
-            "Armas": "#FFA07A",       # Salmão claro
-            "Tráfico Humano": "#B0C4DE", # Azul aço claro
-            "Discriminação": "#FFA07A"  # Salmão claro
-        }
-        
-        # Download necessary NLTK data
-        nltk.download('punkt')
-        nltk.download('averaged_perceptron_tagger')
+        # Initialize pygame mixer no mesmo formato do PCM decodificado
+        init_mixer()
         
-        # Initialize pygame mixer
-        pygame.mixer.init()
+        # Áudio decodificado uma única vez em um PCM mapeado em memória,
+        # compartilhado pela forma de onda, pela reprodução e pelo Whisper
+        self.pcm_path = None
+        self.audio_samples = None
+        self.envelope = None
+        self.player = None
         
         # Audio playback variables
-        self.audio_segment = None
         self.is_playing = False
-        self.play_thread = None
-        self.stop_requested = False
         
         # Sensitive topics
         self.topics = {
@@ -208,6 +637,30 @@ class AudioAnalyzerApp:
         )
         self.select_button.pack(pady=5)
         
+        # Casos salvos: reabrem a análise sem transcrever nem carregar modelos
+        self.open_case_button = ctk.CTkButton(
+            self.controls_frame,
+            text="Abrir Caso",
+            command=self.open_case_file
+        )
+        self.open_case_button.pack(pady=5)
+        
+        self.save_case_button = ctk.CTkButton(
+            self.controls_frame,
+            text="Salvar Caso",
+            command=self.save_case_file,
+            state="disabled"
+        )
+        self.save_case_button.pack(pady=5)
+        
+        # Busca por palavras, frases ou semelhança em todas as gravações indexadas
+        self.search_button = ctk.CTkButton(
+            self.controls_frame,
+            text="Buscar nas Gravações",
+            command=self.open_search_window
+        )
+        self.search_button.pack(pady=5)
+        
         # Play/Stop button
         self.play_button = ctk.CTkButton(
             self.controls_frame,
@@ -226,6 +679,49 @@ class AudioAnalyzerApp:
         )
         self.process_button.pack(pady=5)
         
+        # Seleção do modelo do Whisper e do modo de inferência int8
+        self.model_menu = ctk.CTkOptionMenu(
+            self.controls_frame,
+            values=WHISPER_MODELS,
+            command=self.change_model
+        )
+        self.model_menu.set(self.model_name)
+        self.model_menu.pack(pady=5)
+        
+        self.int8_checkbox = ctk.CTkCheckBox(
+            self.controls_frame,
+            text="Modo int8 (CPU)",
+            variable=self.quantize_int8,
+            text_color="white"
+        )
+        self.int8_checkbox.pack(pady=5)
+        
+        # Indicador do carregamento dos modelos
+        self.models_label = ctk.CTkLabel(
+            self.controls_frame,
+            text="Modelos não carregados",
+            text_color="gray"
+        )
+        self.models_label.pack(pady=5)
+        
+        # Permite ignorar o cache e transcrever o áudio novamente
+        self.cache_checkbox = ctk.CTkCheckBox(
+            self.controls_frame,
+            text="Usar transcrição em cache",
+            variable=self.use_transcription_cache,
+            text_color="white"
+        )
+        self.cache_checkbox.pack(pady=5)
+        
+        # Checkbox do rastreamento de desempenho
+        self.tracing_checkbox = ctk.CTkCheckBox(
+            self.controls_frame,
+            text="Rastrear desempenho",
+            variable=self.tracing,
+            text_color="white"
+        )
+        self.tracing_checkbox.pack(pady=5)
+        
         # Botão para gerar relatório PDF
         self.pdf_button = ctk.CTkButton(
             self.controls_frame,
@@ -235,6 +731,15 @@ class AudioAnalyzerApp:
         )
         self.pdf_button.pack(pady=5)
         
+        # Botão para exportar a análise em JSONL e a transcrição em SRT/WebVTT
+        self.export_button = ctk.CTkButton(
+            self.controls_frame,
+            text="Exportar (JSONL/SRT/VTT)",
+            command=self.export_transcription,
+            state="disabled"
+        )
+        self.export_button.pack(pady=5)
+        
         # Create topics frame
         self.topics_frame = ctk.CTkFrame(self.controls_frame)
         self.topics_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -249,15 +754,7 @@ class AudioAnalyzerApp:
         
         # Add checkboxes for each topic
         for topic in sorted(self.topics.keys()):
-            checkbox = ctk.CTkCheckBox(
-                self.topics_frame,
-                text=topic,
-                variable=self.topics[topic],
-                command=self.filter_transcription,
-                fg_color=self.topic_colors[topic],
-                text_color="white"
-            )
-            checkbox.pack(anchor=tk.W, padx=5, pady=2)
+            self.add_topic_checkbox(topic)
         
         # Add topic button
         add_topic_button = ctk.CTkButton(
@@ -272,20 +769,17 @@ class AudioAnalyzerApp:
         self.right_panel = ctk.CTkFrame(self.main_frame)
         self.right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # Waveform plot
-        self.fig, self.ax = plt.subplots(figsize=(8, 3))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.right_panel)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # Waveform plot (o matplotlib só é carregado ao abrir o primeiro arquivo)
+        self.waveform_frame = ctk.CTkFrame(self.right_panel, height=300)
+        self.waveform_frame.pack(fill=tk.BOTH, expand=True)
+        self.canvas = None
         
         # Frame para a transcrição com scrollbar
         transcription_label = ctk.CTkLabel(self.right_panel, text="Transcrição:")
         transcription_label.pack(pady=5)
         
-        self.transcription_frame = ctk.CTkScrollableFrame(self.right_panel, height=200)
-        self.transcription_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        self.transcription_text = ctk.CTkFrame(self.transcription_frame)
-        self.transcription_text.pack(fill=tk.BOTH, expand=True)
+        self.transcription_list = VirtualTranscriptList(self.right_panel, self, height=200)
+        self.transcription_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Frame para os resultados da busca com scrollbar
         results_label = ctk.CTkLabel(self.right_panel, text="Temas Sensíveis Detectados:")
@@ -297,44 +791,162 @@ class AudioAnalyzerApp:
         self.matches_text = ctk.CTkTextbox(self.results_frame, wrap=tk.WORD)
         self.matches_text.pack(fill=tk.BOTH, expand=True)
 
+    def add_topic_checkbox(self, topic):
+        """Cria o checkbox de filtro de um tema, na cor do tema"""
+        checkbox = ctk.CTkCheckBox(
+            self.topics_frame,
+            text=topic,
+            variable=self.topics[topic],
+            command=self.filter_transcription,
+            fg_color=self.topic_colors[topic],
+            text_color="white"
+        )
+        checkbox.pack(anchor=tk.W, padx=5, pady=2)
+    
     def select_file(self):
-        self.filename = filedialog.askopenfilename(
+        filename = filedialog.askopenfilename(
             filetypes=[("Audio Files", "*.mp3 *.wav *.ogg")]
         )
-        if self.filename:
-            self.load_audio_visualization()
-            self.load_audio_playback()
-            self.play_button.configure(state="normal")
-            self.process_button.configure(state="normal")
+        if filename:
+            self.open_audio_file(filename)
     
+    def open_audio_file(self, filename):
+        """Abre um áudio: decodificação, forma de onda e reprodução. Retorna True se deu certo"""
+        self.filename = filename
+        # Os modelos carregam em segundo plano enquanto o áudio é decodificado
+        self.start_loading_models()
+        try:
+            self.load_audio_samples()
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao carregar o áudio: {str(e)}")
+            return False
+        self.load_audio_visualization()
+        self.load_audio_playback()
+        self.play_button.configure(state="normal")
+        self.process_button.configure(state="normal")
+        return True
+    
+    def load_audio_samples(self):
+        """Decodifica o arquivo (uma única vez por conteúdo) e mapeia o PCM em memória"""
+        self.stop_playback()
+        self.file_hash, self.pcm_path, self.audio_samples = self.prepare_audio(self.filename)
+    
+    def start_loading_models(self):
+        """Inicia o carregamento dos modelos em segundo plano (uma única vez)"""
+        if self.models_thread is not None:
+            return
+        self.models_label.configure(text="Carregando modelos...", text_color="gray")
+        self.models_thread = threading.Thread(
+            target=self.load_models,
+            args=(self.quantize_int8.get(),),
+            daemon=True
+        )
+        self.models_thread.start()
+        self.root.after(200, self.check_models_ready)
+
+    def load_models(self, quantize_int8):
+        """
+        Carrega os modelos em segundo plano, sem acessar a rede.
+        O Whisper só é carregado aqui se já estiver em disco; caso contrário,
+        fica para a primeira transcrição.
+        """
+        try:
+            self.load_nlp()
+            
+            # No modo paralelo cada processo do pool carrega o próprio modelo
+            if self.transcription_workers == 1 and whisper_checkpoint_available(self.model_name):
+                self.load_whisper_model(self.model_name, quantize_int8)
+        except Exception as e:
+            self.models_error = e
+        finally:
+            self.models_ready.set()
+
+    def change_model(self, model_name):
+        """Seleciona outro modelo do Whisper; ele é carregado na próxima transcrição"""
+        self.model_name = model_name
+
+    def check_models_ready(self):
+        """Atualiza o indicador de carregamento dos modelos na thread do Tk"""
+        if not self.models_ready.is_set():
+            self.root.after(200, self.check_models_ready)
+        elif self.models_error is not None:
+            self.models_label.configure(text="Erro ao carregar modelos", text_color="red")
+        else:
+            self.models_label.configure(text="Modelos prontos", text_color="green")
+
+    def wait_for_models(self, results=None):
+        """Bloqueia a thread de processamento até os modelos estarem carregados"""
+        if not self.models_ready.is_set() and results is not None:
+            results.put(("progress", 0, "Aguardando carregamento dos modelos..."))
+        self.models_ready.wait()
+        if self.models_error is not None:
+            raise RuntimeError(f"Falha ao carregar os modelos: {self.models_error}")
+
+    def create_waveform_canvas(self):
+        """Cria a figura do matplotlib na primeira visualização de áudio"""
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        self.fig, self.ax = plt.subplots(figsize=(8, 3))
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.waveform_frame)
+        
+        # Barra de ferramentas com zoom e deslocamento da forma de onda
+        self.waveform_toolbar = NavigationToolbar2Tk(
+            self.canvas,
+            self.waveform_frame,
+            pack_toolbar=False
+        )
+        self.waveform_toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # Um clique na forma de onda reproduz a partir daquele instante
+        self.canvas.mpl_connect('button_press_event', self.on_waveform_click)
+
     def load_audio_visualization(self):
-        # Load audio file
-        y, sr = librosa.load(self.filename)
+        if self.canvas is None:
+            self.create_waveform_canvas()
+        
+        # Envelope min/max em vários níveis, salvo ao lado do PCM decodificado
+        self.envelope = WaveformEnvelope.load_or_build(
+            self.audio_samples,
+            PCM_SAMPLE_RATE,
+            os.path.splitext(self.pcm_path)[0] + ".env.npy"
+        )
+        self.draw_waveform()
+    
+    def draw_waveform(self):
+        """Desenha a forma de onda a partir do envelope (com ou sem o PCM carregado)"""
+        if self.canvas is None:
+            self.create_waveform_canvas()
         
         # Clear previous plot
         self.ax.clear()
         
         # Plot waveform
-        self.ax.plot(np.linspace(0, len(y)/sr, len(y)), y)
+        self.waveform_line, = self.ax.plot([], [], linewidth=0.5)
+        self.ax.set_xlim(0, max(self.envelope.n_samples / PCM_SAMPLE_RATE, 1e-3))
+        self.ax.set_ylim(-1.0, 1.0)
         self.ax.set_xlabel('Time (s)')
         self.ax.set_ylabel('Amplitude')
         self.ax.set_title('Waveform')
         
+        # Zoom e deslocamento carregam o nível de detalhe adequado
+        self.ax.callbacks.connect('xlim_changed', self.update_waveform_view)
+        self.update_waveform_view(self.ax)
+        
         # Update canvas
         self.canvas.draw()
     
+    def update_waveform_view(self, ax):
+        """Redesenha a forma de onda do intervalo visível com ~1 ponto por pixel"""
+        start_time, end_time = ax.get_xlim()
+        pixels = int(ax.get_window_extent().width) or 1000
+        x, y = self.envelope.query(self.audio_samples, start_time, end_time, pixels)
+        self.waveform_line.set_data(x, y)
+        self.canvas.draw_idle()
+    
     def load_audio_playback(self):
-        """Load audio file for playback"""
-        try:
-            # Convert audio to WAV format using pydub
-            self.audio_segment = AudioSegment.from_file(self.filename)
-            wav_data = self.audio_segment.export(format="wav")
-            
-            # Load the audio data into pygame
-            pygame.mixer.music.load(wav_data)
-        except Exception as e:
-            print(f"Error loading audio: {e}")
-            self.audio_segment = None
+        """Prepara a reprodução a partir do PCM mapeado em memória"""
+        self.player = PcmPlayer(self.audio_samples)
     
     def toggle_playback(self):
         """Toggle between play and stop"""
@@ -347,42 +959,48 @@ class AudioAnalyzerApp:
     
     def start_playback(self):
         """Start audio playback"""
-        if not self.audio_segment or self.is_playing:
+        if self.player is None or self.is_playing:
             return
             
         self.is_playing = True
-        self.stop_requested = False
         
-        # Start playback in a separate thread
-        self.play_thread = threading.Thread(target=self.play_audio)
-        self.play_thread.daemon = True
-        self.play_thread.start()
+        # A reprodução roda em uma thread do player
+        self.player.play(on_finish=self.on_playback_finished)
+    
+    def play_from(self, start_time):
+        """Reproduz a gravação a partir de um instante qualquer"""
+        if self.player is None:
+            return
+        self.stop_playback()
+        self.is_playing = True
+        self.play_button.configure(text="⏹ Parar")
+        self.player.play(start_time, on_finish=self.on_playback_finished)
+    
+    def on_waveform_click(self, event):
+        """Clique na forma de onda (fora dos modos de zoom/deslocamento)"""
+        if event.inaxes is self.ax and event.xdata is not None and not self.waveform_toolbar.mode:
+            self.play_from(max(0.0, event.xdata))
+            
+            # Mostra na transcrição a sentença do instante clicado
+            index = self.processed_sentences.find_at(event.xdata)
+            if index is not None:
+                self.transcription_list.scroll_to_sentence(index)
     
     def stop_playback(self):
         """Stop audio playback"""
         if self.is_playing:
-            pygame.mixer.music.stop()
-            self.stop_requested = True
+            self.player.stop()
             self.is_playing = False
+            self.play_button.configure(text="▶ Reproduzir")
     
-    def play_audio(self):
-        """Play audio in a separate thread"""
-        try:
-            pygame.mixer.music.play()
-            
-            # Monitor playback status
-            while pygame.mixer.music.get_busy() and not self.stop_requested:
-                pygame.time.Clock().tick(10)
-            
-        except Exception as e:
-            print(f"Error playing audio: {e}")
-        finally:
-            self.is_playing = False
-            self.root.after(0, lambda: self.play_button.configure(text="▶ Reproduzir"))
+    def on_playback_finished(self):
+        """Chamado pela thread do player ao fim da reprodução completa"""
+        self.is_playing = False
+        self.root.after(0, lambda: self.play_button.configure(text="▶ Reproduzir"))
     
     def add_custom_topic(self):
         """Add a custom sensitive topic"""
-        if not hasattr(self, 'processed_sentences'):
+        if self.token_store is None:
             messagebox.showerror("Erro", "Por favor, processe um áudio primeiro.")
             return
             
@@ -417,285 +1035,355 @@ class AudioAnalyzerApp:
             )
             self.topic_colors[new_topic] = color
             
+            # Versão clara da mesma cor para o highlight no PDF
+            rgb = colorsys.hsv_to_rgb(hue, 0.3, 0.95)
+            self.pdf_highlight_colors[new_topic] = "#{:02x}{:02x}{:02x}".format(
+                int(rgb[0] * 255),
+                int(rgb[1] * 255),
+                int(rgb[2] * 255)
+            )
+            
             # Create progress window for analysis
             progress_window = ProgressWindow(self.root)
             progress_window.update_progress(0, f"Analisando novo tema: {new_topic}")
             
-            try:
-                # Analyze all sentences for the new topic
-                total_sentences = len(self.processed_sentences)
-                for idx, sentence_data in enumerate(self.processed_sentences):
-                    # Update progress
-                    progress = (idx + 1) / total_sentences
-                    progress_window.update_progress(
-                        progress,
-                        f"Analisando tema '{new_topic}'... ({idx + 1}/{total_sentences})"
-                    )
-                    
-                    # Check if the sentence contains the new topic
-                    is_sensitive, similar_words = self.find_sensitive_content(
-                        sentence_data["text"],
-                        new_topic
-                    )
-                    if is_sensitive:
-                        sentence_data["themes"][new_topic] = similar_words
-                
-                # Update progress and close window
-                progress_window.update_progress(1.0, "Análise concluída!")
-                self.root.after(1000, progress_window.destroy)
-                
-                # Create checkbox for the new topic
-                checkbox = ctk.CTkCheckBox(
-                    self.topics_frame,
-                    text=new_topic,
-                    variable=self.topics[new_topic],
-                    command=self.filter_transcription,
-                    fg_color=color,
-                    text_color="white"
-                )
-                checkbox.pack(anchor=tk.W, padx=5, pady=2)
-                
-                # Update the display
-                self.filter_transcription()
-                
-            except Exception as e:
-                progress_window.destroy()
-                messagebox.showerror("Erro", f"Erro ao analisar o novo tema: {str(e)}")
-                
-                # Remove the topic if analysis failed
-                if new_topic in self.topics:
-                    del self.topics[new_topic]
-                if new_topic in self.topic_related_words:
-                    del self.topic_related_words[new_topic]
-                if new_topic in self.topic_colors:
-                    del self.topic_colors[new_topic]
+            # Num caso reaberto, os modelos só são carregados neste momento
+            if not self.models_ready.is_set():
+                progress_window.update_progress(0, "Carregando modelos...")
+                self.start_loading_models()
+            
+            # A espera pelos modelos e a análise rodam fora da thread do Tk, só lendo
+            # os tokens guardados; as sentenças só são alteradas de volta nela, por
+            # root.after, como no process_audio
+            threading.Thread(
+                target=self.run_custom_topic,
+                args=(new_topic, self.processed_sentences, self.token_store,
+                      progress_window, self.tracer.mark()),
+                daemon=True
+            ).start()
+    
+    def run_custom_topic(self, new_topic, sentences, token_store, progress_window, trace_mark):
+        """Espera os modelos e analisa o novo tema sobre os tokens guardados (em segundo plano)"""
+        try:
+            self.wait_for_models()
+            self.root.after(0, lambda: progress_window.update_progress(
+                0, f"Analisando novo tema: {new_topic}"
+            ))
+            
+            # Analyze all sentences for the new topic using the stored tokens
+            with self.tracer.span("add_custom_topic", sentences=len(sentences)):
+                topic_themes = self.match_topic_themes(token_store, [new_topic])
+        except Exception as e:
+            error = str(e)
+            self.root.after(0, lambda: self.fail_custom_topic(new_topic, progress_window, error))
+            return
+        self.root.after(0, lambda: self.finish_custom_topic(
+            new_topic, sentences, topic_themes, progress_window, trace_mark
+        ))
+    
+    def finish_custom_topic(self, new_topic, sentences, topic_themes, progress_window, trace_mark):
+        """Grava o novo tema nas sentenças e conclui a análise, na thread do Tk"""
+        self.apply_topic_themes(sentences, topic_themes)
+        
+        # Update progress and close window
+        progress_window.update_progress(1.0, "Análise concluída!")
+        if self.tracer.enabled:
+            self.write_trace()
+            progress_window.show_summary(self.tracer.format_summary(trace_mark))
+        else:
+            self.root.after(1000, progress_window.destroy)
+        
+        # Create checkbox for the new topic
+        self.add_topic_checkbox(new_topic)
+        
+        # O índice de busca passa a conhecer o novo tema desta gravação
+        threading.Thread(
+            target=self.safe_index_recording,
+            args=(self.processed_sentences, self.token_store),
+            daemon=True
+        ).start()
+        
+        # Update the display
+        self.filter_transcription()
+    
+    def fail_custom_topic(self, new_topic, progress_window, error):
+        """Desfaz o novo tema cuja análise falhou"""
+        progress_window.destroy()
+        messagebox.showerror("Erro", f"Erro ao analisar o novo tema: {error}")
+        
+        # Remove the topic if analysis failed
+        if new_topic in self.topics:
+            del self.topics[new_topic]
+        if new_topic in self.topic_related_words:
+            del self.topic_related_words[new_topic]
+        if new_topic in self.topic_colors:
+            del self.topic_colors[new_topic]
+        if new_topic in self.pdf_highlight_colors:
+            del self.pdf_highlight_colors[new_topic]
     
     def play_segment(self, start_time, end_time):
         """Reproduz um segmento específico do áudio"""
-        if self.audio_segment:
+        if self.player:
             # Para qualquer reprodução em andamento
             self.stop_playback()
             
-            # Extrai o segmento desejado
-            segment = self.audio_segment[int(start_time * 1000):int(end_time * 1000)]
-            
-            # Salva temporariamente o segmento
-            temp_file = "temp_segment.wav"
-            segment.export(temp_file, format="wav")
-            
-            # Carrega e reproduz o segmento
-            pygame.mixer.music.load(temp_file)
-            pygame.mixer.music.play()
-            
-            # Remove o arquivo temporário após um curto delay
-            def cleanup():
-                time.sleep((end_time - start_time) + 0.5)  # Espera o áudio terminar
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-            
-            threading.Thread(target=cleanup, daemon=True).start()
+            # Reproduz o segmento direto do PCM mapeado em memória
+            self.player.play(start_time, end_time)
 
-    def create_sentence_frame(self, text, start_time, end_time, topics_found=None):
-        """Cria um frame para uma sentença com botão de reprodução e texto editável"""
-        frame = ctk.CTkFrame(self.transcription_text)
-        frame.pack(fill=tk.X, padx=5, pady=2)
-        
-        # Botão de reprodução
-        play_btn = ctk.CTkButton(
-            frame,
-            text="▶",
-            width=30,
-            command=lambda s=start_time, e=end_time: self.play_segment(s, e)
-        )
-        play_btn.pack(side=tk.LEFT, padx=5)
+    def process_audio(self):
+        if not hasattr(self, 'filename'):
+            return
+        if self.processing_thread is not None and self.processing_thread.is_alive():
+            return
         
-        # Frame para o texto com fundo preto
-        text_frame = ctk.CTkFrame(frame, fg_color="black")
-        text_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        # Clear previous transcription
+        self.transcription_list.clear()
+        self.matches_text.delete("1.0", tk.END)
+        self.processed_sentences = SentenceStore()
+        self.token_store = None
+        self.transcription = None
+        self.transcription_key = None
+        self.pdf_button.configure(state="disabled")
+        self.export_button.configure(state="disabled")
+        self.save_case_button.configure(state="disabled")
+        self.process_button.configure(state="disabled")
+        self.start_loading_models()
+
+        # Create progress window; a transcrição pode ser cancelada e retomada depois
+        self.cancel_event = threading.Event()
+        self.progress_window = ProgressWindow(self.root, self.cancel_processing)
+        self.progress_window.update_progress(0, "Transcrevendo áudio...")
         
-        # Texto editável da transcrição
-        text_entry = ctk.CTkTextbox(
-            text_frame,
-            fg_color="black",
-            text_color="white",
-            height=60,
-            wrap=tk.WORD
-        )
-        text_entry.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        text_entry.insert("1.0", f"[{start_time:.2f}s - {end_time:.2f}s] {text}")
+        # As variáveis do Tk só podem ser lidas na thread principal
+        topics = [topic for topic in self.topics.keys() if topic != "Nenhum"]
+        use_cache = self.use_transcription_cache.get()
+        quantize_int8 = self.quantize_int8.get()
         
-        if topics_found:
-            # Cria labels para mostrar os temas encontrados
-            topics_frame = ctk.CTkFrame(frame, fg_color="transparent")
-            topics_frame.pack(side=tk.RIGHT, padx=5)
-            
-            for topic, words in topics_found.items():
-                topic_label = ctk.CTkLabel(
-                    topics_frame,
-                    text=topic,
-                    fg_color=self.topic_colors[topic],
-                    text_color="white",
-                    corner_radius=6,
-                    padx=6,
-                    pady=2
-                )
-                topic_label.pack(side=tk.LEFT, padx=2)
+        # Cada processamento começa um rastreamento novo, com seu próprio arquivo
+        self.tracer = Tracer(self.tracing.get())
+        self.trace_path = None
         
-        return frame
+        # Transcrição e análise rodam em uma thread; os resultados chegam
+        # pela fila e são exibidos pela thread do Tk em poll_processing
+        self.processing_queue = queue.Queue()
+        self.processing_thread = threading.Thread(
+            target=self.run_processing,
+            args=(self.processing_queue, topics, use_cache, quantize_int8),
+            daemon=True
+        )
+        self.processing_thread.start()
+        self.root.after(50, self.poll_processing)
 
-    def find_similar_words(self, text, topic):
-        """
-        Find words in text that are semantically similar to the topic and its related words.
-        Returns a list of similar words and their similarity scores.
+    def run_processing(self, results, topics, use_cache, quantize_int8):
         """
-        # Process the text with spaCy
-        doc = self.nlp(text.lower())
-        similar_words = set()  # Using set to avoid duplicates
-        
-        # Get related words for the topic
-        related_words = self.topic_related_words.get(topic, [])
-        
-        # Process topic and its related words
-        topic_tokens = [self.nlp(topic)[0]] + [self.nlp(word)[0] for word in related_words]
-        
-        # Check similarity with topic and related words
-        for token in doc:
-            if token.has_vector and not token.is_stop and not token.is_punct:
-                # Check similarity with topic and all related words
-                for topic_token in topic_tokens:
-                    if topic_token.has_vector:
-                        similarity = token.similarity(topic_token)
-                        if similarity > self.similarity_threshold:
-                            similar_words.add(token.text)
-                            break  # If we found a match, no need to check other related words
-        
-        return list(similar_words)
-
-    def find_sensitive_content(self, sentence, topic):
+        Executa a transcrição e a análise de temas fora da thread do Tk.
+        Envia para a fila mensagens de progresso, cada sentença assim que seus
+        temas ficam prontos e, ao final, o token_store da transcrição.
         """
-        Check if a sentence contains content similar to a sensitive topic.
-        Returns a tuple of (bool, list of similar words) indicating if sensitive content was found.
-        """
-        similar_words = self.find_similar_words(sentence, topic)
-        return len(similar_words) > 0, similar_words
-
-    def process_audio(self):
-        if not hasattr(self, 'filename'):
-            return
-        
         try:
-            # Clear previous transcription
-            for widget in self.transcription_text.winfo_children():
-                widget.destroy()
-            self.matches_text.delete("1.0", tk.END)
-
-            # Create progress window
-            self.progress_window = ProgressWindow(self.root)
-            self.progress_window.update_progress(0, "Carregando modelo de transcrição...")
-            
-            # Load and process audio file
-            result = self.model.transcribe(self.filename)
-            
-            # Update progress window
-            self.progress_window.update_progress(0.3, "Transcrevendo áudio...")
-            
-            # Store sentences and initialize processed_sentences
-            self.sentences = [(segment["text"].strip(), segment["start"], segment["end"]) 
-                            for segment in result["segments"]]
-            
-            total_sentences = len(self.sentences)
-            self.processed_sentences = []
-            
-            # Pre-process all sentences for themes
-            self.progress_window.update_progress(0.4, "Analisando temas sensíveis...")
-            
-            for idx, (text, start, end) in enumerate(self.sentences):
-                # Update progress
-                progress = 0.4 + (0.5 * (idx / total_sentences))
-                self.progress_window.update_progress(
-                    progress,
-                    f"Analisando temas sensíveis... ({idx + 1}/{total_sentences})"
+            with self.tracer.span("process_audio"):
+                self.wait_for_models(results)
+                
+                duration = len(self.audio_samples) / PCM_SAMPLE_RATE
+                
+                def transcription_progress(fraction):
+                    # Chamado ao fim de cada janela, depois de ela ser gravada no checkpoint
+                    if self.cancel_event.is_set():
+                        raise TranscriptionCancelled()
+                    results.put((
+                        "progress",
+                        0.6 * fraction,
+                        f"Transcrevendo áudio... {fraction:.0%}\n"
+                        f"({format_duration(fraction * duration)} de {format_duration(duration)})"
+                    ))
+                
+                # Load and process audio file
+                result = self.transcribe_audio(
+                    self.file_hash,
+                    self.pcm_path,
+                    self.audio_samples,
+                    use_cache,
+                    transcription_progress,
+                    quantize_int8
                 )
+                results.put(("transcribed",))
+                results.put(("progress", 0.6, "Identificando falantes..."))
+                speakers = self.diarize_segments(self.audio_samples, result["segments"])
+                results.put(("progress", 0.6, "Analisando temas sensíveis..."))
                 
-                # Process each sentence
-                sentence_data = {
-                    "text": text,
-                    "start": start,
-                    "end": end,
-                    "themes": {}
-                }
+                def analysis_progress(done, total_sentences):
+                    results.put((
+                        "progress",
+                        0.6 + 0.4 * (done / total_sentences),
+                        f"Analisando temas sensíveis... ({done}/{total_sentences})"
+                    ))
                 
-                # Check for all possible themes
-                for topic in self.topics.keys():
-                    if topic != "Nenhum":
-                        is_sensitive, similar_words = self.find_sensitive_content(text, topic)
-                        if is_sensitive:
-                            sentence_data["themes"][topic] = similar_words
+                # Cada sentença é exibida assim que seus temas ficam prontos; uma cópia
+                # fica nesta thread para o índice de busca entre gravações
+                sentences = SentenceStore()
                 
-                self.processed_sentences.append(sentence_data)
-            
-            # Display initial transcription
-            self.progress_window.update_progress(0.9, "Montando interface...")
-            self.filter_transcription()
-            
-            # Enable PDF button
-            self.pdf_button.configure(state="normal")
+                def on_sentence(sentence):
+                    sentences.append(**sentence)
+                    results.put(("sentence", sentence))
+                
+                token_store = self.analyze_segments(
+                    result["segments"],
+                    topics,
+                    on_sentence,
+                    analysis_progress,
+                    speakers
+                )
+                
+                self.word_cache.save()
+                results.put(("progress", 1.0, "Indexando para a busca entre gravações..."))
+                self.safe_index_recording(sentences, token_store)
             
-            # Update progress and close window
-            self.progress_window.update_progress(1.0, "Processamento concluído!")
-            self.root.after(1000, self.progress_window.destroy)  # Fecha após 1 segundo
+            # O span "process_audio" fecha antes do aviso de término,
+            # para entrar no resumo mostrado ao final
+            results.put((
+                "done",
+                token_store,
+                result,
+                self.transcription_key(self.file_hash, quantize_int8)
+            ))
             
+        except TranscriptionCancelled:
+            results.put(("cancelled",))
         except Exception as e:
-            if hasattr(self, 'progress_window'):
-                self.progress_window.destroy()
-            messagebox.showerror("Erro", f"Erro ao processar o áudio: {str(e)}")
+            results.put(("error", e))
 
-    def filter_transcription(self, selected_topic=None):
-        """Filtra a transcrição para mostrar apenas o tema selecionado"""
-        # Limpa a área de transcrição
-        for widget in self.transcription_text.winfo_children():
-            widget.destroy()
-            
-        if not hasattr(self, 'processed_sentences'):
-            return
-            
-        # Para cada sentença processada
-        for sentence_data in self.processed_sentences:
-            has_any_topic = False
-            active_themes = {}
-            
-            # Verifica temas ativos
-            for topic, var in self.topics.items():
-                if topic != "Nenhum" and var.get():
-                    if topic in sentence_data["themes"]:
-                        active_themes[topic] = sentence_data["themes"][topic]
-                        has_any_topic = True
+    def safe_index_recording(self, sentences, token_store):
+        """Indexa a gravação atual para a busca; uma falha não interrompe a análise"""
+        try:
+            self.index_recording(
+                self.file_hash,
+                self.filename,
+                sentences,
+                token_store,
+                self.envelope.n_samples / PCM_SAMPLE_RATE if self.envelope is not None else None
+            )
+        except Exception as e:
+            print(f"Error indexing recording: {e}")
+
+    def cancel_processing(self):
+        """Pede o cancelamento da transcrição, que para ao fim da janela em curso"""
+        self.cancel_event.set()
+        self.progress_window.disable_cancel("Cancelando ao fim da janela atual...")
+
+    def poll_processing(self):
+        """Consome a fila do processamento em segundo plano na thread do Tk"""
+        finished = False
+        succeeded = False
+        with self.tracer.span("render") as render_span:
+            rendered = 0
+            try:
+                while True:
+                    message = self.processing_queue.get_nowait()
+                    kind = message[0]
+                    
+                    if kind == "progress":
+                        self.progress_window.update_progress(message[1], message[2])
+                        
+                    elif kind == "transcribed":
+                        # Depois da transcrição o processamento não é mais cancelável
+                        self.progress_window.disable_cancel()
+                        
+                    elif kind == "sentence":
+                        # Exibe a sentença assim que seus temas ficam prontos
+                        self.processed_sentences.append(**message[1])
+                        self.show_sentence_if_visible(len(self.processed_sentences) - 1)
+                        rendered += 1
+                        
+                    elif kind == "done":
+                        finished = True
+                        succeeded = True
+                        self.token_store = message[1]
+                        self.transcription = message[2]
+                        self.transcription_key = message[3]
+                        
+                        # Enable PDF button
+                        self.pdf_button.configure(state="normal")
+                        self.export_button.configure(state="normal")
+                        self.save_case_button.configure(state="normal")
+                        self.process_button.configure(state="normal")
+                        
+                        # Update progress and close window
+                        self.progress_window.update_progress(1.0, "Processamento concluído!")
+                        break
+                        
+                    elif kind == "cancelled":
+                        finished = True
+                        self.progress_window.destroy()
+                        self.process_button.configure(state="normal")
+                        messagebox.showinfo(
+                            "Cancelado",
+                            "Transcrição cancelada. O trecho já transcrito foi salvo e "
+                            "o próximo processamento deste áudio continuará a partir dele."
+                        )
+                        break
+                        
+                    elif kind == "error":
+                        finished = True
+                        self.progress_window.destroy()
+                        self.process_button.configure(state="normal")
+                        messagebox.showerror("Erro", f"Erro ao processar o áudio: {str(message[1])}")
+                        break
+            except queue.Empty:
+                pass
             
-            # Mostra a sentença se:
-            # - Tem algum tema detectado, OU
-            # - "Nenhum" está marcado e não tem nenhum tema detectado
-            if has_any_topic or (self.topics["Nenhum"].get() and not has_any_topic):
-                self.create_sentence_frame(
-                    sentence_data["text"],
-                    sentence_data["start"],
-                    sentence_data["end"],
-                    active_themes if active_themes else None
-                )
+            # Só as rodadas que exibiram sentenças entram no rastreamento
+            if rendered:
+                render_span.count(sentences=rendered)
+            else:
+                render_span.discard()
+        
+        if succeeded:
+            if self.tracer.enabled:
+                # Com rastreamento, a janela fica aberta com o resumo das etapas
+                self.write_trace()
+                self.progress_window.show_summary(self.tracer.format_summary())
+            else:
+                self.root.after(1000, self.progress_window.destroy)  # Fecha após 1 segundo
+        
+        if not finished:
+            self.root.after(50, self.poll_processing)
+
+    def write_trace(self):
+        """Grava o rastreamento atual em self.trace_path"""
+        if self.trace_path is None:
+            self.trace_path = os.path.join(
+                self.trace_directory,
+                time.strftime("raio-trace-%Y%m%d-%H%M%S.json")
+            )
+        try:
+            self.tracer.write(self.trace_path)
+        except OSError as e:
+            messagebox.showerror("Erro", f"Erro ao gravar o rastreamento: {str(e)}")
+
+    def get_topic_filter(self):
+        """Lê uma única vez os temas marcados: (temas selecionados, "Nenhum" marcado)"""
+        selected = [topic for topic, var in self.topics.items()
+                    if topic != "Nenhum" and var.get()]
+        return selected, self.topics["Nenhum"].get()
 
-    def calculate_file_hash(self, filepath):
-        """Calcula o hash SHA-256 do arquivo"""
-        sha256_hash = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            # Ler o arquivo em blocos para não sobrecarregar a memória
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+    def show_sentence_if_visible(self, index):
+        """Acrescenta a sentença à lista se ela passar pelo filtro de temas atual"""
+        selected_topics, show_none = self.get_topic_filter()
+        has_any_topic = bool(self.processed_sentences.themes(index, selected_topics))
+        if has_any_topic or show_none:
+            self.transcription_list.append_item(index)
+
+    def filter_transcription(self, selected_topic=None):
+        """Filtra a transcrição para mostrar apenas o tema selecionado"""
+        selected_topics, show_none = self.get_topic_filter()
+        
+        # Filtro vetorizado sobre a matriz de bits; as linhas visíveis são reaproveitadas
+        items = self.processed_sentences.filter(selected_topics, show_none)
+        self.transcription_list.set_items(items.tolist(), selected_topics)
 
     def generate_pdf_report(self):
         """Gera um relatório PDF com a transcrição e análise de temas sensíveis"""
-        if not hasattr(self, 'sentences'):
+        if not self.processed_sentences:
             messagebox.showerror("Erro", "Nenhuma transcrição disponível para gerar relatório.")
             return
             
@@ -711,141 +1399,230 @@ class AudioAnalyzerApp:
             
         try:
             # Calcular hash do arquivo
-            file_hash = self.calculate_file_hash(self.filename)
-            
-            # Criar PDF
-            pdf = FPDF()
-            
-            # Configurar página
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.set_margins(20, 20, 20)
-            
-            # Título
-            pdf.set_font('Arial', 'B', 16)
-            pdf.cell(0, 10, 'Relatório de Análise de Áudio', ln=True, align='C')
-            pdf.ln(5)
-            
-            # Informações do arquivo
-            pdf.set_font('Arial', '', 10)
-            current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            pdf.cell(0, 6, f'Data: {current_time}', ln=True)
-            pdf.cell(0, 6, f'Arquivo: {os.path.basename(self.filename)}', ln=True)
-            
-            # Hash do arquivo
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(0, 6, 'Hash SHA-256:', ln=True)
-            pdf.set_font('Arial', '', 8)  # Fonte menor para o hash
-            pdf.cell(0, 6, file_hash, ln=True)
-            pdf.ln(5)
-            
-            # Transcrição
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, 'Transcrição:', ln=True)
-            
-            pdf.set_font('Arial', '', 10)
-            for text, start, end in self.sentences:
-                timestamp = f'[{start:.2f}s - {end:.2f}s]'
-                pdf.multi_cell(0, 6, f'{timestamp}\n{text}', ln=True)
-                pdf.ln(2)
-            
-            # Temas Sensíveis
-            pdf.add_page()
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, 'Temas Sensíveis Detectados:', ln=True)
-            
-            # Organizar trechos por tema
-            topics_content = {}
-            for topic, var in self.topics.items():
-                if var.get() and topic != "Nenhum":  # Se o tema está selecionado e não é "Nenhum"
-                    topics_content[topic] = []
+            if self.file_hash is None:
+                self.file_hash = self.calculate_file_hash(self.filename)
             
-            # Procurar por temas sensíveis em cada sentença
-            for text, start, end in self.sentences:
-                for topic in topics_content.keys():
-                    has_content, similar_words = self.find_sensitive_content(text, topic)
-                    if has_content:
-                        topics_content[topic].append({
-                            'text': text,
-                            'start': start,
-                            'end': end,
-                            'similar_words': similar_words
-                        })
-            
-            # Gerar relatório agrupado por temas
-            found_topics = False
-            pdf.set_font('Arial', '', 10)
-            
-            for topic, content_list in topics_content.items():
-                if content_list:  # Se houver conteúdo para este tema
-                    found_topics = True
-                    
-                    # Cabeçalho do tema
-                    pdf.set_font('Arial', 'B', 12)
-                    pdf.ln(5)
-                    
-                    # Converter cor hex para RGB para o cabeçalho
-                    r = int(self.pdf_highlight_colors[topic][1:3], 16)
-                    g = int(self.pdf_highlight_colors[topic][3:5], 16)
-                    b = int(self.pdf_highlight_colors[topic][5:7], 16)
-                    pdf.set_fill_color(r, g, b)
-                    pdf.cell(0, 10, f'Tema: {topic}', ln=True, fill=True)
-                    pdf.ln(2)
-                    
-                    # Listar trechos do tema
-                    pdf.set_font('Arial', '', 10)
-                    for item in content_list:
-                        timestamp = f'[{item["start"]:.2f}s - {item["end"]:.2f}s]'
-                        pdf.multi_cell(0, 6, f'Tempo: {timestamp}', ln=True)
-                        
-                        # Destacar palavras sensíveis no texto
-                        text = item["text"]
-                        
-                        # Criar uma lista de posições e palavras para destacar
-                        highlights = []
-                        for word in item["similar_words"]:
-                            start_pos = text.lower().find(word.lower())
-                            if start_pos != -1:
-                                highlights.append((start_pos, start_pos + len(word), word))
-                        
-                        # Ordenar highlights por posição
-                        highlights.sort(key=lambda x: x[0])
-                        
-                        # Imprimir texto com palavras destacadas
-                        current_pos = 0
-                        pdf.multi_cell(0, 6, "Texto: ", ln=False)
-                        for start, end, word in highlights:
-                            # Texto antes da palavra destacada
-                            if start > current_pos:
-                                pdf.set_fill_color(255, 255, 255)  # Fundo branco
-                                pdf.write(6, text[current_pos:start])
-                            
-                            # Palavra destacada com fundo colorido
-                            pdf.set_fill_color(r, g, b)  # Cor do tema
-                            pdf.cell(pdf.get_string_width(text[start:end]), 6, text[start:end], fill=True)
-                            current_pos = end
-                        
-                        # Texto restante após última palavra destacada
-                        if current_pos < len(text):
-                            pdf.set_fill_color(255, 255, 255)  # Fundo branco
-                            pdf.write(6, text[current_pos:])
-                        
-                        pdf.ln()
-                        pdf.multi_cell(0, 6, f'Palavras detectadas: {", ".join(item["similar_words"])}', ln=True)
-                        pdf.ln(3)
-            
-            if not found_topics:
-                pdf.multi_cell(0, 6, 'Nenhum tema sensível detectado.', ln=True)
-            
-            # Salvar PDF
-            pdf.output(file_path)
+            # Temas selecionados, exceto "Nenhum"
+            topics = [topic for topic, var in self.topics.items()
+                      if var.get() and topic != "Nenhum"]
+            trace_mark = self.tracer.mark()
+            with self.tracer.span("generate_pdf_report"):
+                self.write_pdf_report(
+                    file_path,
+                    self.filename,
+                    self.file_hash,
+                    self.processed_sentences,
+                    topics
+                )
             
-            # Mostrar mensagem de sucesso
-            messagebox.showinfo("Sucesso", f"Relatório PDF gerado com sucesso!\nSalvo em: {file_path}")
+            # Mostrar mensagem de sucesso (com o resumo das etapas, se rastreado)
+            message = f"Relatório PDF gerado com sucesso!\nSalvo em: {file_path}"
+            if self.tracer.enabled:
+                self.write_trace()
+                message += f"\n\n{self.tracer.format_summary(trace_mark)}"
+            messagebox.showinfo("Sucesso", message)
             
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao gerar PDF: {str(e)}")
 
+    def export_transcription(self):
+        """Exporta as sentenças processadas; o formato segue a extensão escolhida"""
+        if not self.processed_sentences:
+            messagebox.showerror("Erro", "Nenhuma transcrição disponível para exportar.")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl",
+            filetypes=[
+                ("JSON Lines (sentenças e temas)", "*.jsonl"),
+                ("Legendas SRT", "*.srt"),
+                ("Legendas WebVTT", "*.vtt")
+            ],
+            title="Exportar Transcrição"
+        )
+        
+        if not file_path:
+            return
+        
+        export_format = os.path.splitext(file_path)[1].lower().lstrip(".")
+        if export_format not in EXPORT_FORMATS:
+            messagebox.showerror("Erro", "Use a extensão .jsonl, .srt ou .vtt.")
+            return
+        
+        try:
+            if self.file_hash is None:
+                self.file_hash = self.calculate_file_hash(self.filename)
+            self.write_export(file_path, export_format, self.file_hash, self.processed_sentences)
+            messagebox.showinfo("Sucesso", f"Transcrição exportada com sucesso!\nSalvo em: {file_path}")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao exportar: {str(e)}")
+
+    def save_case_file(self):
+        """Salva a análise atual como um caso, reaberto depois sem processamento"""
+        if not self.processed_sentences or self.envelope is None:
+            messagebox.showerror("Erro", "Nenhuma análise disponível para salvar.")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=CASE_EXTENSION,
+            filetypes=[("Caso do RAIO", f"*{CASE_EXTENSION}")],
+            title="Salvar Caso"
+        )
+        
+        if not file_path:
+            return
+        
+        try:
+            selected_topics = [topic for topic, var in self.topics.items() if var.get()]
+            self.save_case(
+                file_path,
+                self.filename,
+                self.file_hash,
+                self.processed_sentences,
+                self.token_store,
+                self.envelope,
+                self.transcription,
+                self.transcription_key,
+                self.topic_colors,
+                selected_topics
+            )
+            messagebox.showinfo("Sucesso", f"Caso salvo com sucesso!\nSalvo em: {file_path}")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao salvar o caso: {str(e)}")
+
+    def open_case_file(self):
+        """
+        Reabre um caso salvo: transcrição, temas e forma de onda aparecem na hora,
+        sem carregar modelos. A reprodução e uma nova análise ficam disponíveis
+        quando o PCM do áudio estiver pronto (em cache ou decodificado em segundo plano).
+        """
+        if self.processing_thread is not None and self.processing_thread.is_alive():
+            return
+        
+        path = filedialog.askdirectory(title=f"Abrir Caso ({CASE_EXTENSION})")
+        if not path:
+            return
+        
+        try:
+            bundle = self.open_case(path)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao abrir o caso: {str(e)}")
+            return
+        
+        # O áudio do caso anterior deixa de valer até o PCM deste ser aberto
+        self.stop_playback()
+        self.filename = bundle.audio_path
+        self.file_hash = bundle.file_hash
+        self.pcm_path = None
+        self.audio_samples = None
+        self.player = None
+        self.play_button.configure(state="disabled")
+        self.process_button.configure(state="disabled")
+        
+        self.processed_sentences = bundle.sentences
+        self.token_store = bundle.token_store
+        self.transcription = bundle.transcription
+        self.transcription_key = bundle.transcription_key
+        self.envelope = bundle.envelope
+        
+        # Temas do caso: cores, checkboxes dos temas personalizados e seleção salva
+        for topic, color in bundle.topic_colors.items():
+            self.topic_colors[topic] = color
+            if topic not in self.topics:
+                self.topics[topic] = tk.BooleanVar()
+                self.add_topic_checkbox(topic)
+        for topic, var in self.topics.items():
+            var.set(topic in bundle.selected_topics)
+        
+        self.draw_waveform()
+        self.matches_text.delete("1.0", tk.END)
+        self.filter_transcription()
+        self.pdf_button.configure(state="normal")
+        self.export_button.configure(state="normal")
+        self.save_case_button.configure(state="normal")
+        
+        # Casos vindos de outra máquina entram no índice de busca desta
+        if not self.search_index.contains(self.file_hash):
+            threading.Thread(
+                target=self.safe_index_recording,
+                args=(self.processed_sentences, self.token_store),
+                daemon=True
+            ).start()
+        
+        self.load_case_audio()
+
+    def load_case_audio(self):
+        """Abre o PCM do caso, decodificando o áudio original em segundo plano se preciso"""
+        file_hash = self.file_hash
+        pcm_path = self.pcm_cache.path(file_hash)
+        if os.path.exists(pcm_path):
+            self.attach_case_audio(file_hash, pcm_path)
+            return
+        if not os.path.exists(self.filename):
+            messagebox.showwarning(
+                "Aviso",
+                f"Áudio original não encontrado:\n{self.filename}\n\n"
+                "A transcrição e a forma de onda continuam disponíveis, "
+                "mas a reprodução e uma nova análise não."
+            )
+            return
+        
+        def decode():
+            try:
+                # Só decodifica se o arquivo ainda for o mesmo áudio do caso
+                if self.calculate_file_hash(self.filename) != file_hash:
+                    raise RuntimeError("o arquivo de áudio foi alterado depois de o caso ser salvo")
+                decode_to_pcm(self.filename, pcm_path)
+                self.pcm_cache.evict(keep=file_hash)
+            except Exception as e:
+                error = str(e)
+                self.root.after(0, lambda: messagebox.showerror(
+                    "Erro", f"Erro ao carregar o áudio do caso: {error}"
+                ))
+                return
+            self.root.after(0, lambda: self.attach_case_audio(file_hash, pcm_path))
+        
+        threading.Thread(target=decode, daemon=True).start()
+
+    def attach_case_audio(self, file_hash, pcm_path):
+        """Liga o PCM ao caso aberto (se ele ainda for o atual) e libera reprodução e análise"""
+        if file_hash != self.file_hash or self.audio_samples is not None:
+            return
+        self.pcm_path = pcm_path
+        self.audio_samples = open_pcm(pcm_path)
+        self.load_audio_playback()
+        self.play_button.configure(state="normal")
+        self.process_button.configure(state="normal")
+        
+        # Com as amostras disponíveis, o zoom máximo volta a mostrar o PCM
+        self.update_waveform_view(self.ax)
+
+    def open_search_window(self):
+        """Abre (ou traz para frente) a janela de busca entre gravações"""
+        if self.search_window is not None and self.search_window.winfo_exists():
+            self.search_window.lift()
+            return
+        self.search_window = SearchWindow(self)
+
+    def open_search_hit(self, hit):
+        """Reproduz um trecho encontrado, abrindo a gravação se ela não for a atual"""
+        if hit["sha256"] != self.file_hash or self.player is None:
+            if not os.path.exists(hit["file"]):
+                messagebox.showerror("Erro", f"Áudio não encontrado:\n{hit['file']}")
+                return
+            if self.processing_thread is not None and self.processing_thread.is_alive():
+                return
+            if not messagebox.askyesno(
+                "Abrir Gravação",
+                f"Abrir {os.path.basename(hit['file'])} em {format_duration(hit['start'])}?"
+            ):
+                return
+            if not self.open_audio_file(hit["file"]):
+                return
+        elif hit["sentence"] < len(self.processed_sentences):
+            self.transcription_list.scroll_to_sentence(hit["sentence"])
+        self.play_segment(hit["start"], hit["end"])
+
 if __name__ == "__main__":
     root = ctk.CTk()
     app = AudioAnalyzerApp(root)
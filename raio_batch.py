@@ -0,0 +1,407 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from raio_core import (
+    AudioAnalyzer,
+    SentenceStore,
+    Tracer,
+    DEFAULT_TOPIC_RELATED_WORDS,
+    EXPORT_FORMATS,
+    PCM_SAMPLE_RATE,
+    WHISPER_MODELS
+)
+
+
+# Extensões procuradas quando a entrada é um diretório
+AUDIO_EXTENSIONS = [".mp3", ".wav", ".ogg", ".m4a", ".opus", ".amr", ".flac", ".aac", ".wma"]
+
+# Versão do formato do JSON de resultado gravado para cada arquivo
+RESULT_VERSION = 2
+
+
+def find_audio_files(inputs, extensions=AUDIO_EXTENSIONS):
+    """
+    Expande diretórios (recursivamente), padrões glob e arquivos em uma lista
+    ordenada e sem repetições de caminhos absolutos.
+    """
+    extensions = {extension.lower() for extension in extensions}
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for directory, _, names in os.walk(item):
+                for name in names:
+                    if os.path.splitext(name)[1].lower() in extensions:
+                        files.add(os.path.abspath(os.path.join(directory, name)))
+        elif glob.has_magic(item):
+            files.update(os.path.abspath(path)
+                         for path in glob.glob(item, recursive=True)
+                         if os.path.isfile(path))
+        elif os.path.isfile(item):
+            files.add(os.path.abspath(item))
+        else:
+            print(f"Entrada ignorada (não encontrada): {item}", file=sys.stderr)
+    return sorted(files)
+
+
+def output_stems(files):
+    """
+    Nome de saída de cada arquivo: o caminho relativo ao diretório comum a todos,
+    sem extensão, para que arquivos homônimos em pastas diferentes não se sobrescrevam.
+    """
+    if not files:
+        return {}
+    root = os.path.commonpath([os.path.dirname(path) for path in files])
+    return {path: os.path.splitext(os.path.relpath(path, root))[0] for path in files}
+
+
+def write_json(path, data):
+    """Grava o JSON de forma atômica (arquivo temporário + os.replace)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+class BatchProcessor:
+    """
+    Processa arquivos de áudio sem interface gráfica: transcrição, detecção de temas,
+    JSON de resultado e relatório PDF por arquivo. O JSON é gravado por último e
+    serve de marca de arquivo concluído, o que permite retomar um lote interrompido.
+    """
+
+    def __init__(self, analyzer, output_directory, topics, use_cache=True,
+                 quantize_int8=False, write_pdf=True, trace=False, exports=(), index=False):
+        self.analyzer = analyzer
+        self.output_directory = output_directory
+        self.topics = topics
+        self.use_cache = use_cache
+        self.quantize_int8 = quantize_int8
+        self.write_pdf = write_pdf
+        self.trace = trace
+        self.exports = list(exports)
+        self.index = index
+        # Nos processos do pool o cache de palavras é salvo pelo processo pai (run_batch)
+        self.save_word_cache = True
+
+    def model_key(self):
+        model_name = self.analyzer.model_name
+        return f"{model_name}-int8" if self.quantize_int8 else model_name
+
+    def result_path(self, stem):
+        return os.path.join(self.output_directory, stem + ".json")
+
+    def pdf_path(self, stem):
+        return os.path.join(self.output_directory, stem + ".pdf")
+
+    def export_path(self, stem, export_format):
+        return os.path.join(self.output_directory, f"{stem}.{export_format}")
+
+    def trace_path(self, stem):
+        return os.path.join(self.output_directory, stem + ".trace.json")
+
+    def is_done(self, filename, stem):
+        """
+        Indica se o arquivo já foi processado com a mesma configuração.
+        Compara tamanho e data de modificação, sem reler o áudio.
+        """
+        try:
+            with open(self.result_path(stem), "r", encoding="utf-8") as f:
+                result = json.load(f)
+            stat = os.stat(filename)
+        except (OSError, ValueError):
+            return False
+        return (
+            result.get("version") == RESULT_VERSION
+            and result.get("size") == stat.st_size
+            and result.get("mtime") == stat.st_mtime
+            and result.get("model") == self.model_key()
+            and result.get("topics") == self.topics
+            and (result.get("pdf") or not self.write_pdf)
+            and set(self.exports) <= set(result.get("exports", []))
+            and (result.get("indexed") or not self.index)
+        )
+
+    def load_models(self):
+        """Carrega o spaCy e o Whisper uma única vez, antes do primeiro arquivo"""
+        self.analyzer.load_nlp()
+        # No modo de transcrição em trechos cada processo do pool carrega o próprio modelo
+        if self.analyzer.transcription_workers == 1:
+            self.analyzer.load_whisper_model(self.analyzer.model_name, self.quantize_int8)
+
+    def process_file(self, filename, stem):
+        """Processa um arquivo e retorna o registro usado no summary.json"""
+        started = time.perf_counter()
+        # Um rastreamento por arquivo, gravado ao lado do JSON de resultado
+        self.analyzer.tracer = Tracer(self.trace)
+        stat = os.stat(filename)
+        file_hash, pcm_path, samples = self.analyzer.prepare_audio(filename)
+        result = self.analyzer.transcribe_audio(
+            file_hash,
+            pcm_path,
+            samples,
+            self.use_cache,
+            quantize_int8=self.quantize_int8
+        )
+
+        speakers = self.analyzer.diarize_segments(samples, result["segments"])
+        sentences = SentenceStore()
+        token_store = self.analyzer.analyze_segments(
+            result["segments"],
+            self.topics,
+            lambda sentence: sentences.append(**sentence),
+            speakers=speakers
+        )
+        if self.save_word_cache:
+            self.analyzer.word_cache.save()
+
+        pdf_path = None
+        if self.write_pdf:
+            pdf_path = self.pdf_path(stem)
+            os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+            self.analyzer.write_pdf_report(pdf_path, filename, file_hash, sentences, self.topics)
+
+        exports = {}
+        for export_format in self.exports:
+            exports[export_format] = self.analyzer.write_export(
+                self.export_path(stem, export_format), export_format, file_hash, sentences, self.topics
+            )
+
+        if self.index:
+            self.analyzer.index_recording(
+                file_hash, filename, sentences, token_store, len(samples) / PCM_SAMPLE_RATE
+            )
+
+        topic_counts = {topic: len(sentences.sentences_with(topic)) for topic in self.topics}
+        elapsed = time.perf_counter() - started
+        trace_path = None
+        if self.trace:
+            trace_path = self.analyzer.tracer.write(self.trace_path(stem))
+
+        # Gravado por último: a existência do JSON marca o arquivo como concluído
+        write_json(self.result_path(stem), {
+            "version": RESULT_VERSION,
+            "file": filename,
+            "sha256": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "model": self.model_key(),
+            "topics": self.topics,
+            "pdf": pdf_path is not None,
+            "exports": list(exports),
+            "indexed": self.index,
+            "language": result.get("language"),
+            "duration": len(samples) / PCM_SAMPLE_RATE,
+            "elapsed": elapsed,
+            "topic_counts": topic_counts,
+            "speakers": sentences.speaker_names,
+            "sentences": list(sentences)
+        })
+        return {
+            "file": filename,
+            "status": "ok",
+            "result": self.result_path(stem),
+            "pdf": pdf_path,
+            "exports": exports,
+            "sentences": len(sentences),
+            "topic_counts": topic_counts,
+            "trace": trace_path,
+            "elapsed": elapsed
+        }
+
+    def safe_process_file(self, filename, stem):
+        """Como process_file, mas uma falha vira um registro de erro em vez de interromper o lote"""
+        started = time.perf_counter()
+        try:
+            return self.process_file(filename, stem)
+        except Exception as e:
+            return {
+                "file": filename,
+                "status": "error",
+                "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(),
+                "elapsed": time.perf_counter() - started
+            }
+
+
+# Processador carregado uma única vez em cada processo do pool do lote
+_worker_processor = None
+
+
+def _init_batch_worker(processor):
+    global _worker_processor
+    _worker_processor = processor
+    _worker_processor.save_word_cache = False
+    _worker_processor.load_models()
+
+
+def _process_in_worker(filename, stem):
+    """Processa o arquivo e devolve, com o registro, as decisões novas do cache de palavras"""
+    record = _worker_processor.safe_process_file(filename, stem)
+    word_cache = _worker_processor.analyzer.word_cache
+    return record, word_cache.key, word_cache.take_unsaved()
+
+
+def run_batch(processor, files, jobs=1, force=False, log=print):
+    """
+    Processa os arquivos pulando os já concluídos. Com jobs > 1 os arquivos são
+    distribuídos entre processos, cada um com seus próprios modelos (o modelo do
+    Whisper não pode ser compartilhado entre transcrições simultâneas). As decisões
+    novas do cache de palavras de cada processo são juntadas e salvas uma única
+    vez aqui, em vez de cada processo sobrescrever o arquivo com o próprio cache.
+    Retorna o resumo do lote, também gravado em summary.json.
+    """
+    started = time.perf_counter()
+    stems = output_stems(files)
+    records = []
+    pending = []
+    for filename in files:
+        if not force and processor.is_done(filename, stems[filename]):
+            records.append({
+                "file": filename,
+                "status": "skipped",
+                "result": processor.result_path(stems[filename])
+            })
+        else:
+            pending.append(filename)
+    log(f"{len(files)} arquivo(s): {len(pending)} a processar, {len(records)} já concluído(s)")
+
+    def report(done, record):
+        records.append(record)
+        message = f"[{done}/{len(pending)}] {record['status']}: {record['file']} ({record['elapsed']:.1f}s)"
+        if record["status"] == "error":
+            message += f" - {record['error']}"
+        log(message)
+
+    if pending and jobs <= 1:
+        processor.load_models()
+        for done, filename in enumerate(pending, start=1):
+            report(done, processor.safe_process_file(filename, stems[filename]))
+    elif pending:
+        # Divide os núcleos da máquina entre os processos do pool
+        processor.analyzer.torch_threads = max(1, (os.cpu_count() or 1) // jobs)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=context,
+            initializer=_init_batch_worker,
+            initargs=(processor,)
+        ) as pool:
+            futures = {
+                pool.submit(_process_in_worker, filename, stems[filename]): filename
+                for filename in pending
+            }
+            word_cache = processor.analyzer.word_cache
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    record, key, decisions = future.result()
+                    if key is not None:
+                        word_cache.merge(key, decisions)
+                except Exception as e:
+                    # Falha do próprio processo (ex.: sem memória), não do arquivo
+                    record = {
+                        "file": futures[future],
+                        "status": "error",
+                        "error": f"{type(e).__name__}: {e}",
+                        "elapsed": 0.0
+                    }
+                report(done, record)
+        if word_cache.unsaved:
+            word_cache.save()
+
+    records.sort(key=lambda record: record["file"])
+    summary = {
+        "model": processor.model_key(),
+        "topics": processor.topics,
+        "total": len(records),
+        "processed": sum(record["status"] == "ok" for record in records),
+        "skipped": sum(record["status"] == "skipped" for record in records),
+        "failed": sum(record["status"] == "error" for record in records),
+        "elapsed": time.perf_counter() - started,
+        "files": records
+    }
+    write_json(os.path.join(processor.output_directory, "summary.json"), summary)
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="RAIO em lote: transcreve e analisa temas sensíveis de gravações sem interface gráfica."
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="arquivos, diretórios (percorridos recursivamente) ou padrões glob")
+    parser.add_argument("-o", "--output", required=True,
+                        help="diretório dos resultados (JSON e PDF por arquivo e summary.json)")
+    parser.add_argument("-m", "--model", default="medium", choices=WHISPER_MODELS,
+                        help="modelo do Whisper (padrão: medium)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="arquivos processados em paralelo, cada um em um processo (padrão: 1)")
+    parser.add_argument("--chunk-workers", type=int, default=1,
+                        help="processos por arquivo na transcrição em trechos (apenas com --jobs 1)")
+    parser.add_argument("--topics", nargs="+",
+                        help="temas analisados (padrão: todos os temas predefinidos)")
+    parser.add_argument("--extensions", nargs="+", default=AUDIO_EXTENSIONS,
+                        help="extensões procuradas nos diretórios")
+    parser.add_argument("--int8", action="store_true",
+                        help="quantização int8 do Whisper na CPU")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="não reutiliza transcrições em cache")
+    parser.add_argument("--no-speakers", action="store_true",
+                        help="não identifica os falantes")
+    parser.add_argument("--no-pdf", action="store_true",
+                        help="não gera o relatório PDF")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocessa também os arquivos já concluídos")
+    parser.add_argument("--export", nargs="+", choices=EXPORT_FORMATS, default=[],
+                        help="exporta também as sentenças em JSONL e/ou a transcrição em SRT/WebVTT")
+    parser.add_argument("--trace", action="store_true",
+                        help="grava o rastreamento das etapas de cada arquivo (<nome>.trace.json, formato Chrome trace)")
+    parser.add_argument("--index", action="store_true",
+                        help="adiciona cada gravação ao índice de busca entre gravações (~/.raio/index)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs > 1 and args.chunk_workers > 1:
+        parser.error("--chunk-workers só pode ser usado com --jobs 1")
+
+    analyzer = AudioAnalyzer(args.model)
+    analyzer.transcription_workers = args.chunk_workers
+    analyzer.diarize_speakers = not args.no_speakers
+
+    topics = args.topics or [topic for topic in DEFAULT_TOPIC_RELATED_WORDS if topic != "Nenhum"]
+    for topic in topics:
+        # Temas novos usam o próprio nome como palavra relacionada, como na interface
+        analyzer.topic_related_words.setdefault(topic, [topic])
+        analyzer.pdf_highlight_colors.setdefault(topic, "#E0E0E0")
+
+    files = find_audio_files(args.inputs, args.extensions)
+    processor = BatchProcessor(
+        analyzer,
+        os.path.abspath(args.output),
+        topics,
+        use_cache=not args.no_cache,
+        quantize_int8=args.int8,
+        write_pdf=not args.no_pdf,
+        trace=args.trace,
+        exports=args.export,
+        index=args.index
+    )
+    summary = run_batch(processor, files, args.jobs, args.force)
+    print(
+        f"Concluído em {summary['elapsed']:.1f}s: {summary['processed']} processado(s), "
+        f"{summary['skipped']} pulado(s), {summary['failed']} com erro"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
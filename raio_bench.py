@@ -0,0 +1,924 @@
+import os
+import sys
+import json
+import time
+import wave
+import zlib
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib.util
+import statistics
+import tracemalloc
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+from raio_core import (
+    AudioAnalyzer,
+    SearchIndex,
+    SentenceStore,
+    TokenStore,
+    WaveformEnvelope,
+    PCM_SAMPLE_RATE,
+    WHISPER_MODELS,
+    decode_to_pcm,
+    load_whisper_model,
+    normalize_rows,
+    open_pcm,
+    peak_rss_mb,
+    search_tokens,
+    transcribe_parallel
+)
+
+
+# Versão do formato do JSON de resultados
+BENCHMARK_VERSION = 1
+
+# Etapas na ordem em que são executadas
+STAGES = [
+    "decode",
+    "waveform",
+    "transcription",
+    "transcription_parallel",
+    "diarization",
+    "analysis",
+    "similar_words",
+    "filter",
+    "custom_topic",
+    "pdf",
+    "pdf_100",
+    "pdf_1000",
+    "pdf_10000",
+    "search",
+    "playback"
+]
+
+# Latência máxima aceita entre o clique e o som, em segundos (etapa playback)
+PLAYBACK_LATENCY_LIMIT = 0.1
+
+# Formantes (F1, F2, F3) de vogais usados na voz sintética
+VOWEL_FORMANTS = [
+    (730, 1090, 2440), (270, 2290, 3010), (530, 1840, 2480),
+    (570, 840, 2410), (300, 870, 2240), (660, 1720, 2410)
+]
+
+# Vozes sintéticas: (frequência fundamental, escala dos formantes)
+SYNTHETIC_VOICES = [(110, 1.0), (210, 1.18), (150, 0.9), (95, 1.08)]
+
+# Vocabulário das transcrições sintéticas
+FIXTURE_WORDS = [
+    "ele", "ela", "disse", "que", "não", "vai", "amanhã", "casa", "rua", "carro",
+    "dinheiro", "trabalho", "telefone", "ontem", "hoje", "noite", "cidade", "gente",
+    "ligou", "falou", "encontro", "pessoa", "problema", "conversa", "semana", "chegou",
+    "muito", "agora", "depois", "sempre", "nunca", "aqui", "lá", "tudo", "nada"
+]
+
+
+def synthetic_speech(seconds, n_speakers=3, seed=0):
+    """
+    Gravação sintética com vários falantes alternando a vez: vogais com formantes
+    diferentes por voz, pausas com ruído baixo. Retorna (amostras, segmentos).
+    Determinística para a mesma semente.
+    """
+    rng = np.random.default_rng(seed)
+    voices = SYNTHETIC_VOICES[:n_speakers]
+    vowel_samples = int(0.15 * PCM_SAMPLE_RATE)
+    t = np.arange(vowel_samples) / PCM_SAMPLE_RATE
+    freqs = np.fft.rfftfreq(vowel_samples, 1 / PCM_SAMPLE_RATE)
+
+    parts = []
+    segments = []
+    position = 0
+    total = int(seconds * PCM_SAMPLE_RATE)
+    while position < total:
+        gap = int(rng.uniform(0.1, 0.6) * PCM_SAMPLE_RATE)
+        parts.append(0.005 * rng.standard_normal(gap))
+        position += gap
+
+        f0, scale = voices[rng.integers(len(voices))]
+        n_vowels = int(rng.integers(4, 40))
+        turn = []
+        for _ in range(n_vowels):
+            f = f0 * (1 + 0.05 * rng.standard_normal())
+            harmonics = np.arange(1, int(7000 / f))[:, None]
+            source = (np.sin(2 * np.pi * f * harmonics * t + rng.random((len(harmonics), 1)) * 6)
+                      / harmonics).sum(axis=0)
+            envelope = np.zeros_like(freqs)
+            for formant, bandwidth in zip(np.array(VOWEL_FORMANTS[rng.integers(6)]) * scale, (90, 110, 170)):
+                envelope += 1 / (1 + ((freqs - formant) / bandwidth) ** 2)
+            turn.append(np.fft.irfft(np.fft.rfft(source) * envelope, vowel_samples))
+        turn = np.concatenate(turn)
+        turn *= rng.uniform(0.3, 1.0) / (np.abs(turn).max() + 1e-9)
+        parts.append(turn + 0.01 * rng.standard_normal(len(turn)))
+        segments.append({
+            "start": position / PCM_SAMPLE_RATE,
+            "end": (position + len(turn)) / PCM_SAMPLE_RATE,
+            "text": ""
+        })
+        position += len(turn)
+
+    samples = np.concatenate(parts)[:total].astype(np.float32)
+    segments = [segment for segment in segments if segment["start"] < seconds]
+    segments[-1]["end"] = min(segments[-1]["end"], seconds)
+    return samples, segments
+
+
+def fixture_transcript(n_sentences, topic_related_words, seed=0, topic_rate=0.3):
+    """
+    Transcrição sintética no formato dos segmentos do Whisper. Cerca de topic_rate
+    das sentenças contém uma palavra de algum tema. Determinística para a mesma semente.
+    """
+    rng = np.random.default_rng(seed)
+    topic_words = [word for words in topic_related_words.values() for word in words]
+    segments = []
+    start = 0.0
+    for idx in range(n_sentences):
+        words = list(rng.choice(FIXTURE_WORDS, int(rng.integers(5, 18))))
+        if topic_words and rng.random() < topic_rate:
+            words.insert(int(rng.integers(len(words))), topic_words[rng.integers(len(topic_words))])
+        duration = 0.35 * len(words)
+        segments.append({
+            "id": idx,
+            "start": start,
+            "end": start + duration,
+            "text": " " + " ".join(words).capitalize() + "."
+        })
+        start += duration + 0.2
+    return segments
+
+
+def fixture_sentences(n_sentences, topic_related_words, seed=0):
+    """
+    SentenceStore sintético para as etapas que não dependem do spaCy: os temas de
+    cada sentença são as palavras relacionadas que aparecem no texto.
+    """
+    sentences = SentenceStore()
+    for idx, segment in enumerate(fixture_transcript(n_sentences, topic_related_words, seed)):
+        text = segment["text"].strip()
+        lowered = text.lower()
+        themes = {}
+        for topic, words in topic_related_words.items():
+            found = [word for word in words if word in lowered]
+            if found and topic != "Nenhum":
+                themes[topic] = found
+        sentences.append(text, segment["start"], segment["end"], themes, f"Falante {idx % 2 + 1}")
+    return sentences
+
+
+def fixture_token_store(sentences, dimensions=300):
+    """
+    TokenStore sintético para as etapas que não dependem do spaCy: cada palavra
+    recebe um vetor pseudoaleatório fixo, derivado do próprio texto.
+    """
+    vectors = {}
+    store = TokenStore([])
+    sentence_ids = []
+    rows = []
+    for idx, text in enumerate(sentences.texts):
+        for word in search_tokens(text):
+            if word not in vectors:
+                rng = np.random.default_rng(zlib.crc32(word.encode("utf-8")))
+                vectors[word] = rng.standard_normal(dimensions).astype(np.float32)
+            store.words.append(word)
+            sentence_ids.append(idx)
+            rows.append(vectors[word])
+    store.n_sentences = len(sentences)
+    store.sentence_ids = np.array(sentence_ids, dtype=np.int32)
+    store.offsets = np.zeros(len(sentence_ids), dtype=np.int32)
+    store.vectors = normalize_rows(np.array(rows, dtype=np.float32).reshape(len(rows), dimensions))
+    return store
+
+
+def baseline_similar_words(nlp, text, topic, related_words, threshold):
+    """
+    find_similar_words como era antes da análise em lote: a sentença e cada palavra
+    relacionada passam pelo pipeline completo do spaCy a cada tema, e os tokens são
+    comparados um a um com token.similarity.
+    """
+    doc = nlp(text.lower())
+    similar_words = set()
+    topic_tokens = [nlp(topic)[0]] + [nlp(word)[0] for word in related_words]
+    for token in doc:
+        if token.has_vector and not token.is_stop and not token.is_punct:
+            for topic_token in topic_tokens:
+                if topic_token.has_vector and token.similarity(topic_token) > threshold:
+                    similar_words.add(token.text)
+                    break
+    return list(similar_words)
+
+
+def baseline_filter(sentences, selected, show_none):
+    """
+    Filtro de temas como era com a lista de dicts: percorre todas as sentenças e
+    monta os temas ativos de cada uma. Retorna [(índice, temas ativos)].
+    """
+    items = []
+    for idx, sentence_data in enumerate(sentences):
+        active_themes = {}
+        for topic in selected:
+            if topic in sentence_data["themes"]:
+                active_themes[topic] = sentence_data["themes"][topic]
+        if active_themes or show_none:
+            items.append((idx, active_themes))
+    return items
+
+
+def allocated_bytes(build):
+    """Bytes alocados (tracemalloc) que continuam vivos no objeto retornado por build"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return result, allocated
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    WER: distância de edição em palavras (normalizadas como na busca) dividida pelo
+    número de palavras da referência. Cada linha da programação dinâmica é calculada
+    com NumPy; as inserções viram um mínimo acumulado sobre a linha.
+    """
+    reference = search_tokens(reference)
+    hypothesis = search_tokens(hypothesis)
+    if not reference:
+        return float(len(hypothesis) > 0)
+    vocabulary = {}
+    ref_ids = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in reference])
+    hyp_ids = np.array([vocabulary.setdefault(word, len(vocabulary)) for word in hypothesis], dtype=np.int64)
+    columns = np.arange(len(hyp_ids) + 1)
+    row = columns.copy()
+    for idx, word in enumerate(ref_ids, 1):
+        current = np.empty_like(row)
+        current[0] = idx
+        # Substituição (ou acerto) e remoção
+        current[1:] = np.minimum(row[:-1] + (hyp_ids != word), row[1:] + 1)
+        # Inserção: current[j] = min(current[j], current[j - 1] + 1)
+        row = np.minimum.accumulate(current - columns) + columns
+    return row[-1] / len(reference)
+
+
+def _transcription_run(model_name, quantize_int8, pcm_path, options):
+    """
+    Uma execução da etapa transcription, num processo próprio para que o pico de
+    RSS (ru_maxrss) seja só desta configuração.
+    Retorna (segundos de transcrição, texto, pico de RSS em MB).
+    """
+    model = load_whisper_model(model_name, quantize_int8)
+    samples = open_pcm(pcm_path)
+    started = time.perf_counter()
+    result = model.transcribe(samples, **options)
+    elapsed = time.perf_counter() - started
+    return elapsed, result["text"], peak_rss_mb()
+
+
+def write_wav(path, samples, sample_rate=PCM_SAMPLE_RATE):
+    """Grava as amostras (float32 em [-1, 1]) como WAV PCM 16 bits mono"""
+    data = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(data.tobytes())
+
+
+class StageSkipped(Exception):
+    """A etapa não pode ser medida neste ambiente (ex.: dependência ausente)"""
+
+
+class BenchmarkSuite:
+    """
+    Mede cada etapa do pipeline separadamente sobre dados sintéticos (ou arquivos
+    informados), sem interface gráfica. Cada etapa roda `repeat` vezes e o
+    resultado guarda mediana, mínimo e vazão; a comparação com uma linha de base
+    usa a mediana.
+    """
+
+    def __init__(self, analyzer, work_directory, repeat=3, audio_seconds=120,
+                 n_sentences=2000, audio_path=None, transcript_path=None, seed=0,
+                 transcription_workers=(1, 4, 16), reference_path=None, log=print):
+        self.analyzer = analyzer
+        self.work_directory = work_directory
+        self.repeat = repeat
+        self.audio_seconds = audio_seconds
+        self.n_sentences = n_sentences
+        self.audio_path = audio_path
+        self.transcript_path = transcript_path
+        self.seed = seed
+        self.transcription_workers = transcription_workers
+        self.reference_path = reference_path
+        self.log = log
+
+        # Preenchidos pelas etapas, na ordem de STAGES
+        self.samples = None
+        self.audio_segments = None
+        self.transcript = None
+        self.speakers = None
+        self.sentences = None
+        self.token_store = None
+
+    def prepare(self):
+        """Gera ou carrega o áudio e a transcrição usados pelas etapas"""
+        os.makedirs(self.work_directory, exist_ok=True)
+        if self.audio_path is None:
+            samples, self.audio_segments = synthetic_speech(self.audio_seconds, seed=self.seed)
+            self.audio_path = os.path.join(self.work_directory, "fixture.wav")
+            write_wav(self.audio_path, samples)
+            self.samples = samples
+
+        if self.transcript_path is not None:
+            with open(self.transcript_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.transcript = data["segments"] if isinstance(data, dict) else data
+        else:
+            self.transcript = fixture_transcript(
+                self.n_sentences,
+                self.analyzer.topic_related_words,
+                self.seed
+            )
+
+    def measure(self, func, units=None, setup=None):
+        """Executa func `repeat` vezes (setup antes de cada uma, fora da medição)"""
+        timings = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        median = statistics.median(timings)
+        result = {
+            "status": "ok",
+            "median": median,
+            "min": min(timings),
+            "mean": statistics.mean(timings),
+            "runs": timings
+        }
+        if units:
+            name, count = units
+            result["units"] = name
+            result["count"] = count
+            result["throughput"] = count / median if median > 0 else None
+        return result
+
+    def require_nlp(self):
+        if self.analyzer.nlp is None:
+            try:
+                self.analyzer.load_nlp()
+            except (ImportError, OSError) as e:
+                raise StageSkipped(f"modelo do spaCy indisponível: {e}")
+
+    def bench_decode(self):
+        if shutil.which("ffmpeg") is None:
+            raise StageSkipped("ffmpeg não encontrado")
+        pcm_path = os.path.join(self.work_directory, "decode.f32")
+
+        def remove_output():
+            if os.path.exists(pcm_path):
+                os.remove(pcm_path)
+
+        result = self.measure(
+            lambda: decode_to_pcm(self.audio_path, pcm_path),
+            setup=remove_output
+        )
+        self.samples = open_pcm(pcm_path)
+        result["units"] = "audio_seconds"
+        result["count"] = len(self.samples) / PCM_SAMPLE_RATE
+        result["throughput"] = result["count"] / result["median"]
+        return result
+
+    def load_samples(self):
+        """Amostras para as etapas seguintes, mesmo sem ffmpeg (fixture sintética)"""
+        if self.samples is None:
+            raise StageSkipped("áudio não decodificado (ffmpeg não encontrado)")
+        return self.samples
+
+    def bench_waveform(self):
+        """Parte de load_audio_visualization que não depende do Tk: pirâmide e consultas"""
+        samples = self.load_samples()
+        duration = len(samples) / PCM_SAMPLE_RATE
+
+        def build_and_query():
+            envelope = WaveformEnvelope.build(samples, PCM_SAMPLE_RATE)
+            # Visão completa e dois níveis de zoom, como na navegação da forma de onda
+            for start, end in ((0.0, duration), (0.0, duration / 10), (duration / 2, duration / 2 + 1.0)):
+                envelope.query(samples, start, end, 1200)
+
+        return self.measure(build_and_query, ("audio_seconds", duration))
+
+    def load_reference(self):
+        """Texto da transcrição de referência (texto puro ou JSON de segmentos), se houver"""
+        if self.reference_path is None:
+            return None
+        with open(self.reference_path, "r", encoding="utf-8") as f:
+            if not self.reference_path.endswith(".json"):
+                return f.read()
+            data = json.load(f)
+        segments = data["segments"] if isinstance(data, dict) else data
+        return " ".join(segment["text"] for segment in segments)
+
+    def bench_transcription(self):
+        """
+        Transcrição com o modelo em float32 e quantizado em int8, cada uma em um
+        processo próprio: tempo, RTF (tempo / duração do áudio), pico de RSS e, com
+        uma referência (--reference), WER. A mediana é a da execução em float32.
+        """
+        samples = self.load_samples()
+        if importlib.util.find_spec("whisper") is None:
+            raise StageSkipped("whisper indisponível")
+        pcm_path = os.path.join(self.work_directory, "transcription.f32")
+        np.asarray(samples, dtype=np.float32).tofile(pcm_path)
+        duration = len(samples) / PCM_SAMPLE_RATE
+        reference = self.load_reference()
+
+        # A transcrição é a etapa mais lenta: uma única execução de cada variante
+        variants = {}
+        context = multiprocessing.get_context("spawn")
+        for name, quantize_int8 in (("float32", False), ("int8", True)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                elapsed, text, peak = pool.submit(
+                    _transcription_run,
+                    self.analyzer.model_name,
+                    quantize_int8,
+                    pcm_path,
+                    self.analyzer.transcribe_options
+                ).result()
+            variants[name] = {
+                "seconds": elapsed,
+                "rtf": elapsed / duration if duration else None,
+                "peak_rss_mb": peak,
+                "wer": None if reference is None else word_error_rate(reference, text)
+            }
+            message = f"  {name}: {elapsed:.1f} s"
+            if duration:
+                message += f" (RTF {elapsed / duration:.3f})"
+            if peak is not None:
+                message += f", pico de RSS {peak:.0f} MB"
+            if reference is not None:
+                message += f", WER {variants[name]['wer']:.1%}"
+            self.log(message)
+
+        elapsed = variants["float32"]["seconds"]
+        return {
+            "status": "ok",
+            "median": elapsed,
+            "min": elapsed,
+            "mean": elapsed,
+            "runs": [elapsed],
+            "units": "audio_seconds",
+            "count": duration,
+            "throughput": duration / elapsed,
+            "variants": variants
+        }
+
+    def bench_transcription_parallel(self, chunk_seconds=30, overlap_seconds=5):
+        """
+        transcribe_parallel com cada número de processos de transcription_workers.
+        Trechos de chunk_seconds para que mesmo a gravação sintética se divida entre
+        os processos; cada execução começa sem checkpoints. A mediana é a do maior
+        número de processos e "scaling" traz tempo, RTF e aceleração de cada um.
+        """
+        samples = self.load_samples()
+        if importlib.util.find_spec("whisper") is None:
+            raise StageSkipped("whisper indisponível")
+        pcm_path = os.path.join(self.work_directory, "parallel.f32")
+        np.asarray(samples, dtype=np.float32).tofile(pcm_path)
+        duration = len(samples) / PCM_SAMPLE_RATE
+
+        scaling = {}
+        for workers in self.transcription_workers:
+            checkpoint_directory = os.path.join(self.work_directory, f"parallel-{workers}")
+            os.makedirs(checkpoint_directory, exist_ok=True)
+            started = time.perf_counter()
+            transcribe_parallel(
+                pcm_path,
+                self.analyzer.model_name,
+                self.analyzer.transcribe_options,
+                os.path.join(checkpoint_directory, "chunk"),
+                workers=workers,
+                chunk_seconds=chunk_seconds,
+                overlap_seconds=overlap_seconds
+            )
+            elapsed = time.perf_counter() - started
+            shutil.rmtree(checkpoint_directory, ignore_errors=True)
+            scaling[str(workers)] = {"seconds": elapsed, "rtf": elapsed / duration}
+            self.log(f"  {workers} processo(s): {elapsed:.1f} s (RTF {elapsed / duration:.3f})")
+
+        reference = scaling[str(self.transcription_workers[0])]["seconds"]
+        for item in scaling.values():
+            item["speedup"] = reference / item["seconds"]
+        elapsed = scaling[str(max(self.transcription_workers))]["seconds"]
+        return {
+            "status": "ok",
+            "median": elapsed,
+            "min": min(item["seconds"] for item in scaling.values()),
+            "mean": statistics.mean(item["seconds"] for item in scaling.values()),
+            "runs": [item["seconds"] for item in scaling.values()],
+            "units": "audio_seconds",
+            "count": duration,
+            "throughput": duration / elapsed,
+            "scaling": scaling
+        }
+
+    def bench_diarization(self):
+        samples = self.load_samples()
+        segments = self.audio_segments or self.transcript
+
+        def diarize():
+            self.speakers = self.analyzer.diarize_segments(samples, segments)
+
+        return self.measure(diarize, ("segments", len(segments)))
+
+    def bench_analysis(self):
+        self.require_nlp()
+
+        def analyze():
+            sentences = SentenceStore()
+            self.token_store = self.analyzer.analyze_segments(
+                self.transcript,
+                [topic for topic in self.analyzer.topic_related_words if topic != "Nenhum"],
+                lambda sentence: sentences.append(**sentence)
+            )
+            self.sentences = sentences
+
+        return self.measure(analyze, ("sentences", len(self.transcript)), self.fresh_word_cache)
+
+    def fresh_word_cache(self):
+        """Esvazia o cache palavra -> temas, para que cada execução comece do zero"""
+        self.analyzer.word_cache.entries.clear()
+        self.analyzer.word_cache.key = None
+
+    def bench_similar_words(self, n_sentences=1000):
+        """
+        Temas de n_sentences sentenças com a análise em lote (cada sentença passa uma
+        vez pelo spaCy e é comparada com todos os temas) contra o laço antigo, um tema
+        e um documento de cada vez (baseline_similar_words), executado uma única vez.
+        """
+        self.require_nlp()
+        segments = self.transcript[:n_sentences]
+        topics = [topic for topic in self.analyzer.topic_related_words if topic != "Nenhum"]
+
+        def analyze():
+            self.analyzer.analyze_segments(segments, topics, lambda sentence: None)
+
+        result = self.measure(analyze, ("sentences", len(segments)), self.fresh_word_cache)
+
+        started = time.perf_counter()
+        for segment in segments:
+            for topic in topics:
+                baseline_similar_words(
+                    self.analyzer.nlp,
+                    segment["text"],
+                    topic,
+                    self.analyzer.topic_related_words.get(topic, []),
+                    self.analyzer.similarity_threshold
+                )
+        baseline = time.perf_counter() - started
+        result["baseline_seconds"] = baseline
+        result["speedup"] = baseline / result["median"]
+        self.log(f"  laço antigo por tema: {baseline:.1f} s ({result['speedup']:.1f}x mais lento)")
+        return result
+
+    def require_sentences(self):
+        if self.sentences is None:
+            raise StageSkipped("etapa analysis não executada")
+        return self.sentences
+
+    def bench_filter(self):
+        """
+        Parte de filter_transcription que não depende do Tk: filtro pela matriz de bits
+        e temas das linhas visíveis da lista virtualizada. Para comparação, as mesmas
+        sentenças como lista de dicts (o formato anterior ao SentenceStore): tempo do
+        filtro antigo e memória das duas estruturas (tracemalloc; os textos são
+        compartilhados e não entram na conta).
+        """
+        sentences = self.require_sentences()
+        topics = [topic for topic in self.analyzer.topic_related_words if topic != "Nenhum"]
+        selections = [(topics, False), (topics[:1], False), (topics[:3], True), ([], True)]
+
+        def filter_all():
+            for selected, show_none in selections:
+                items = sentences.filter(selected, show_none).tolist()
+                for index in items[:20]:
+                    sentences.themes(index, selected)
+
+        result = self.measure(filter_all, ("filters", len(selections)))
+
+        dicts, dicts_bytes = allocated_bytes(lambda: list(sentences))
+
+        def build_store():
+            store = SentenceStore()
+            for sentence in dicts:
+                store.append(sentence["text"], sentence["start"], sentence["end"],
+                             sentence["themes"], sentence["speaker"])
+            return store
+
+        _, store_bytes = allocated_bytes(build_store)
+
+        def filter_dicts():
+            for selected, show_none in selections:
+                baseline_filter(dicts, selected, show_none)
+
+        baseline = self.measure(filter_dicts)
+        result["baseline_seconds"] = baseline["median"]
+        result["speedup"] = baseline["median"] / result["median"]
+        result["memory_bytes"] = store_bytes
+        result["baseline_memory_bytes"] = dicts_bytes
+        self.log(f"  lista de dicts: {baseline['median'] * 1000:.1f} ms ({result['speedup']:.1f}x), "
+                 f"{dicts_bytes / 1e6:.1f} MB contra {store_bytes / 1e6:.1f} MB do SentenceStore")
+        return result
+
+    def bench_custom_topic(self):
+        """add_custom_topic sem diálogo: análise do novo tema sobre o token_store"""
+        sentences = self.require_sentences()
+        topic = "Tema Benchmark"
+
+        def add_topic():
+            self.analyzer.topic_related_words[topic] = ["polícia"]
+            self.analyzer.refresh_topic_themes(sentences, self.token_store, [topic])
+
+        try:
+            return self.measure(add_topic, ("sentences", len(sentences)))
+        finally:
+            self.analyzer.topic_related_words.pop(topic, None)
+            sentences.clear_topic(topic)
+
+    def bench_pdf(self):
+        """generate_pdf_report sem diálogo: relatório da transcrição analisada"""
+        sentences = self.require_sentences()
+        topics = [topic for topic in self.analyzer.topic_related_words if topic != "Nenhum"]
+        pdf_path = os.path.join(self.work_directory, "report.pdf")
+        return self.measure(
+            lambda: self.analyzer.write_pdf_report(pdf_path, self.audio_path, "0" * 64, sentences, topics),
+            ("sentences", len(sentences))
+        )
+
+    def bench_pdf_size(self, n_sentences):
+        """Relatório PDF de uma transcrição sintética de tamanho fixo, sem o spaCy"""
+        sentences = fixture_sentences(n_sentences, self.analyzer.topic_related_words, self.seed)
+        topics = [topic for topic in self.analyzer.topic_related_words if topic != "Nenhum"]
+        pdf_path = os.path.join(self.work_directory, f"report_{n_sentences}.pdf")
+        return self.measure(
+            lambda: self.analyzer.write_pdf_report(pdf_path, self.audio_path, "0" * 64, sentences, topics),
+            ("sentences", n_sentences)
+        )
+
+    def bench_pdf_100(self):
+        return self.bench_pdf_size(100)
+
+    def bench_pdf_1000(self):
+        return self.bench_pdf_size(1000)
+
+    def bench_pdf_10000(self):
+        return self.bench_pdf_size(10000)
+
+    def bench_search(self, n_recordings=40, n_sentences=2000):
+        """
+        Buscas por palavras, frase, proximidade, semelhança e tema em um índice de
+        n_recordings gravações sintéticas (cerca de 2 horas cada), sem o spaCy.
+        """
+        index = SearchIndex(os.path.join(self.work_directory, "search_index"))
+        for recording in range(n_recordings):
+            sentences = fixture_sentences(n_sentences, self.analyzer.topic_related_words, self.seed + recording)
+            index.add_recording(f"{recording:064x}", f"gravacao{recording}.wav", sentences,
+                                fixture_token_store(sentences))
+        query = SentenceStore()
+        query.append("dinheiro polícia", 0.0, 1.0, {})
+        query_vector = fixture_token_store(query).vectors.sum(axis=0)
+        queries = [
+            ("dinheiro carro", "keywords", None),
+            ("não vai", "phrase", None),
+            ("dinheiro telefone", "near", None),
+            ("", "semantic", None),
+            ("dinheiro", "keywords", ["Drogas", "Armas"])
+        ]
+
+        def search_all():
+            for query, mode, topics in queries:
+                index.search(query, mode, topics, query_vector=query_vector)
+
+        result = self.measure(search_all, ("queries", len(queries)))
+        result["indexed_hours"] = sum(entry["duration"] for entry in index.recordings) / 3600
+        return result
+
+    def bench_playback(self, clicks=20):
+        """
+        Latência do clique ao som com o PcmPlayer da interface: cada clique toca só o
+        primeiro bloco do trecho e a etapa espera o canal esvaziar. O mixer só libera
+        o canal depois de consumir o bloco inteiro, então o som começou em
+        (fim - duração do bloco), e ainda passa pelo buffer do dispositivo
+        (MIXER_BUFFER amostras). A mediana tem um limite absoluto
+        (PLAYBACK_LATENCY_LIMIT), além da comparação com a linha de base.
+        """
+        samples = self.load_samples()
+        try:
+            import pygame
+            from raio import MIXER_BUFFER, PcmPlayer, init_mixer
+        except ImportError as e:
+            raise StageSkipped(f"dependência da interface indisponível: {e}")
+        try:
+            init_mixer()
+        except pygame.error as e:
+            raise StageSkipped(f"mixer do pygame indisponível: {e}")
+
+        try:
+            player = PcmPlayer(samples)
+            channel = pygame.mixer.Channel(0)
+            block_seconds = player.first_block_samples / PCM_SAMPLE_RATE
+            device_seconds = MIXER_BUFFER / PCM_SAMPLE_RATE
+            duration = len(samples) / PCM_SAMPLE_RATE
+            latencies = []
+            busy = []
+            for click in range(clicks):
+                start_time = (duration - block_seconds) * click / clicks
+                requested = time.perf_counter()
+                player.play(start_time, start_time + block_seconds)
+                while not channel.get_busy() and time.perf_counter() - requested < 1.0:
+                    time.sleep(0.0005)
+                busy.append(time.perf_counter() - requested)
+                while channel.get_busy():
+                    time.sleep(0.0005)
+                finished = time.perf_counter() - requested
+                latencies.append(max(finished - block_seconds, 0.0) + device_seconds)
+            player.stop()
+        finally:
+            pygame.mixer.quit()
+
+        median = statistics.median(latencies)
+        return {
+            "status": "ok",
+            "median": median,
+            "min": min(latencies),
+            "mean": statistics.mean(latencies),
+            "runs": latencies,
+            "queued_median": statistics.median(busy),
+            "limit": PLAYBACK_LATENCY_LIMIT
+        }
+
+    def run(self, stages=STAGES):
+        """Executa as etapas e retorna o dict de resultados gravado em JSON"""
+        self.prepare()
+        results = {}
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            try:
+                result = getattr(self, f"bench_{stage}")()
+            except StageSkipped as e:
+                result = {"status": "skipped", "reason": str(e)}
+            except Exception as e:
+                result = {"status": "error", "reason": f"{type(e).__name__}: {e}"}
+            results[stage] = result
+
+            if result["status"] == "ok":
+                message = f"{stage}: {result['median'] * 1000:.1f} ms"
+                if result.get("throughput"):
+                    message += f" ({result['throughput']:.1f} {result['units']}/s)"
+            else:
+                message = f"{stage}: {result['status']} ({result['reason']})"
+            self.log(message)
+
+        return {
+            "version": BENCHMARK_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "numpy": np.__version__
+            },
+            "config": {
+                "repeat": self.repeat,
+                "audio": os.path.basename(self.audio_path),
+                "audio_seconds": None if self.samples is None else len(self.samples) / PCM_SAMPLE_RATE,
+                "sentences": len(self.transcript),
+                "model": self.analyzer.model_name,
+                "nlp_model": self.analyzer.nlp_model_name,
+                "seed": self.seed
+            },
+            "stages": results
+        }
+
+
+def compare(results, baseline, threshold=0.10, min_delta=0.001):
+    """
+    Compara as medianas com a linha de base. Uma etapa regride quando fica mais de
+    threshold (fração) mais lenta e a diferença passa de min_delta segundos, para que
+    o ruído de etapas de frações de milissegundo não acuse regressão.
+    Retorna {etapa: {"baseline", "current", "ratio", "regression"}}.
+    """
+    comparison = {}
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if current.get("status") != "ok" or not previous or previous.get("status") != "ok":
+            continue
+        ratio = current["median"] / previous["median"] if previous["median"] > 0 else float("inf")
+        comparison[stage] = {
+            "baseline": previous["median"],
+            "current": current["median"],
+            "ratio": ratio,
+            "regression": ratio > 1.0 + threshold and current["median"] - previous["median"] > min_delta
+        }
+    return comparison
+
+
+def write_results(path, results):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark das etapas do RAIO, sem interface gráfica."
+    )
+    parser.add_argument("-o", "--output", default="benchmark.json",
+                        help="arquivo JSON dos resultados (padrão: benchmark.json)")
+    parser.add_argument("--baseline",
+                        help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="fração de lentidão aceita antes de acusar regressão (padrão: 0.10)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="grava os resultados também no arquivo de --baseline")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="etapas a executar (padrão: todas)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="execuções de cada etapa (padrão: 3)")
+    parser.add_argument("--seconds", type=float, default=120,
+                        help="duração da gravação sintética (padrão: 120)")
+    parser.add_argument("--sentences", type=int, default=2000,
+                        help="sentenças da transcrição sintética (padrão: 2000)")
+    parser.add_argument("--audio", help="usa este arquivo de áudio no lugar do sintético")
+    parser.add_argument("--transcript",
+                        help="JSON com os segmentos (lista ou {\"segments\": [...]}) no lugar da transcrição sintética")
+    parser.add_argument("-m", "--model", default="tiny", choices=WHISPER_MODELS,
+                        help="modelo do Whisper da etapa de transcrição (padrão: tiny)")
+    parser.add_argument("--nlp-model", default="pt_core_news_md",
+                        help="modelo do spaCy (padrão: pt_core_news_md)")
+    parser.add_argument("--reference",
+                        help="transcrição de referência do áudio (texto ou JSON de segmentos) para o WER")
+    parser.add_argument("--transcription-workers", nargs="+", type=int, default=[1, 4, 16],
+                        help="números de processos da etapa transcription_parallel (padrão: 1 4 16)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error("--save-baseline exige --baseline")
+
+    work_directory = tempfile.mkdtemp(prefix="raio-bench-")
+    try:
+        # Caches em diretório temporário: as medições não dependem de execuções anteriores
+        analyzer = AudioAnalyzer(args.model, work_directory)
+        analyzer.nlp_model_name = args.nlp_model
+        suite = BenchmarkSuite(
+            analyzer,
+            work_directory,
+            repeat=args.repeat,
+            audio_seconds=args.seconds,
+            n_sentences=args.sentences,
+            audio_path=args.audio,
+            transcript_path=args.transcript,
+            seed=args.seed,
+            transcription_workers=args.transcription_workers,
+            reference_path=args.reference
+        )
+        results = suite.run(args.stages)
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    status = 0
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline, args.threshold)
+        results["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "stages": comparison}
+        for stage, item in comparison.items():
+            flag = "REGRESSÃO" if item["regression"] else "ok"
+            print(f"{stage}: {item['baseline'] * 1000:.1f} ms -> {item['current'] * 1000:.1f} ms "
+                  f"({item['ratio']:.2f}x) {flag}")
+        if any(item["regression"] for item in comparison.values()):
+            status = 1
+
+    # Etapas com limite absoluto (latência da reprodução) regridem mesmo sem linha de base
+    for stage, result in results["stages"].items():
+        if result.get("status") == "ok" and result.get("limit") is not None and result["median"] > result["limit"]:
+            print(f"{stage}: {result['median'] * 1000:.1f} ms acima do limite de "
+                  f"{result['limit'] * 1000:.0f} ms REGRESSÃO")
+            status = 1
+
+    write_results(args.output, results)
+    if args.save_baseline and status == 0:
+        write_results(args.baseline, results)
+    print(f"Resultados gravados em {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
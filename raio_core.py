@@ -0,0 +1,3204 @@
+import os
+import re
+import sys
+import unicodedata
+import shutil
+import itertools
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+import numpy as np
+import hashlib
+from fpdf import FPDF
+from datetime import datetime
+import json
+import time
+import threading
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS nos traces
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: travas de arquivo com msvcrt
+    fcntl = None
+    import msvcrt
+
+
+class TraceSpan:
+    """Trecho em medição; counts guarda contagens de itens (sentenças, tokens...)"""
+
+    __slots__ = ("name", "counts", "discarded")
+
+    def __init__(self, name, counts):
+        self.name = name
+        self.counts = counts
+        self.discarded = False
+
+    def count(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def discard(self):
+        """Descarta o trecho: nada é registrado ao sair do bloco"""
+        self.discarded = True
+
+
+class _NullSpan:
+    """Trecho usado com o rastreamento desligado: não mede nada"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, **counts):
+        pass
+
+    def discard(self):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB (None se indisponível)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Tracer:
+    """
+    Rastreamento das etapas do processamento. Cada span registra tempo de parede,
+    tempo de CPU do processo e da thread, pico de RSS e contagens de itens.
+    Desligado, span() devolve sempre o mesmo objeto vazio, sem medir nada.
+    Os eventos seguem o formato "X" do Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.events = []
+
+    def span(self, name, **counts):
+        if not self.enabled:
+            return NULL_SPAN
+        return self._span(name, counts)
+
+    @contextmanager
+    def _span(self, name, counts):
+        span = TraceSpan(name, counts)
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        thread_cpu_started = time.thread_time()
+        try:
+            yield span
+        finally:
+            ended = time.perf_counter()
+            if not span.discarded:
+                # list.append é atômico: spans de threads diferentes não precisam de lock
+                self.events.append({
+                    "name": name,
+                    "cat": "raio",
+                    "ph": "X",
+                    "ts": (started - self.origin) * 1e6,
+                    "dur": (ended - started) * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": dict(
+                        span.counts,
+                        cpu_ms=(time.process_time() - cpu_started) * 1000,
+                        thread_cpu_ms=(time.thread_time() - thread_cpu_started) * 1000,
+                        peak_rss_mb=peak_rss_mb()
+                    )
+                })
+
+    def mark(self):
+        """Posição atual, para resumir só os spans registrados depois dela"""
+        return len(self.events)
+
+    def summary(self, since=0):
+        """Totais por etapa, na ordem em que cada uma apareceu pela primeira vez"""
+        stages = {}
+        for event in self.events[since:]:
+            stage = stages.setdefault(event["name"], {
+                "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": None, "counts": {}
+            })
+            args = event["args"]
+            stage["calls"] += 1
+            stage["wall_s"] += event["dur"] / 1e6
+            stage["cpu_s"] += args["cpu_ms"] / 1000
+            if args["peak_rss_mb"] is not None:
+                stage["peak_rss_mb"] = max(stage["peak_rss_mb"] or 0.0, args["peak_rss_mb"])
+            for key, value in args.items():
+                if key not in ("cpu_ms", "thread_cpu_ms", "peak_rss_mb"):
+                    stage["counts"][key] = stage["counts"].get(key, 0) + value
+        return stages
+
+    def format_summary(self, since=0):
+        """Resumo em texto, uma linha por etapa"""
+        lines = []
+        for name, stage in self.summary(since).items():
+            line = f"{name}: {stage['wall_s']:.2f}s (CPU {stage['cpu_s']:.2f}s"
+            if stage["peak_rss_mb"] is not None:
+                line += f", pico RSS {stage['peak_rss_mb']:.0f} MB"
+            line += ")"
+            if stage["calls"] > 1:
+                line += f" x{stage['calls']}"
+            if stage["counts"]:
+                line += " " + ", ".join(f"{key}={value}" for key, value in stage["counts"].items())
+            lines.append(line)
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Grava os eventos em JSON no formato do Chrome trace, com o resumo em otherData"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = temporary_path(path)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {"summary": self.summary()}
+            }, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        return path
+
+
+class TopicIndex:
+    """
+    Índice vetorial dos temas sensíveis.
+    Guarda uma única matriz L2-normalizada com os vetores de cada tema e de suas
+    palavras relacionadas, agrupados por tema, para que os tokens de uma sentença
+    sejam comparados com todos os temas em um único produto de matrizes.
+    """
+
+    def __init__(self, nlp, topic_related_words, disable=()):
+        self.key = self.make_key(topic_related_words)
+        rows = []
+        row_topics = []
+        for topic, related_words in topic_related_words.items():
+            # Mesmo critério do cálculo original: primeiro token do tema e de cada palavra
+            for doc in nlp.pipe([topic] + list(related_words), disable=list(disable)):
+                if doc[0].has_vector:
+                    rows.append(doc[0].vector)
+                    row_topics.append(topic)
+
+        # Temas sem nenhum vetor nunca são detectados e ficam fora da matriz
+        self.topics = list(dict.fromkeys(row_topics))
+        self.segment_starts = np.array(
+            [row_topics.index(topic) for topic in self.topics], dtype=np.intp
+        )
+        if rows:
+            self.matrix = normalize_rows(np.asarray(rows, dtype=np.float32))
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def make_key(topic_related_words):
+        """Chave que muda sempre que os temas ou suas palavras relacionadas mudam"""
+        return tuple((topic, tuple(words)) for topic, words in topic_related_words.items())
+
+    def score(self, vectors, normalized=False):
+        """
+        Retorna a matriz (tokens x temas) com a maior similaridade de cada token
+        com o tema ou qualquer uma de suas palavras relacionadas.
+        """
+        if not len(self.topics) or not len(vectors):
+            return np.zeros((len(vectors), len(self.topics)), dtype=np.float32)
+        if not normalized:
+            vectors = normalize_rows(vectors)
+        similarities = vectors @ self.matrix.T
+        return np.maximum.reduceat(similarities, self.segment_starts, axis=1)
+
+
+def save_strings(directory, name, strings):
+    """
+    Grava uma lista de textos como um único blob UTF-8 (<name>.txt) e um array
+    com a posição, em caracteres, do início de cada texto (<name>_offsets.npy).
+    """
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in strings], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8", newline="") as f:
+        f.write("".join(strings))
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+def load_strings(directory, name):
+    """Lê os textos gravados por save_strings (uma leitura e um fatiamento por texto)"""
+    with open(os.path.join(directory, f"{name}.txt"), "r", encoding="utf-8", newline="") as f:
+        blob = f.read()
+    offsets = np.load(os.path.join(directory, f"{name}_offsets.npy")).tolist()
+    return [blob[first:last] for first, last in zip(offsets, offsets[1:])]
+
+
+def load_array(directory, name):
+    """Mapeia em memória um .npy de um caso salvo (copy-on-write: o arquivo não é alterado)"""
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="c")
+
+
+def temporary_path(path, suffix=".tmp"):
+    """
+    Nome temporário ao lado de path, para gravar e depois mover com os.replace.
+    Inclui o processo e a thread: gravações simultâneas do mesmo arquivo (threads
+    do servidor, processos do lote) não usam o mesmo temporário.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}{suffix}"
+
+
+def replace_directory(temp_path, path):
+    """Coloca o diretório temp_path no lugar de path (os.replace não substitui diretórios)"""
+    if os.path.exists(path):
+        old_path = temporary_path(path, ".old")
+        os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(temp_path, path)
+
+
+class TokenStore:
+    """
+    Tokens candidatos de uma transcrição, já analisados pelo spaCy.
+    Guarda apenas os tokens com vetor que não são stop words nem pontuação:
+    texto, sentença de origem, posição na sentença e uma matriz float32 de
+    vetores normalizados. Novos temas são testados sobre a transcrição inteira
+    com um único produto de matrizes, sem analisar as sentenças novamente.
+    """
+
+    def __init__(self, docs):
+        self.words = []
+        sentence_ids = []
+        offsets = []
+        vectors = []
+        self.n_sentences = 0
+        for sentence_idx, doc in enumerate(docs):
+            self.n_sentences += 1
+            for token in doc:
+                if token.has_vector and not token.is_stop and not token.is_punct:
+                    self.words.append(token.text)
+                    sentence_ids.append(sentence_idx)
+                    offsets.append(token.idx)
+                    vectors.append(token.vector)
+
+        self.sentence_ids = np.array(sentence_ids, dtype=np.int32)
+        self.offsets = np.array(offsets, dtype=np.int32)
+        if vectors:
+            self.vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        else:
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    @classmethod
+    def concat(cls, stores):
+        """Junta stores de lotes consecutivos de sentenças em um único store"""
+        store = cls([])
+        sentence_ids = []
+        for part in stores:
+            store.words.extend(part.words)
+            sentence_ids.append(part.sentence_ids + store.n_sentences)
+            store.n_sentences += part.n_sentences
+        
+        parts = [part for part in stores if part.words]
+        if parts:
+            store.sentence_ids = np.concatenate(sentence_ids).astype(np.int32)
+            store.offsets = np.concatenate([part.offsets for part in parts])
+            store.vectors = np.concatenate([part.vectors for part in parts])
+        return store
+
+    def save(self, directory):
+        """Grava os tokens em directory; retorna os metadados para o manifesto do caso"""
+        save_strings(directory, "token_words", self.words)
+        np.save(os.path.join(directory, "token_sentence_ids.npy"), self.sentence_ids)
+        np.save(os.path.join(directory, "token_offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "token_vectors.npy"), self.vectors)
+        return {"n_sentences": self.n_sentences}
+
+    @classmethod
+    def load(cls, directory, metadata):
+        """Reabre os tokens gravados por save, com os arrays mapeados em memória"""
+        store = cls([])
+        store.n_sentences = metadata["n_sentences"]
+        store.words = load_strings(directory, "token_words")
+        store.sentence_ids = load_array(directory, "token_sentence_ids")
+        store.offsets = load_array(directory, "token_offsets")
+        store.vectors = load_array(directory, "token_vectors")
+        return store
+
+    def match(self, topic_index, threshold, topics=None, cache=None):
+        """
+        Compara todos os tokens da transcrição com os temas do índice.
+        Retorna uma lista com um dict {tema: [palavras similares]} por sentença.
+        """
+        themes = [{} for _ in range(self.n_sentences)]
+        if not self.words:
+            return themes
+        decisions = self.decide(topic_index, threshold, cache)
+        for word, sentence_idx in zip(self.words, self.sentence_ids):
+            for topic in decisions[word]:
+                if topics is not None and topic not in topics:
+                    continue
+                # Evita duplicatas mantendo a ordem em que aparecem no texto
+                words = themes[sentence_idx].setdefault(topic, [])
+                if word not in words:
+                    words.append(word)
+        return themes
+
+    def decide(self, topic_index, threshold, cache=None):
+        """
+        Decide quais temas cada palavra distinta da transcrição atinge.
+        Palavras já presentes no cache não são comparadas novamente; as demais
+        são comparadas com todos os temas em um único produto de matrizes.
+        Retorna um dict {palavra: {tema: similaridade máxima}}.
+        """
+        first_rows = {}
+        for row, word in enumerate(self.words):
+            first_rows.setdefault(word, row)
+        
+        decisions = {}
+        missing = []
+        for word in first_rows:
+            cached = cache.get(word) if cache is not None else None
+            if cached is None:
+                missing.append(word)
+            else:
+                decisions[word] = cached
+        
+        if missing:
+            rows = [first_rows[word] for word in missing]
+            scores = topic_index.score(self.vectors[rows], normalized=True)
+            for word, word_scores in zip(missing, scores):
+                decisions[word] = {
+                    topic_index.topics[col]: float(word_scores[col])
+                    for col in np.flatnonzero(word_scores > threshold)
+                }
+                if cache is not None:
+                    cache.put(word, decisions[word])
+        return decisions
+
+
+class WordTopicCache:
+    """
+    Cache persistente das decisões palavra -> temas.
+    Para cada palavra (em minúsculas) guarda os temas que ela atinge e a
+    similaridade máxima com cada um. Fica em memória com descarte LRU e é
+    salvo em disco entre execuções. O conteúdo é descartado automaticamente
+    quando a chave (modelo do spaCy, limiar e palavras dos temas) muda.
+    As decisões ainda não salvas podem ser entregues a outro processo
+    (take_unsaved/merge), para que só um processo grave o arquivo.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.unsaved = {}
+        self.key = None
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def make_key(nlp, similarity_threshold, topic_related_words):
+        """Resumo de tudo que influencia as decisões guardadas no cache"""
+        model = f'{nlp.meta.get("lang")}_{nlp.meta.get("name")}-{nlp.meta.get("version")}'
+        content = json.dumps(
+            [model, similarity_threshold, TopicIndex.make_key(topic_related_words)],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def validate(self, key):
+        """Descarta as entradas se foram calculadas com outra configuração"""
+        if key != self.key:
+            self.entries.clear()
+            self.unsaved.clear()
+            self.key = key
+
+    def get(self, word):
+        decision = self.entries.get(word)
+        if decision is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(word)
+        self.hits += 1
+        return decision
+
+    def put(self, word, decision):
+        self.entries[word] = decision
+        self.entries.move_to_end(word)
+        self.unsaved[word] = decision
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def take_unsaved(self):
+        """Decisões calculadas desde o último save (ou take_unsaved), que deixam de ser pendentes"""
+        unsaved, self.unsaved = self.unsaved, {}
+        return unsaved
+
+    def merge(self, key, decisions):
+        """Acrescenta decisões calculadas em outro processo com a chave informada"""
+        self.validate(key)
+        for word, decision in decisions.items():
+            self.put(word, decision)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def load(self):
+        """Carrega o cache salvo em disco (um arquivo inválido é ignorado)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.key = data["key"]
+            self.entries = OrderedDict(data["entries"][-self.max_entries:])
+        except Exception as e:
+            print(f"Error loading word cache: {e}")
+            self.entries = OrderedDict()
+            self.key = None
+
+    def save(self):
+        """Salva o cache em disco de forma atômica, na ordem LRU"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = temporary_path(self.path)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"key": self.key, "entries": list(self.entries.items())},
+                    f,
+                    ensure_ascii=False
+                )
+            os.replace(temp_path, self.path)
+            self.unsaved.clear()
+        except Exception as e:
+            print(f"Error saving word cache: {e}")
+
+
+class TranscriptionCache:
+    """
+    Cache em disco das transcrições do Whisper, endereçado pelo conteúdo.
+    A chave combina o hash SHA-256 do áudio, o nome do modelo e as opções de
+    decodificação; cada entrada é um arquivo JSON com os segmentos. O tamanho
+    total é limitado e as entradas menos usadas recentemente são descartadas.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(file_hash, model_name, options):
+        content = json.dumps([file_hash, model_name, options], sort_keys=True)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Retorna o resultado guardado para a chave, ou None se não existir"""
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # Marca a entrada como usada recentemente
+            return result
+        except Exception as e:
+            print(f"Error reading transcription cache: {e}")
+            return None
+
+    def put(self, key, result):
+        """Grava o resultado de forma atômica e aplica o limite de tamanho"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.entry_path(key)
+            temp_path = temporary_path(path)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+            self.evict()
+        except Exception as e:
+            print(f"Error writing transcription cache: {e}")
+
+    def evict(self):
+        """Remove as entradas mais antigas até o cache caber em max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+
+class TranscriptionCheckpoint:
+    """
+    Ponto de retomada de uma transcrição em andamento, em JSON Lines.
+    Cada linha corresponde a uma janela de 30 s já decodificada pelo Whisper, com a
+    posição (em segundos) até onde o áudio foi transcrito, o idioma e os segmentos
+    novos da janela. Gravar uma janela é só acrescentar uma linha ao arquivo; uma
+    linha incompleta no fim (queda no meio da gravação) é ignorada na leitura.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Retorna (segmentos, posição em segundos, idioma) das janelas já gravadas"""
+        segments = []
+        position = 0.0
+        language = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        window = json.loads(line)
+                    except ValueError:
+                        break
+                    segments.extend(window["segments"])
+                    position = window["position"]
+                    language = window["language"]
+        except FileNotFoundError:
+            pass
+        return segments, position, language
+
+    def read_position(self, offset=0, position=0.0):
+        """
+        Lê só as linhas completas gravadas a partir de offset (em bytes).
+        Retorna (novo offset, posição), para acompanhar o progresso sem reler o arquivo.
+        """
+        try:
+            if os.path.getsize(self.path) <= offset:
+                return offset, position
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return offset, position
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                position = json.loads(line)["position"]
+            except ValueError:
+                break
+        return offset + end, position
+
+    def append(self, position, language, segments):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        line = json.dumps(
+            {"position": position, "language": language, "segments": segments},
+            ensure_ascii=False
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TranscriptionCancelled(Exception):
+    """Transcrição interrompida pelo usuário; as janelas concluídas ficam no checkpoint"""
+
+
+# Janelas do Whisper: 30 s de áudio, marcas de tempo com resolução de 20 ms
+WHISPER_WINDOW_SECONDS = 30
+WHISPER_TIME_PRECISION = 0.02
+
+# Opções tratadas pelo laço de janelas, com os padrões de whisper.transcribe;
+# as demais (beam_size, best_of, patience, fp16...) vão para whisper.DecodingOptions
+WHISPER_LOOP_DEFAULTS = {
+    "language": None,
+    "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+    "compression_ratio_threshold": 2.4,
+    "logprob_threshold": -1.0,
+    "no_speech_threshold": 0.6,
+    "condition_on_previous_text": True,
+    "initial_prompt": None
+}
+
+
+def _offset_segments(segments, offset):
+    """Desloca os tempos dos segmentos (e das palavras) em offset segundos"""
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return segments
+
+
+def decode_window(model, audio, options, prompt=None, language=None):
+    """
+    Decodifica uma janela de até 30 s com whisper.decode, repetindo com temperaturas
+    maiores enquanto o resultado parecer repetitivo (compression_ratio) ou improvável
+    (avg_logprob), como whisper.transcribe. Retorna o DecodingResult.
+    """
+    import torch
+    import whisper
+    settings = dict(WHISPER_LOOP_DEFAULTS, **options)
+    decode_options = {key: value for key, value in options.items() if key not in WHISPER_LOOP_DEFAULTS}
+    decode_options.setdefault("fp16", False)  # Inferência na CPU
+    temperatures = settings["temperature"]
+    if isinstance(temperatures, (int, float)):
+        temperatures = (temperatures,)
+    
+    window = whisper.pad_or_trim(torch.from_numpy(np.array(audio, dtype=np.float32)))
+    mel = whisper.log_mel_spectrogram(window, model.dims.n_mels)
+    
+    result = None
+    for temperature in temperatures:
+        kwargs = dict(decode_options)
+        if temperature > 0:
+            kwargs.pop("beam_size", None)
+            kwargs.pop("patience", None)
+        else:
+            kwargs.pop("best_of", None)
+        result = whisper.decode(model, mel, whisper.DecodingOptions(
+            task="transcribe",
+            language=language,
+            prompt=prompt,
+            temperature=temperature,
+            **kwargs
+        ))
+        if settings["no_speech_threshold"] is not None and result.no_speech_prob > settings["no_speech_threshold"]:
+            break  # Silêncio: nova temperatura não ajuda
+        too_repetitive = (settings["compression_ratio_threshold"] is not None
+                          and result.compression_ratio > settings["compression_ratio_threshold"])
+        too_unlikely = (settings["logprob_threshold"] is not None
+                        and result.avg_logprob < settings["logprob_threshold"])
+        if not too_repetitive and not too_unlikely:
+            break
+    return result
+
+
+def window_segments(tokenizer, result, offset, window_seconds):
+    """
+    Segmentos de uma janela decodificada, pelos pares de marcas de tempo dos tokens,
+    e quantos segundos a janela avançou. Como no whisper.transcribe, a janela só
+    avança até a última marca de tempo fechada, a não ser que termine numa marca
+    isolada (a fala da janela acabou): o trecho depois dela é decodificado de novo
+    no início da janela seguinte.
+    """
+    tokens = list(result.tokens)
+    timestamp_begin = tokenizer.timestamp_begin
+    is_timestamp = [token >= timestamp_begin for token in tokens]
+    single_ending = is_timestamp[-2:] == [False, True]
+    boundaries = [idx for idx in range(1, len(tokens)) if is_timestamp[idx] and is_timestamp[idx - 1]]
+    
+    def make_segment(start, end, segment_tokens):
+        text_tokens = [token for token in segment_tokens if token < timestamp_begin]
+        return {
+            "seek": round(offset * 100),
+            "start": offset + start,
+            "end": offset + end,
+            "text": tokenizer.decode(text_tokens),
+            "tokens": text_tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob
+        }
+    
+    segments = []
+    if boundaries:
+        if single_ending:
+            boundaries.append(len(tokens))
+        last = 0
+        for current in boundaries:
+            sliced = tokens[last:current]
+            segments.append(make_segment(
+                (sliced[0] - timestamp_begin) * WHISPER_TIME_PRECISION,
+                (sliced[-1] - timestamp_begin) * WHISPER_TIME_PRECISION,
+                sliced
+            ))
+            last = current
+        advance = window_seconds
+        if not single_ending:
+            advance = (tokens[last - 1] - timestamp_begin) * WHISPER_TIME_PRECISION
+    else:
+        # Sem pares de marcas: um único segmento até a última marca (ou a janela toda)
+        duration = window_seconds
+        timestamps = [token for token in tokens if token >= timestamp_begin]
+        if timestamps and timestamps[-1] != timestamp_begin:
+            duration = (timestamps[-1] - timestamp_begin) * WHISPER_TIME_PRECISION
+        segments.append(make_segment(0.0, duration, tokens))
+        advance = window_seconds
+    
+    segments = [segment for segment in segments
+                if segment["end"] > segment["start"] and segment["text"].strip()]
+    return segments, advance if advance > 0 else window_seconds
+
+
+def transcribe_resumable(model, audio, options, checkpoint, progress_callback=None):
+    """
+    Transcreve o áudio janela a janela pela API pública do Whisper (decode_window),
+    gravando cada janela concluída no checkpoint. Só a janela em curso (30 s) é
+    copiada do PCM mapeado, então a memória não cresce com a duração da gravação.
+    Se o checkpoint já tiver janelas, a transcrição recomeça da última posição
+    gravada; o texto das últimas janelas é o prompt da seguinte, como com
+    condition_on_previous_text no whisper.transcribe.
+    O progress_callback é chamado depois de cada janela ser gravada; para
+    cancelar, basta ele lançar uma exceção: perde-se no máximo a janela em curso.
+    """
+    import whisper.tokenizer
+    progress_callback = progress_callback or (lambda fraction: None)
+    settings = dict(WHISPER_LOOP_DEFAULTS, **options)
+    segments, position, language = checkpoint.load()
+    language = settings["language"] or language
+    duration = len(audio) / PCM_SAMPLE_RATE
+    if segments and duration:
+        progress_callback(min(position / duration, 1.0))
+    
+    # Segmentos usados no prompt: reiniciado depois de janelas com temperatura alta
+    prompt_since = 0
+    while position < duration:
+        start = round(position * PCM_SAMPLE_RATE)
+        window_seconds = min(WHISPER_WINDOW_SECONDS, (len(audio) - start) / PCM_SAMPLE_RATE)
+        
+        prompt = settings["initial_prompt"] if not segments else None
+        if segments and settings["condition_on_previous_text"]:
+            # O whisper usa no máximo os últimos 223 tokens do prompt
+            prompt = "".join(segment["text"] for segment in segments[prompt_since:][-20:]) or None
+        
+        result = decode_window(
+            model,
+            audio[start:start + round(WHISPER_WINDOW_SECONDS * PCM_SAMPLE_RATE)],
+            options,
+            prompt,
+            language
+        )
+        language = language or result.language
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            model.is_multilingual,
+            num_languages=model.num_languages,
+            language=language,
+            task="transcribe"
+        )
+        
+        if (settings["no_speech_threshold"] is not None
+                and result.no_speech_prob > settings["no_speech_threshold"]
+                and (settings["logprob_threshold"] is None
+                     or result.avg_logprob <= settings["logprob_threshold"])):
+            new_segments, advance = [], window_seconds  # Janela sem fala
+        else:
+            new_segments, advance = window_segments(tokenizer, result, position, window_seconds)
+        if result.temperature > 0.5:
+            prompt_since = len(segments) + len(new_segments)
+        
+        position = min(position + advance, duration)
+        checkpoint.append(position, language, new_segments)
+        segments.extend(new_segments)
+        progress_callback(min(position / duration, 1.0))
+    
+    for idx, segment in enumerate(segments):
+        segment["id"] = idx
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language
+    }
+
+
+def whisper_checkpoint_available(model_name):
+    """Indica se o modelo do Whisper já está em disco, sem acessar a rede"""
+    import whisper
+    if os.path.isfile(model_name):
+        return True
+    url = whisper._MODELS.get(model_name)
+    if url is None:
+        return False
+    default = os.path.join(os.path.expanduser("~"), ".cache")
+    download_root = os.path.join(os.getenv("XDG_CACHE_HOME", default), "whisper")
+    return os.path.exists(os.path.join(download_root, os.path.basename(url)))
+
+
+# Formato do PCM decodificado, o mesmo usado pelo Whisper: mono, 16 kHz, float32
+PCM_SAMPLE_RATE = 16000
+
+def decode_to_pcm(filename, path, block_size=1 << 20):
+    """
+    Decodifica o áudio uma única vez com o ffmpeg para um arquivo PCM bruto
+    (float32 mono a 16 kHz). A saída é gravada em blocos, sem manter o áudio
+    inteiro em memória; se o arquivo já existir, a decodificação é pulada.
+    """
+    if os.path.exists(path):
+        return path
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = temporary_path(path)
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", filename,
+        "-f", "f32le", "-ac", "1", "-ar", str(PCM_SAMPLE_RATE),
+        "-"
+    ]
+    with open(temp_path, "wb") as out, subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    ) as proc:
+        for block in iter(lambda: proc.stdout.read(block_size), b""):
+            out.write(block)
+        error = proc.stderr.read().decode(errors="replace")
+    
+    if proc.returncode != 0:
+        os.remove(temp_path)
+        raise RuntimeError(f"Falha ao decodificar o áudio: {error.strip()}")
+    os.replace(temp_path, path)
+    return path
+
+
+def open_pcm(path):
+    """
+    Mapeia o PCM em memória. Fatias do array são views sobre o arquivo,
+    lidas sob demanda pelo sistema operacional, sem cópias.
+    """
+    try:
+        os.utime(path)  # Marca a entrada do PcmCache como usada recentemente
+    except OSError:
+        pass
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    # "c" (copy-on-write) permite ao torch criar tensores sem avisos de escrita
+    return np.memmap(path, dtype=np.float32, mode="c")
+
+
+class PcmCache:
+    """
+    Diretório dos PCMs decodificados, um "<hash>.f32" por áudio, com os arquivos
+    derivados ao lado (como o envelope "<hash>.env.npy"). Cada hash é uma entrada:
+    o tamanho total é limitado e as entradas menos usadas recentemente (mtime,
+    renovado por open_pcm) são descartadas. O PCM ocupa cerca de 230 MB por hora
+    de áudio, por isso o limite padrão é maior que o das transcrições.
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, file_hash):
+        return os.path.join(self.directory, f"{file_hash}.f32")
+
+    def evict(self, keep=None):
+        """Remove as entradas mais antigas até o cache caber em max_bytes (exceto keep)"""
+        if not os.path.isdir(self.directory):
+            return
+        entries = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue  # Decodificação em andamento
+            stat = os.stat(os.path.join(self.directory, name))
+            mtime, size, names = entries.get(name.split(".")[0], (0.0, 0, []))
+            entries[name.split(".")[0]] = (max(mtime, stat.st_mtime), size + stat.st_size, names + [name])
+        
+        total = sum(size for _, size, _ in entries.values())
+        for file_hash, (_, size, names) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            if file_hash == keep:
+                continue
+            try:
+                for name in names:
+                    os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue  # Em uso por outro processo (Windows); fica para a próxima
+            total -= size
+
+
+class WaveformEnvelope:
+    """
+    Pirâmide de envelopes min/max da forma de onda.
+    O nível 0 guarda o mínimo e o máximo de cada bloco de base_block amostras e
+    cada nível seguinte combina pares de blocos do anterior. Para desenhar um
+    intervalo, escolhe-se o nível com cerca de um bloco por pixel, de modo que o
+    número de pontos desenhados não depende da duração do arquivo.
+    """
+
+    def __init__(self, levels, n_samples, sample_rate, base_block):
+        self.levels = levels
+        self.n_samples = n_samples
+        self.sample_rate = sample_rate
+        self.base_block = base_block
+
+    @staticmethod
+    def level_lengths(n_samples, base_block, top_size=1024):
+        lengths = [-(-n_samples // base_block)]
+        while lengths[-1] > top_size:
+            lengths.append(-(-lengths[-1] // 2))
+        return lengths
+
+    @classmethod
+    def build(cls, samples, sample_rate, base_block=256, chunk_blocks=65536):
+        """Calcula a pirâmide lendo o áudio em blocos, com operações vetorizadas"""
+        n_samples = len(samples)
+        n_full = n_samples // base_block
+        base = np.empty((cls.level_lengths(n_samples, base_block)[0], 2), dtype=np.float32)
+        
+        for first in range(0, n_full, chunk_blocks):
+            last = min(first + chunk_blocks, n_full)
+            blocks = np.asarray(samples[first * base_block:last * base_block]).reshape(-1, base_block)
+            base[first:last, 0] = blocks.min(axis=1)
+            base[first:last, 1] = blocks.max(axis=1)
+        if n_full < len(base):
+            tail = np.asarray(samples[n_full * base_block:])
+            base[n_full] = (tail.min(), tail.max())
+        
+        levels = [base]
+        for length in cls.level_lengths(n_samples, base_block)[1:]:
+            previous = levels[-1]
+            pairs = previous[:len(previous) // 2 * 2].reshape(-1, 2, 2)
+            level = np.empty((length, 2), dtype=np.float32)
+            level[:len(pairs), 0] = pairs[:, :, 0].min(axis=1)
+            level[:len(pairs), 1] = pairs[:, :, 1].max(axis=1)
+            if len(previous) % 2:
+                level[-1] = previous[-1]
+            levels.append(level)
+        return cls(levels, n_samples, sample_rate, base_block)
+
+    def save(self, path):
+        """Grava todos os níveis em um único .npy, que pode ser mapeado em memória"""
+        temp_path = temporary_path(path, ".tmp.npy")
+        np.save(temp_path, np.concatenate(self.levels))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, n_samples, sample_rate, base_block=256):
+        """Mapeia em memória uma pirâmide salva; retorna None se não corresponder ao áudio"""
+        lengths = cls.level_lengths(n_samples, base_block)
+        data = np.load(path, mmap_mode="r")
+        if len(data) != sum(lengths):
+            return None
+        bounds = np.cumsum([0] + lengths)
+        levels = [data[bounds[i]:bounds[i + 1]] for i in range(len(lengths))]
+        return cls(levels, n_samples, sample_rate, base_block)
+
+    @classmethod
+    def load_or_build(cls, samples, sample_rate, path, base_block=256):
+        """Reutiliza a pirâmide salva ao lado do áudio ou a calcula e salva"""
+        if os.path.exists(path):
+            try:
+                envelope = cls.load(path, len(samples), sample_rate, base_block)
+                if envelope is not None:
+                    return envelope
+            except Exception as e:
+                print(f"Error loading waveform envelope: {e}")
+        
+        envelope = cls.build(samples, sample_rate, base_block)
+        try:
+            envelope.save(path)
+        except Exception as e:
+            print(f"Error saving waveform envelope: {e}")
+        return envelope
+
+    def query(self, samples, start_time, end_time, pixels):
+        """
+        Retorna (x, y) para desenhar o intervalo com cerca de um bloco por pixel.
+        Cada bloco vira um traço vertical do mínimo ao máximo; com zoom suficiente,
+        as próprias amostras do PCM são devolvidas. Sem as amostras (samples=None,
+        caso reaberto antes de o PCM estar disponível), o nível 0 é o mais fino.
+        """
+        start = max(0, int(start_time * self.sample_rate))
+        end = min(self.n_samples, int(np.ceil(end_time * self.sample_rate)))
+        if end <= start:
+            return np.zeros(0), np.zeros(0)
+        
+        samples_per_pixel = (end - start) / max(pixels, 1)
+        if samples is None:
+            samples_per_pixel = max(samples_per_pixel, self.base_block)
+        if samples_per_pixel < 2:
+            # Zoom máximo: amostras originais (uma view do PCM)
+            return np.arange(start, end) / self.sample_rate, samples[start:end]
+        
+        if samples_per_pixel < self.base_block:
+            # Mais fino que o nível 0: calcula o envelope só do intervalo visível
+            block = int(samples_per_pixel)
+            start -= start % block
+            n_blocks = (end - start) // block
+            blocks = np.asarray(samples[start:start + n_blocks * block]).reshape(-1, block)
+            mins = blocks.min(axis=1)
+            maxs = blocks.max(axis=1)
+        else:
+            level = min(int(np.log2(samples_per_pixel / self.base_block)), len(self.levels) - 1)
+            block = self.base_block * 2 ** level
+            first = start // block
+            last = -(-end // block)
+            mins = self.levels[level][first:last, 0]
+            maxs = self.levels[level][first:last, 1]
+            start = first * block
+        
+        x = np.repeat((start + np.arange(len(mins)) * block) / self.sample_rate, 2)
+        y = np.column_stack([mins, maxs]).ravel()
+        return x, y
+
+
+# Modelos do Whisper disponíveis para seleção na interface
+WHISPER_MODELS = ["tiny", "base", "small", "medium"]
+
+
+def load_whisper_model(model_name, quantize_int8=False, threads=None):
+    """
+    Carrega o modelo do Whisper na CPU.
+    Com quantize_int8, as camadas lineares passam por quantização dinâmica int8,
+    reduzindo memória e tempo de inferência em troca de alguma perda de precisão.
+    threads fixa o número de threads intra-op do torch.
+    """
+    import torch
+    import whisper
+    if threads:
+        torch.set_num_threads(threads)
+    model = whisper.load_model(model_name, device="cpu")
+    if quantize_int8:
+        # O whisper usa uma subclasse de nn.Linear que a quantização dinâmica
+        # não reconhece; a subclasse só altera o cast de dtype no forward
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        model = torch.quantization.quantize_dynamic(
+            model,
+            {torch.nn.Linear},
+            dtype=torch.qint8
+        )
+    return model
+
+
+# Modelo do Whisper carregado uma única vez em cada processo do pool de transcrição
+_worker_model = None
+
+
+def _init_transcription_worker(model_name, threads, quantize_int8):
+    global _worker_model
+    _worker_model = load_whisper_model(model_name, quantize_int8, threads)
+
+
+def _transcribe_chunk(pcm_path, start, end, options, checkpoint_path, cancel_path):
+    """
+    Transcreve um trecho do PCM e desloca os tempos para a posição no arquivo.
+    Cada trecho tem seu próprio checkpoint; a existência de cancel_path interrompe
+    a transcrição ao fim da janela em curso.
+    """
+    def check_cancelled(fraction):
+        if os.path.exists(cancel_path):
+            raise TranscriptionCancelled()
+    
+    audio_chunk = open_pcm(pcm_path)[start:end]
+    offset = start / PCM_SAMPLE_RATE
+    result = transcribe_resumable(
+        _worker_model,
+        audio_chunk,
+        options,
+        TranscriptionCheckpoint(checkpoint_path),
+        check_cancelled
+    )
+    _offset_segments(result["segments"], offset)
+    return result["segments"], result["language"]
+
+
+def _comparable_words(text):
+    """Palavras do texto (separadas por espaço) sem pontuação e em minúsculas"""
+    return [re.sub(r"\W+", "", word.lower()) for word in text.split()]
+
+
+def _trim_overlap(previous, segment):
+    """
+    Remove do início do segmento o trecho que já está no segmento anterior.
+    Com marcas de tempo por palavra, o corte é feito no fim do anterior; sem elas,
+    retira as palavras iniciais que repetem o final do texto anterior. Retorna o
+    segmento ajustado ou None se ele não tiver nada novo.
+    """
+    cut = previous["end"]
+    if segment["end"] <= cut:
+        return None
+    
+    words = segment.get("words")
+    if words:
+        kept = [word for word in words if word["start"] >= cut]
+        if not kept:
+            return None
+        return dict(
+            segment,
+            start=kept[0]["start"],
+            text="".join(word["word"] for word in kept),
+            words=kept
+        )
+    
+    previous_words = _comparable_words(previous["text"])
+    segment_words = _comparable_words(segment["text"])
+    repeated = 0
+    for size in range(min(len(previous_words), len(segment_words)), 0, -1):
+        if previous_words[-size:] == segment_words[:size]:
+            repeated = size
+            break
+    if repeated == len(segment_words):
+        return None
+    if repeated == 0 and cut - segment["start"] > (segment["end"] - segment["start"]) / 2:
+        # Sem texto em comum e coberto na maior parte pelo anterior: é a mesma fala
+        return None
+    text = segment["text"].split()
+    return dict(segment, start=max(segment["start"], cut), text=" " + " ".join(text[repeated:]))
+
+
+def stitch_segments(chunks, overlap_seconds):
+    """
+    Junta os segmentos de trechos sobrepostos em uma lista única e ordenada.
+    chunks é uma lista ordenada de (início do trecho em segundos, segmentos).
+    Na sobreposição entre dois trechos, o anterior fica com os segmentos que começam
+    antes do ponto médio e o seguinte com os que terminam depois dele; um segmento
+    que começa antes do fim do último segmento mantido tem a parte repetida cortada
+    (por tempo, se houver marcas por palavra, ou pelas palavras repetidas no texto).
+    """
+    merged = []
+    last_chunk = None  # Trecho de onde veio o último segmento mantido
+    for idx, (offset, segments) in enumerate(chunks):
+        lower = -float("inf")
+        upper = float("inf")
+        if idx > 0:
+            lower = offset + overlap_seconds / 2
+        if idx + 1 < len(chunks):
+            upper = chunks[idx + 1][0] + overlap_seconds / 2
+        
+        for segment in segments:
+            if segment["end"] <= lower or segment["start"] >= upper:
+                continue
+            # Só segmentos de trechos diferentes se repetem; dentro de um trecho
+            # os tempos do Whisper são sequenciais
+            if last_chunk != idx and merged and segment["start"] < merged[-1]["end"]:
+                segment = _trim_overlap(merged[-1], segment)
+                if segment is None:
+                    continue
+            merged.append(segment)
+            last_chunk = idx
+    
+    for idx, segment in enumerate(merged):
+        segment["id"] = idx
+    return merged
+
+
+def transcribe_parallel(pcm_path, model_name, options, checkpoint_prefix, workers=4,
+                        chunk_seconds=300, overlap_seconds=5, progress_callback=None,
+                        quantize_int8=False):
+    """
+    Transcreve gravações longas dividindo o áudio em janelas sobrepostas que são
+    processadas em paralelo por um pool de processos, cada um com seu próprio modelo.
+    Cada processo lê seu trecho diretamente do PCM mapeado em memória e grava as
+    janelas concluídas em "<checkpoint_prefix>-<início>.jsonl", de onde o progresso
+    é lido e de onde uma nova execução retoma.
+    Se o progress_callback lançar uma exceção, os processos são avisados por um
+    arquivo "<checkpoint_prefix>.cancel" e param ao fim da janela em curso.
+    Retorna um dict no mesmo formato de model.transcribe ("text", "segments", "language").
+    """
+    audio = open_pcm(pcm_path)
+    sample_rate = PCM_SAMPLE_RATE
+    chunk_samples = int(chunk_seconds * sample_rate)
+    step_samples = int((chunk_seconds - overlap_seconds) * sample_rate)
+    
+    starts = list(range(0, max(len(audio) - int(overlap_seconds * sample_rate), 1), step_samples))
+    
+    checkpoints = {
+        start: TranscriptionCheckpoint(f"{checkpoint_prefix}-{start}.jsonl") for start in starts
+    }
+    cancel_path = f"{checkpoint_prefix}.cancel"
+    if os.path.exists(cancel_path):
+        os.remove(cancel_path)
+    
+    # Divide os núcleos da máquina entre os processos do pool
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context("spawn")
+    
+    results = {}
+    # (bytes já lidos, posição em segundos) do checkpoint de cada trecho
+    progress = {start: (0, 0.0) for start in starts}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_transcription_worker,
+            initargs=(model_name, threads, quantize_int8)
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _transcribe_chunk,
+                    pcm_path,
+                    start,
+                    start + chunk_samples,
+                    options,
+                    checkpoints[start].path,
+                    cancel_path
+                ): start
+                for start in starts
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1.0)
+                for future in done:
+                    results[futures[future]] = future.result()
+                if progress_callback:
+                    # Progresso real: segundos já gravados no checkpoint de cada trecho,
+                    # lendo só as linhas acrescentadas desde a última consulta
+                    for start in starts:
+                        if start not in results:
+                            progress[start] = checkpoints[start].read_position(*progress[start])
+                    transcribed = sum(
+                        min(len(audio) - start, chunk_samples) / sample_rate if start in results
+                        else progress[start][1]
+                        for start in starts
+                    )
+                    try:
+                        progress_callback(min(transcribed / (len(audio) / sample_rate or 1.0), 1.0))
+                    except BaseException:
+                        open(cancel_path, "w").close()
+                        for future in pending:
+                            future.cancel()
+                        raise
+    finally:
+        if os.path.exists(cancel_path):
+            os.remove(cancel_path)
+    
+    chunks = [(start / sample_rate, results[start][0]) for start in starts]
+    segments = stitch_segments(chunks, overlap_seconds)
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": results[starts[0]][1]
+    }
+
+
+def normalize_rows(matrix):
+    """Normaliza cada linha pela norma L2 (linhas nulas continuam nulas)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class SentenceStore:
+    """
+    Sentenças processadas em formato colunar (structure-of-arrays).
+    Guarda os textos, arrays NumPy com início, fim e falante de cada sentença, uma matriz
+    de bits sentença x tema (um bit por tema, 8 temas por byte) e as listas de
+    palavras detectadas, internadas para que listas iguais sejam um só objeto.
+    Os filtros de temas viram operações vetorizadas sobre a matriz de bits e a
+    sentença de um instante da gravação é encontrada por busca binária.
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.topics = []  # Tema de cada coluna da matriz de bits
+        self.columns = {}  # Tema -> coluna
+        self.matches = []  # Por coluna: {sentença: tupla de palavras}
+        self._interned = {}
+        self.speaker_names = []  # Nome de cada falante; o array guarda o índice (-1 = sem falante)
+        self._starts = np.zeros(0, dtype=np.float64)
+        self._ends = np.zeros(0, dtype=np.float64)
+        self._speakers = np.zeros(0, dtype=np.int16)
+        self._bits = np.zeros((0, 0), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def save(self, directory):
+        """
+        Grava as sentenças em directory: textos em um blob UTF-8 e tempos, falantes
+        e matriz de bits em .npy. Retorna os metadados (temas, falantes e palavras
+        detectadas por tema) para o manifesto do caso.
+        """
+        save_strings(directory, "sentences", self.texts)
+        np.save(os.path.join(directory, "starts.npy"), self.starts)
+        np.save(os.path.join(directory, "ends.npy"), self.ends)
+        np.save(os.path.join(directory, "speakers.npy"), self.speakers)
+        np.save(os.path.join(directory, "bits.npy"), self.bits)
+        return {
+            "topics": self.topics,
+            "speaker_names": self.speaker_names,
+            "matches": [
+                [[index, list(words)] for index, words in sorted(matches.items())]
+                for matches in self.matches
+            ]
+        }
+
+    @classmethod
+    def load(cls, directory, metadata):
+        """Reabre as sentenças gravadas por save, com os arrays mapeados em memória"""
+        store = cls()
+        store.texts = load_strings(directory, "sentences")
+        store.topics = list(metadata["topics"])
+        store.columns = {topic: col for col, topic in enumerate(store.topics)}
+        store.speaker_names = list(metadata["speaker_names"])
+        store.matches = [
+            {index: store.intern_words(words) for index, words in matches}
+            for matches in metadata["matches"]
+        ]
+        store._starts = load_array(directory, "starts")
+        store._ends = load_array(directory, "ends")
+        store._speakers = load_array(directory, "speakers")
+        store._bits = load_array(directory, "bits")
+        return store
+
+    @property
+    def starts(self):
+        return self._starts[:len(self)]
+
+    @property
+    def ends(self):
+        return self._ends[:len(self)]
+
+    @property
+    def speakers(self):
+        return self._speakers[:len(self)]
+
+    @property
+    def bits(self):
+        return self._bits[:len(self)]
+
+    def _reserve(self, n_rows, n_topics):
+        """Aumenta a capacidade dos arrays (dobrando) quando necessário"""
+        capacity, n_bytes = self._bits.shape
+        new_capacity = max(n_rows, 2 * capacity, 64) if n_rows > capacity else capacity
+        new_bytes = max(n_bytes, -(-n_topics // 8))
+        if (new_capacity, new_bytes) == (capacity, n_bytes):
+            return
+        
+        n = len(self)
+        starts = np.zeros(new_capacity, dtype=np.float64)
+        ends = np.zeros(new_capacity, dtype=np.float64)
+        speakers = np.full(new_capacity, -1, dtype=np.int16)
+        bits = np.zeros((new_capacity, new_bytes), dtype=np.uint8)
+        starts[:n] = self._starts[:n]
+        ends[:n] = self._ends[:n]
+        speakers[:n] = self._speakers[:n]
+        bits[:n, :n_bytes] = self._bits[:n]
+        self._starts, self._ends, self._speakers, self._bits = starts, ends, speakers, bits
+
+    def topic_column(self, topic):
+        """Retorna a coluna do tema, criando-a se ainda não existir"""
+        if topic not in self.columns:
+            self.columns[topic] = len(self.topics)
+            self.topics.append(topic)
+            self.matches.append({})
+            self._reserve(len(self), len(self.topics))
+        return self.columns[topic]
+
+    def intern_words(self, words):
+        words = tuple(sys.intern(word) for word in words)
+        return self._interned.setdefault(words, words)
+
+    def _set_match(self, index, col, words):
+        self._bits[index, col // 8] |= np.uint8(1 << (col % 8))
+        self.matches[col][index] = self.intern_words(words)
+
+    def append(self, text, start, end, themes, speaker=None):
+        """Acrescenta uma sentença com seus temas ({tema: [palavras]}) e falante"""
+        for topic in themes:
+            self.topic_column(topic)
+        index = len(self)
+        self._reserve(index + 1, len(self.topics))
+        self._starts[index] = start
+        self._ends[index] = end
+        self._speakers[index] = self.speaker_id(speaker)
+        self.texts.append(text)
+        for topic, words in themes.items():
+            self._set_match(index, self.columns[topic], words)
+
+    def speaker_id(self, speaker):
+        """Índice do falante, registrando-o se for novo (-1 = sem falante)"""
+        if speaker is None:
+            return -1
+        if speaker not in self.speaker_names:
+            self.speaker_names.append(speaker)
+        return self.speaker_names.index(speaker)
+
+    def speaker(self, index):
+        """Nome do falante da sentença, ou None"""
+        speaker_id = self._speakers[index]
+        return self.speaker_names[speaker_id] if speaker_id >= 0 else None
+
+    def set_topic(self, topic, words_per_sentence):
+        """Substitui a coluna de um tema (lista com as palavras de cada sentença ou None)"""
+        col = self.topic_column(topic)
+        self.clear_topic(topic)
+        for index, words in enumerate(words_per_sentence):
+            if words:
+                self._set_match(index, col, words)
+
+    def clear_topic(self, topic):
+        """Remove as detecções de um tema em todas as sentenças"""
+        if topic in self.columns:
+            col = self.columns[topic]
+            self._bits[:, col // 8] &= np.uint8(~(1 << (col % 8)) & 0xFF)
+            self.matches[col] = {}
+
+    def themes(self, index, topics=None):
+        """Temas detectados na sentença ({tema: [palavras]}), opcionalmente filtrados"""
+        themes = {}
+        for topic in (self.topics if topics is None else topics):
+            col = self.columns.get(topic)
+            if col is not None and index in self.matches[col]:
+                themes[topic] = list(self.matches[col][index])
+        return themes
+
+    def __getitem__(self, index):
+        return {
+            "text": self.texts[index],
+            "start": float(self._starts[index]),
+            "end": float(self._ends[index]),
+            "speaker": self.speaker(index),
+            "themes": self.themes(index)
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def topic_mask(self, topics):
+        """Máscara de bits (uma linha da matriz) com os temas informados"""
+        mask = np.zeros(self._bits.shape[1], dtype=np.uint8)
+        for topic in topics:
+            col = self.columns.get(topic)
+            if col is not None:
+                mask[col // 8] |= np.uint8(1 << (col % 8))
+        return mask
+
+    def has_topics(self, topics):
+        """Array booleano: sentenças com pelo menos um dos temas informados"""
+        return (self.bits & self.topic_mask(topics)).any(axis=1)
+
+    def filter(self, selected_topics, show_none):
+        """
+        Índices das sentenças exibidas pelo filtro de temas. A sentença aparece se:
+        - Tem algum tema selecionado detectado, OU
+        - "Nenhum" está marcado e não tem nenhum tema selecionado detectado
+        """
+        has_any_topic = self.has_topics(selected_topics)
+        return np.flatnonzero(has_any_topic | (show_none & ~has_any_topic))
+
+    def sentences_with(self, topic):
+        """Índices das sentenças em que o tema foi detectado"""
+        return self.filter([topic], False)
+
+    def find_at(self, time_seconds):
+        """Índice da sentença que contém o instante informado (ou None)"""
+        index = int(np.searchsorted(self.starts, time_seconds, side="right")) - 1
+        if index >= 0 and time_seconds < self._ends[index]:
+            return index
+        return None
+
+
+def mel_filterbank(n_mels, n_fft, sample_rate, fmin=20.0, fmax=None):
+    """Banco de filtros triangulares na escala mel (n_mels x n_fft // 2 + 1)"""
+    fmax = fmax or sample_rate / 2
+    mel_min, mel_max = [2595.0 * np.log10(1.0 + f / 700.0) for f in (fmin, fmax)]
+    hz_points = 700.0 * (10.0 ** (np.linspace(mel_min, mel_max, n_mels + 2) / 2595.0) - 1.0)
+    freqs = np.linspace(0, sample_rate / 2, n_fft // 2 + 1)
+    lower, center, upper = hz_points[:-2, None], hz_points[1:-1, None], hz_points[2:, None]
+    rising = (freqs - lower) / (center - lower)
+    falling = (upper - freqs) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def dct_matrix(n_coefficients, n_inputs):
+    """Matriz da DCT-II ortonormal usada para obter os MFCCs a partir do log-mel"""
+    n = np.arange(n_inputs)
+    k = np.arange(n_coefficients)[:, None]
+    matrix = np.cos(np.pi / n_inputs * (n + 0.5) * k) * np.sqrt(2.0 / n_inputs)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.T.astype(np.float32)
+
+
+class SpeakerDiarizer:
+    """
+    Identificação de falantes na CPU, sobre o PCM já decodificado.
+    Cada segmento do Whisper recebe uma impressão vocal (média e desvio padrão dos
+    MFCCs dos quadros com voz), calculada em lotes vetorizados: os quadros de vários
+    segmentos passam juntos por uma única FFT e um único produto de matrizes.
+    As impressões são agrupadas por k-means esférico e o número de falantes é o
+    que dá a melhor silhueta; segmentos muito curtos vão para o grupo mais próximo.
+    """
+
+    def __init__(self, sample_rate=PCM_SAMPLE_RATE, max_speakers=8, min_silhouette=0.35,
+                 min_segment_seconds=1.0, batch_frames=16384, seed=0):
+        self.sample_rate = sample_rate
+        self.max_speakers = max_speakers
+        self.min_silhouette = min_silhouette
+        self.min_segment_seconds = min_segment_seconds
+        self.batch_frames = batch_frames
+        self.seed = seed
+        
+        # Quadros de 25 ms a cada 10 ms
+        self.frame_length = int(0.025 * sample_rate)
+        self.hop_length = int(0.010 * sample_rate)
+        self.n_fft = 1 << (self.frame_length - 1).bit_length()
+        self.window = np.hamming(self.frame_length).astype(np.float32)
+        self.mel_basis = mel_filterbank(40, self.n_fft, sample_rate, fmax=min(7600.0, sample_rate / 2))
+        self.dct = dct_matrix(20, 40)
+
+    def frame_starts(self, segments, n_samples):
+        """
+        Início (em amostras) de todos os quadros de todos os segmentos, e o índice
+        do primeiro quadro de cada segmento. Todo segmento tem pelo menos um quadro.
+        """
+        last_start = max(n_samples - self.frame_length, 0)
+        starts = np.clip((np.asarray([s["start"] for s in segments]) * self.sample_rate).astype(np.int64),
+                         0, last_start)
+        ends = np.clip((np.asarray([s["end"] for s in segments]) * self.sample_rate).astype(np.int64),
+                       0, n_samples)
+        counts = np.maximum(1, (ends - starts - self.frame_length) // self.hop_length + 1)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        
+        # Índice do quadro dentro do seu segmento, sem laço por segmento
+        within = np.arange(counts.sum()) - np.repeat(offsets, counts)
+        frames = np.repeat(starts, counts) + within * self.hop_length
+        return np.minimum(frames, last_start), offsets, counts
+
+    def mfcc(self, samples, frame_starts):
+        """MFCCs e log-energia dos quadros informados (uma linha por quadro)"""
+        frames = samples[frame_starts[:, None] + np.arange(self.frame_length)]
+        frames = (frames - frames.mean(axis=1, keepdims=True)) * self.window
+        power = np.abs(np.fft.rfft(frames, n=self.n_fft, axis=1)) ** 2
+        log_energy = np.log(power.sum(axis=1) + 1e-10)
+        log_mel = np.log(power.astype(np.float32) @ self.mel_basis.T + 1e-6)
+        return log_mel @ self.dct, log_energy
+
+    def embed(self, samples, segments):
+        """Impressão vocal de cada segmento (matriz segmentos x 38, linhas normalizadas)"""
+        if len(samples) < self.frame_length or not segments:
+            return np.zeros((len(segments), 38), dtype=np.float32)
+        
+        frame_starts, offsets, counts = self.frame_starts(segments, len(samples))
+        embeddings = np.zeros((len(segments), 38), dtype=np.float32)
+        
+        # Lotes de segmentos inteiros com até batch_frames quadros
+        first = 0
+        while first < len(segments):
+            total = np.cumsum(counts[first:])
+            last = first + max(1, int(np.searchsorted(total, self.batch_frames, side="right")))
+            lo = offsets[first]
+            hi = offsets[last - 1] + counts[last - 1]
+            coefficients, log_energy = self.mfcc(samples, frame_starts[lo:hi])
+            batch_offsets = offsets[first:last] - lo
+            
+            # Só os quadros com voz (até 30 dB abaixo do mais forte do segmento)
+            loudest = np.maximum.reduceat(log_energy, batch_offsets)
+            voiced = log_energy >= np.repeat(loudest, counts[first:last]) - 6.9
+            weights = voiced.astype(np.float32)[:, None]
+            n_voiced = np.add.reduceat(weights, batch_offsets)
+            mean = np.add.reduceat(coefficients * weights, batch_offsets) / n_voiced
+            square = np.add.reduceat(coefficients ** 2 * weights, batch_offsets) / n_voiced
+            std = np.sqrt(np.maximum(square - mean ** 2, 0.0))
+            
+            # O coeficiente 0 acompanha o volume, não a voz
+            embeddings[first:last] = np.hstack([mean[:, 1:], std[:, 1:]])
+            first = last
+        
+        # Padronização por dimensão em relação à gravação e normalização L2
+        embeddings -= embeddings.mean(axis=0)
+        embeddings /= embeddings.std(axis=0) + 1e-6
+        return normalize_rows(embeddings)
+
+    def kmeans(self, embeddings, k, iterations=30):
+        """K-means esférico (similaridade de cosseno) com inicialização k-means++"""
+        rng = np.random.default_rng(self.seed)
+        centroids = [embeddings[rng.integers(len(embeddings))]]
+        for _ in range(1, k):
+            distance = 1.0 - np.max(embeddings @ np.array(centroids).T, axis=1)
+            distance = np.maximum(distance, 0.0) ** 2
+            total = distance.sum()
+            if total <= 0:
+                break
+            centroids.append(embeddings[rng.choice(len(embeddings), p=distance / total)])
+        centroids = np.array(centroids)
+        
+        labels = np.zeros(len(embeddings), dtype=np.int64)
+        for _ in range(iterations):
+            new_labels = np.argmax(embeddings @ centroids.T, axis=1)
+            if _ and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, embeddings)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+        return labels, centroids
+
+    def silhouette(self, embeddings, labels, k, max_points=1000):
+        """Silhueta média com distância de cosseno, em uma amostra de até max_points"""
+        if len(embeddings) > max_points:
+            rng = np.random.default_rng(self.seed)
+            keep = rng.choice(len(embeddings), max_points, replace=False)
+            embeddings, labels = embeddings[keep], labels[keep]
+        distances = 1.0 - embeddings @ embeddings.T
+        one_hot = np.eye(k, dtype=np.float32)[labels]
+        sizes = one_hot.sum(axis=0)
+        mean_to_cluster = (distances @ one_hot) / np.maximum(sizes, 1)
+        
+        own = labels
+        own_size = sizes[own]
+        a = mean_to_cluster[np.arange(len(labels)), own] * own_size / np.maximum(own_size - 1, 1)
+        mean_to_cluster[np.arange(len(labels)), own] = np.inf
+        mean_to_cluster[:, sizes == 0] = np.inf
+        b = mean_to_cluster.min(axis=1)
+        scores = (b - a) / np.maximum(np.maximum(a, b), 1e-9)
+        scores[own_size <= 1] = 0.0
+        return float(scores.mean())
+
+    def cluster(self, embeddings, durations):
+        """Rótulo de falante (0, 1, ...) de cada segmento"""
+        n = len(embeddings)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        # O agrupamento usa os segmentos longos, cujas impressões são mais estáveis
+        reliable = durations >= self.min_segment_seconds
+        if reliable.sum() < 2:
+            reliable = np.ones(n, dtype=bool)
+        points = embeddings[reliable]
+        
+        best_score = self.min_silhouette
+        best_centroids = normalize_rows(points.mean(axis=0, keepdims=True))
+        for k in range(2, min(self.max_speakers, len(points) - 1) + 1):
+            labels, centroids = self.kmeans(points, k)
+            score = self.silhouette(points, labels, k)
+            if score > best_score:
+                best_score, best_centroids = score, centroids
+        
+        labels = np.argmax(embeddings @ best_centroids.T, axis=1)
+        
+        # Numera os falantes pela ordem em que aparecem na gravação
+        order = {}
+        for label in labels:
+            order.setdefault(label, len(order))
+        return np.array([order[label] for label in labels], dtype=np.int64)
+
+    def diarize(self, samples, segments):
+        """Rótulo de falante de cada segmento ({"start", "end", ...})"""
+        embeddings = self.embed(samples, segments)
+        durations = np.array([s["end"] - s["start"] for s in segments], dtype=np.float32)
+        return self.cluster(embeddings, durations)
+
+
+# Fontes do relatório: a DejaVu Sans cobre os caracteres fora do Latin-1 que
+# aparecem nas transcrições; ela acompanha o matplotlib e a maioria dos Linux
+PDF_UNICODE_FONT_FILES = ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf")
+PDF_FONT_DIRECTORIES = [
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/dejavu",
+    "/usr/share/fonts/TTF",
+    "/Library/Fonts",
+    os.path.expanduser("~/Library/Fonts"),
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts")
+]
+
+
+def find_unicode_fonts():
+    """Caminhos (normal, negrito) da DejaVu Sans, ou None se ela não for encontrada"""
+    directories = list(PDF_FONT_DIRECTORIES)
+    try:
+        import matplotlib
+        directories.insert(0, os.path.join(matplotlib.get_data_path(), "fonts", "ttf"))
+    except ImportError:
+        pass
+    for directory in directories:
+        paths = tuple(os.path.join(directory, name) for name in PDF_UNICODE_FONT_FILES)
+        if all(os.path.exists(path) for path in paths):
+            return paths
+    return None
+
+
+def hex_to_rgb(color):
+    """'#RRGGBB' -> (r, g, b) de 0 a 255"""
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+class FontMetrics:
+    """
+    Larguras de texto de uma fonte do FPDF, em milésimos do tamanho da fonte.
+    A largura de cada palavra é calculada uma única vez e guardada em cache.
+    """
+
+    def __init__(self, font, max_entries=200000):
+        self.font = font
+        self.cache = {}
+        self.max_entries = max_entries
+
+    def units(self, text):
+        units = self.cache.get(text)
+        if units is None:
+            units = self.font.get_text_width(text, 1000, None)[1]
+            if len(self.cache) < self.max_entries:
+                self.cache[text] = units
+        return units
+
+
+class HighlightMatcher:
+    """
+    Posições das palavras detectadas no texto de cada sentença, em uma única
+    passada: as palavras de uma sentença viram uma expressão regular (as mais
+    longas primeiro, sem diferenciar maiúsculas) compilada uma vez por lista de
+    palavras, e todas as ocorrências são destacadas, não só a primeira.
+    """
+
+    def __init__(self):
+        self.patterns = {}
+
+    def spans(self, text, words):
+        pattern = self.patterns.get(words)
+        if pattern is None:
+            alternatives = sorted({word for word in words if word}, key=len, reverse=True)
+            pattern = re.compile("|".join(map(re.escape, alternatives)), re.IGNORECASE) if alternatives else None
+            self.patterns[words] = pattern
+        if pattern is None:
+            return []
+        return [match.span() for match in pattern.finditer(text)]
+
+
+class ReportPdf:
+    """
+    Diagramação do relatório PDF sobre o FPDF. A quebra de linhas é feita aqui,
+    com as larguras das palavras em cache (FontMetrics), e cada linha vira uma
+    única chamada a FPDF.text, precedida dos retângulos dos trechos destacados,
+    em vez de um multi_cell/write/cell por trecho. As coordenadas são as do FPDF:
+    milímetros a partir do canto superior esquerdo da página.
+    Sem a DejaVu Sans, usa a Helvetica padrão e os caracteres fora do Latin-1
+    viram '?'.
+    """
+
+    def __init__(self, path, margin=20, bottom_margin=15, cell_margin=1, fonts=None):
+        self.path = path
+        self.margin = margin
+        self.bottom_margin = bottom_margin
+        self.cell_margin = cell_margin
+        self.pdf = FPDF(format="A4")
+        self.pdf.set_auto_page_break(False)
+        self.pdf.set_margins(margin, margin, margin)
+        self.width = self.pdf.w - 2 * margin
+        
+        fonts = fonts or find_unicode_fonts()
+        if fonts:
+            self.family = "dejavu"
+            self.pdf.add_font(self.family, "", fonts[0])
+            self.pdf.add_font(self.family, "B", fonts[1])
+        else:
+            self.family = "helvetica"
+        self.unicode = fonts is not None
+        self.metrics = {}
+        self.style = None
+        self.size = None
+        self.y = margin
+        self.pdf.add_page()
+        self.set_font("", 10)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        return False
+
+    def close(self):
+        """Grava o documento em um arquivo temporário e o move para o destino"""
+        temp_path = temporary_path(self.path)
+        try:
+            self.pdf.output(temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def add_page(self):
+        self.pdf.add_page()
+        self.y = self.margin
+
+    def set_font(self, style="", size=10):
+        if (style, size) == (self.style, self.size):
+            return
+        self.style = style
+        self.size = size
+        self.pdf.set_font(self.family, style, size)
+        if style not in self.metrics:
+            self.metrics[style] = FontMetrics(self.pdf.current_font)
+
+    def encode(self, text):
+        """Texto que a fonte atual consegue representar"""
+        if self.unicode:
+            return text
+        return text.encode("latin-1", errors="replace").decode("latin-1")
+
+    def text_width(self, text):
+        """Largura em mm do texto, na fonte atual"""
+        return self.metrics[self.style].units(text) * self.size / (1000 * self.pdf.k)
+
+    def chars_fitting(self, text, width):
+        """Quantos caracteres do início do texto cabem na largura informada (mm)"""
+        metrics = self.metrics[self.style]
+        limit = width * 1000 * self.pdf.k / self.size
+        total = 0
+        for count, char in enumerate(text):
+            total += metrics.units(char)
+            if total > limit:
+                return count
+        return len(text)
+
+    def ln(self, h):
+        self.y += h
+
+    def _ensure_space(self, h):
+        if self.y + h > self.pdf.h - self.bottom_margin:
+            self.add_page()
+
+    def _text(self, x, h, text):
+        if text:
+            # Linha de base na mesma posição usada pelo FPDF.cell dentro de uma célula de altura h
+            self.pdf.text(x, self.y + h / 2 + 0.3 * self.pdf.font_size, text)
+
+    def _rect(self, x, w, h, color):
+        self.pdf.set_fill_color(*color)
+        self.pdf.rect(x, self.y, w, h, style="F")
+
+    def cell(self, h, text, fill=None, align="L"):
+        """Uma linha na largura toda, com fundo opcional (fill é (r, g, b))"""
+        self._ensure_space(h)
+        if fill is not None:
+            self._rect(self.margin, self.width, h, fill)
+        text = self.encode(text)
+        x = self.margin + self.cell_margin
+        if align == "C":
+            x = self.margin + (self.width - self.text_width(text)) / 2
+        self._text(x, h, text)
+        self.y += h
+
+    def paragraph(self, h, runs):
+        """
+        Texto corrido com quebra automática de linhas (e em cada '\\n').
+        runs é uma lista de (texto, cor de fundo ou None); cada linha vira um único
+        operador de texto, precedido dos retângulos dos trechos destacados.
+        """
+        space = self.text_width(" ")
+        max_width = self.width - 2 * self.cell_margin
+        line = []  # (texto, cor) de cada trecho da linha, espaços incluídos
+        line_width = 0.0
+        word = []
+        word_width = 0.0
+        pending_space = False
+        
+        def flush_line():
+            self._ensure_space(h)
+            x = self.margin + self.cell_margin
+            for data, color in line:
+                width = self.text_width(data)
+                if color is not None:
+                    self._rect(x, width, h, color)
+                x += width
+            self._text(self.margin + self.cell_margin, h, "".join(data for data, _ in line))
+            self.y += h
+        
+        def place_word():
+            nonlocal line, line_width, word, word_width, pending_space
+            if line and line_width + space + word_width > max_width:
+                flush_line()
+                line, line_width = [], 0.0
+            elif line and pending_space:
+                line.append((" ", None))
+                line_width += space
+            
+            for data, color in word:
+                # Palavra maior que a linha inteira: quebra por caractere
+                while line_width + self.text_width(data) > max_width and len(data) > 1:
+                    fits = self.chars_fitting(data, max_width - line_width)
+                    if fits == 0 and not line:
+                        fits = 1
+                    if fits:
+                        line.append((data[:fits], color))
+                    flush_line()
+                    line, line_width = [], 0.0
+                    data = data[fits:]
+                line.append((data, color))
+                line_width += self.text_width(data)
+            word, word_width, pending_space = [], 0.0, False
+        
+        for text, color in runs:
+            for match in re.finditer(r"\n|[^\S\n]+|\S+", text):
+                piece = match.group()
+                if piece == "\n":
+                    if word:
+                        place_word()
+                    flush_line()
+                    line, line_width, pending_space = [], 0.0, False
+                elif piece.isspace():
+                    if word:
+                        place_word()
+                    pending_space = bool(line)
+                else:
+                    data = self.encode(piece)
+                    word.append((data, color))
+                    word_width += self.text_width(data)
+        if word:
+            place_word()
+        flush_line()
+
+
+# Formatos das exportações em texto (extensão dos arquivos)
+EXPORT_FORMATS = ("jsonl", "srt", "vtt")
+
+
+def format_timestamp(seconds, separator="."):
+    """Tempo no formato HH:MM:SS.mmm (WebVTT) ou HH:MM:SS,mmm (SRT)"""
+    milliseconds = max(0, int(round(seconds * 1000)))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def iter_timed_sentences(sentences, block_size=1024):
+    """(índice, início, fim, texto) de cada sentença, convertendo os tempos em blocos"""
+    for block_start in range(0, len(sentences), block_size):
+        block_end = min(block_start + block_size, len(sentences))
+        yield from zip(
+            range(block_start, block_end),
+            sentences.starts[block_start:block_end].tolist(),
+            sentences.ends[block_start:block_end].tolist(),
+            sentences.texts[block_start:block_end]
+        )
+
+
+def iter_jsonl(sentences, file_hash, topics=None):
+    """
+    Uma linha JSON por sentença, com tempos, falante, temas e palavras detectadas
+    e o hash do áudio de origem. As linhas são geradas uma a uma.
+    """
+    for index, start, end, text in iter_timed_sentences(sentences):
+        yield json.dumps({
+            "index": index,
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "speaker": sentences.speaker(index),
+            "text": text,
+            "themes": sentences.themes(index, topics),
+            "sha256": file_hash
+        }, ensure_ascii=False) + "\n"
+
+
+def iter_srt(sentences):
+    """Legendas SRT, uma por sentença, com o falante antes do texto"""
+    for index, start, end, text in iter_timed_sentences(sentences):
+        caption = " ".join(text.split())
+        speaker = sentences.speaker(index)
+        if speaker:
+            caption = f"{speaker}: {caption}"
+        yield (
+            f"{index + 1}\n"
+            f"{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n"
+            f"{caption}\n\n"
+        )
+
+
+def iter_webvtt(sentences):
+    """Legendas WebVTT, uma por sentença, com o falante em uma tag <v>"""
+    yield "WEBVTT\n\n"
+    for index, start, end, text in iter_timed_sentences(sentences):
+        caption = " ".join(text.split())
+        caption = caption.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        speaker = sentences.speaker(index)
+        if speaker:
+            caption = f"<v {speaker}>{caption}"
+        yield (
+            f"{format_timestamp(start)} --> {format_timestamp(end)}\n"
+            f"{caption}\n\n"
+        )
+
+
+def export_lines(export_format, sentences, file_hash, topics=None):
+    """Gerador das linhas da exportação no formato informado (ver EXPORT_FORMATS)"""
+    if export_format == "jsonl":
+        return iter_jsonl(sentences, file_hash, topics)
+    if export_format == "srt":
+        return iter_srt(sentences)
+    if export_format == "vtt":
+        return iter_webvtt(sentences)
+    raise ValueError(f"Formato de exportação desconhecido: {export_format}")
+
+
+def write_lines(path, lines):
+    """Grava as linhas de um gerador uma a uma, com substituição atômica do arquivo"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = temporary_path(path)
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+            for line in lines:
+                f.write(line)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return path
+
+
+# Casos salvos: diretório com um manifesto JSON e os arrays grandes em .npy
+CASE_EXTENSION = ".raiocase"
+CASE_FORMAT_VERSION = 1
+
+
+class CaseBundle:
+    """
+    Análise salva de uma gravação, reaberta sem transcrever, sem carregar modelos e
+    sem decodificar o áudio. O caso é um diretório com um manifesto (case.json: hash
+    SHA-256 do áudio, temas com palavras relacionadas e cores, falantes e palavras
+    detectadas), a transcrição do Whisper (transcription.json) e os arrays grandes
+    (tempos, matriz de bits, vetores dos tokens e pirâmide da forma de onda) em
+    .npy, mapeados em memória ao abrir.
+    """
+
+    def __init__(self, audio_path, file_hash, sentences, token_store, envelope,
+                 transcription=None, transcription_key=None, topic_related_words=None,
+                 topic_colors=None, pdf_highlight_colors=None, selected_topics=None):
+        self.audio_path = audio_path
+        self.file_hash = file_hash
+        self.sentences = sentences
+        self.token_store = token_store
+        self.envelope = envelope
+        self.transcription = transcription
+        self.transcription_key = transcription_key
+        self.topic_related_words = topic_related_words or {}
+        self.topic_colors = topic_colors or {}
+        self.pdf_highlight_colors = pdf_highlight_colors or {}
+        self.selected_topics = selected_topics or []
+
+    def save(self, path):
+        """Grava o caso em um diretório temporário e o coloca no lugar de path"""
+        temp_path = temporary_path(path)
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        try:
+            manifest = {
+                "version": CASE_FORMAT_VERSION,
+                "audio_path": os.path.abspath(self.audio_path),
+                "sha256": self.file_hash,
+                "n_samples": self.envelope.n_samples,
+                "sample_rate": self.envelope.sample_rate,
+                "base_block": self.envelope.base_block,
+                "transcription_key": self.transcription_key,
+                "topic_related_words": self.topic_related_words,
+                "topic_colors": self.topic_colors,
+                "pdf_highlight_colors": self.pdf_highlight_colors,
+                "selected_topics": self.selected_topics,
+                "sentences": self.sentences.save(temp_path),
+                "tokens": self.token_store.save(temp_path) if self.token_store is not None else None
+            }
+            np.save(os.path.join(temp_path, "waveform.npy"), np.concatenate(self.envelope.levels))
+            if self.transcription is not None:
+                with open(os.path.join(temp_path, "transcription.json"), "w", encoding="utf-8") as f:
+                    json.dump(self.transcription, f, ensure_ascii=False)
+            # O manifesto é gravado por último: sem ele o diretório não é um caso
+            with open(os.path.join(temp_path, "case.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        replace_directory(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Abre um caso salvo; os arrays ficam mapeados em memória"""
+        with open(os.path.join(path, "case.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != CASE_FORMAT_VERSION:
+            raise ValueError(f"Versão de caso não suportada: {manifest.get('version')}")
+        
+        envelope = WaveformEnvelope.load(
+            os.path.join(path, "waveform.npy"),
+            manifest["n_samples"],
+            manifest["sample_rate"],
+            manifest["base_block"]
+        )
+        if envelope is None:
+            raise ValueError("A forma de onda do caso não corresponde ao áudio salvo")
+        
+        transcription = None
+        transcription_path = os.path.join(path, "transcription.json")
+        if os.path.exists(transcription_path):
+            with open(transcription_path, "r", encoding="utf-8") as f:
+                transcription = json.load(f)
+        
+        return cls(
+            manifest["audio_path"],
+            manifest["sha256"],
+            SentenceStore.load(path, manifest["sentences"]),
+            TokenStore.load(path, manifest["tokens"]) if manifest["tokens"] else None,
+            envelope,
+            transcription,
+            manifest["transcription_key"],
+            manifest["topic_related_words"],
+            manifest["topic_colors"],
+            manifest["pdf_highlight_colors"],
+            manifest["selected_topics"]
+        )
+
+
+# Índice de busca entre gravações: um diretório por gravação e um vocabulário comum
+SEARCH_INDEX_VERSION = 1
+SEARCH_MODES = ("keywords", "phrase", "near", "semantic")
+
+_SEARCH_TOKEN = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """Texto em minúsculas e sem acentos, como é guardado no índice de busca"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search_tokens(text):
+    """Palavras normalizadas de um texto (ou de uma consulta)"""
+    return _SEARCH_TOKEN.findall(normalize_text(text))
+
+
+def sentence_embeddings(token_store, n_sentences):
+    """
+    Vetor de cada sentença: soma dos vetores normalizados dos seus tokens, normalizada.
+    Sentenças sem tokens com vetor ficam com o vetor nulo.
+    """
+    if not token_store.words:
+        return np.zeros((n_sentences, 0), dtype=np.float32)
+    ids = np.asarray(token_store.sentence_ids)
+    firsts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    embeddings = np.zeros((n_sentences, token_store.vectors.shape[1]), dtype=np.float32)
+    embeddings[ids[firsts]] = np.add.reduceat(np.asarray(token_store.vectors), firsts, axis=0)
+    return normalize_rows(embeddings)
+
+
+def _in_sorted(values, sorted_array):
+    """Máscara: quais valores aparecem no array ordenado"""
+    if not len(sorted_array):
+        return np.zeros(len(values), dtype=bool)
+    idx = np.minimum(np.searchsorted(sorted_array, values), len(sorted_array) - 1)
+    return sorted_array[idx] == values
+
+
+def _next_occurrence(positions, sorted_array):
+    """Primeira ocorrência no array ordenado em ou depois de cada posição (ou o máximo int64)"""
+    idx = np.searchsorted(sorted_array, positions)
+    found = idx < len(sorted_array)
+    following = np.full(len(positions), np.iinfo(np.int64).max, dtype=np.int64)
+    following[found] = sorted_array[idx[found]]
+    return following
+
+
+class IndexedRecording:
+    """
+    Uma gravação no índice de busca, com os arrays mapeados em memória:
+    listas invertidas (termo -> posições e sentenças), tempos, tamanho e temas
+    de cada sentença e vetores das sentenças. Os textos só são lidos para exibir
+    os resultados.
+    """
+
+    def __init__(self, directory, entry):
+        self.directory = directory
+        self.entry = entry
+        self.topics = entry["topics"]
+        self.terms = load_array(directory, "terms")
+        self.term_starts = load_array(directory, "term_starts")
+        self.positions = load_array(directory, "positions")
+        self.sentence_ids = load_array(directory, "sentence_ids")
+        self.lengths = load_array(directory, "lengths")
+        self.starts = load_array(directory, "starts")
+        self.ends = load_array(directory, "ends")
+        self.bits = load_array(directory, "bits")
+        self.embeddings = load_array(directory, "embeddings")
+        self._texts = None
+
+    @property
+    def texts(self):
+        if self._texts is None:
+            self._texts = load_strings(self.directory, "sentences")
+        return self._texts
+
+    def postings(self, term_id):
+        """(posições, sentenças) do termo nesta gravação, em ordem de posição"""
+        if term_id is not None and len(self.terms):
+            i = int(np.searchsorted(self.terms, term_id))
+            if i < len(self.terms) and self.terms[i] == term_id:
+                first, last = self.term_starts[i], self.term_starts[i + 1]
+                return self.positions[first:last], self.sentence_ids[first:last]
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+    def topic_filter(self, topics):
+        """Máscara das sentenças com algum dos temas (None = todas)"""
+        if topics is None:
+            return None
+        mask = np.zeros(self.bits.shape[1], dtype=np.uint8)
+        for topic in topics:
+            if topic in self.topics:
+                col = self.topics.index(topic)
+                mask[col // 8] |= np.uint8(1 << (col % 8))
+        return (self.bits & mask).any(axis=1)
+
+
+class SearchIndex:
+    """
+    Índice persistente para buscar em todas as gravações já analisadas.
+    Cada gravação (identificada pelo hash SHA-256 do áudio) fica em um diretório
+    próprio com listas invertidas das palavras normalizadas, com a posição e a
+    sentença de cada ocorrência, e os vetores das sentenças calculados a partir
+    dos vetores do spaCy. O vocabulário (palavra -> id) é comum a todas e só cresce,
+    de modo que adicionar uma gravação não reescreve as demais. As buscas por
+    palavras, frase, proximidade ou semelhança percorrem os arrays mapeados em
+    memória e devolvem os trechos mais relevantes com arquivo e instante.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.recordings = []  # Entradas do manifesto, na ordem em que foram indexadas
+        self.term_ids = {}
+        self.vocabulary = []
+        self._opened = {}  # Hash -> IndexedRecording
+        self._manifest_stamp = None
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        # Enviado aos processos do lote sem a trava nem os arrays já abertos
+        return {"directory": self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"])
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    @property
+    def vocabulary_path(self):
+        return os.path.join(self.directory, "vocabulary.txt")
+
+    def recording_directory(self, file_hash):
+        return os.path.join(self.directory, "recordings", file_hash)
+
+    def refresh(self):
+        """Relê o manifesto e o vocabulário se outro processo alterou o índice"""
+        with self.lock:
+            try:
+                stat = os.stat(self.manifest_path)
+            except OSError:
+                return
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._manifest_stamp:
+                return
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != SEARCH_INDEX_VERSION:
+                raise ValueError(f"Versão do índice de busca não suportada: {manifest.get('version')}")
+            # O vocabulário é gravado antes do manifesto e contém todos os termos dele
+            with open(self.vocabulary_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            vocabulary = content.split("\n") if content else []
+            self.vocabulary = vocabulary
+            self.term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+            
+            indexed = {entry["file_hash"]: entry["indexed"] for entry in manifest["recordings"]}
+            for file_hash in list(self._opened):
+                if indexed.get(file_hash) != self._opened[file_hash].entry["indexed"]:
+                    del self._opened[file_hash]
+            self.recordings = manifest["recordings"]
+            self._manifest_stamp = stamp
+
+    def __len__(self):
+        self.refresh()
+        return len(self.recordings)
+
+    def total_sentences(self):
+        return sum(entry["n_sentences"] for entry in self.recordings)
+
+    def contains(self, file_hash):
+        self.refresh()
+        return any(entry["file_hash"] == file_hash for entry in self.recordings)
+
+    def open_recording(self, entry):
+        recording = self._opened.get(entry["file_hash"])
+        if recording is None:
+            recording = IndexedRecording(self.recording_directory(entry["file_hash"]), entry)
+            self._opened[entry["file_hash"]] = recording
+        return recording
+
+    def add_recording(self, file_hash, audio_path, sentences, token_store=None, duration=None):
+        """
+        Adiciona (ou substitui) uma gravação analisada. Só os arquivos da gravação,
+        o vocabulário e o manifesto são gravados; as outras gravações não mudam.
+        """
+        with self.lock, self.write_lock():
+            self.refresh()
+            try:
+                return self._add_recording(file_hash, audio_path, sentences, token_store, duration)
+            except BaseException:
+                # O vocabulário em memória pode ter termos que não chegaram ao disco
+                self._manifest_stamp = None
+                raise
+
+    @contextmanager
+    def write_lock(self):
+        """
+        Trava entre processos (interface, lote) para as gravações no índice: uma trava
+        exclusiva do sistema (flock, ou msvcrt no Windows) sobre write.lock. O sistema a
+        libera quando o processo termina, então uma trava nunca fica abandonada e
+        nunca é tomada de quem ainda está gravando, por mais que a gravação demore.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "write.lock"), "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue  # LK_LOCK desiste depois de 10 s; continua esperando
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _add_recording(self, file_hash, audio_path, sentences, token_store, duration):
+        tokens = [search_tokens(text) for text in sentences.texts]
+        lengths = np.array([len(words) for words in tokens], dtype=np.int32)
+        n_vocabulary = len(self.vocabulary)
+        term_ids = np.array(
+            [self.term_ids.setdefault(word, len(self.term_ids))
+             for words in tokens for word in words],
+            dtype=np.int32
+        )
+        self.vocabulary.extend(list(self.term_ids)[n_vocabulary:])
+        
+        # Listas invertidas: ocorrências agrupadas por termo, em ordem de posição
+        order = np.argsort(term_ids, kind="stable")
+        terms, firsts = np.unique(term_ids[order], return_index=True)
+        sentence_ids = np.repeat(np.arange(len(sentences), dtype=np.int32), lengths)
+        if token_store is not None:
+            embeddings = sentence_embeddings(token_store, len(sentences))
+        else:
+            embeddings = np.zeros((len(sentences), 0), dtype=np.float32)
+        
+        os.makedirs(os.path.join(self.directory, "recordings"), exist_ok=True)
+        path = self.recording_directory(file_hash)
+        temp_path = temporary_path(path)
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        save_strings(temp_path, "sentences", sentences.texts)
+        arrays = {
+            "terms": terms.astype(np.int32),
+            "term_starts": np.r_[firsts, len(term_ids)].astype(np.int64),
+            "positions": order.astype(np.int32),
+            "sentence_ids": sentence_ids[order],
+            "lengths": lengths,
+            "starts": sentences.starts,
+            "ends": sentences.ends,
+            "bits": sentences.bits,
+            "embeddings": embeddings
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_path, f"{name}.npy"), array)
+        replace_directory(temp_path, path)
+        self._opened.pop(file_hash, None)
+        
+        entry = {
+            "file_hash": file_hash,
+            "audio_path": os.path.abspath(audio_path),
+            "n_sentences": len(sentences),
+            "n_tokens": int(lengths.sum()),
+            "duration": duration if duration is not None else float(sentences.ends.max(initial=0.0)),
+            "topics": list(sentences.topics),
+            "indexed": datetime.now().isoformat(timespec="microseconds")
+        }
+        recordings = [other for other in self.recordings if other["file_hash"] != file_hash]
+        recordings.append(entry)
+        
+        self._write_atomic(self.vocabulary_path, "\n".join(self.vocabulary))
+        self._write_atomic(self.manifest_path, json.dumps(
+            {"version": SEARCH_INDEX_VERSION, "recordings": recordings}, ensure_ascii=False
+        ))
+        self.recordings = recordings
+        stat = os.stat(self.manifest_path)
+        self._manifest_stamp = (stat.st_mtime_ns, stat.st_size)
+        return entry
+
+    def _write_atomic(self, path, content):
+        temp_path = temporary_path(path)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def search(self, query, mode="keywords", topics=None, limit=50, distance=10,
+               query_vector=None):
+        """
+        Busca em todas as gravações indexadas. Modos:
+        - "keywords": sentenças com todas as palavras, ordenadas por BM25
+        - "phrase": sentenças com as palavras na ordem exata
+        - "near": todas as palavras a até distance palavras umas das outras
+          (mesmo em sentenças vizinhas), mais próximas primeiro
+        - "semantic": sentenças mais parecidas com query_vector (ver AudioAnalyzer.search)
+        topics restringe a busca às sentenças com algum dos temas informados.
+        Retorna até limit resultados: dicts com arquivo, hash, sentença, início,
+        fim, texto e pontuação, da maior para a menor pontuação.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Modo de busca desconhecido: {mode}")
+        with self.lock:
+            self.refresh()
+            recordings = [self.open_recording(entry) for entry in self.recordings]
+            if mode == "semantic":
+                candidates = self._semantic(recordings, query_vector, topics, limit)
+            else:
+                words = search_tokens(query)
+                if not words:
+                    return []
+                term_ids = [self.term_ids.get(word) for word in words]
+                if mode == "near":
+                    candidates = self._near(recordings, list(dict.fromkeys(term_ids)), distance, topics)
+                else:
+                    candidates = self._ranked(recordings, term_ids, mode == "phrase", topics)
+            return self._top_hits(recordings, candidates, limit)
+
+    def _ranked(self, recordings, term_ids, phrase, topics, k1=1.2, b=0.75):
+        """BM25 das sentenças com todas as palavras (ou com a frase, tratada como um termo)"""
+        n_sentences = self.total_sentences()
+        if not n_sentences or None in term_ids:
+            return []
+        average_length = max(sum(entry["n_tokens"] for entry in self.recordings) / n_sentences, 1.0)
+        
+        # Primeira passada: frequência de cada termo em cada sentença e nº de sentenças com ele
+        matches = []
+        document_frequency = {}
+        for recording in recordings:
+            if phrase:
+                positions, sentence_ids = recording.postings(term_ids[0])
+                for offset, term_id in enumerate(term_ids[1:], 1):
+                    found = _in_sorted(positions + offset, recording.postings(term_id)[0])
+                    positions, sentence_ids = positions[found], sentence_ids[found]
+                counts = [("phrase",) + np.unique(sentence_ids, return_counts=True)]
+            else:
+                counts = [(term_id,) + np.unique(recording.postings(term_id)[1], return_counts=True)
+                          for term_id in dict.fromkeys(term_ids)]
+            for key, ids, _ in counts:
+                document_frequency[key] = document_frequency.get(key, 0) + len(ids)
+            matches.append(counts)
+        
+        # Segunda passada: pontuação das sentenças que têm todos os termos
+        candidates = []
+        for index, (recording, counts) in enumerate(zip(recordings, matches)):
+            common = counts[0][1]
+            for _, ids, _ in counts[1:]:
+                common = np.intersect1d(common, ids, assume_unique=True)
+            mask = recording.topic_filter(topics)
+            if mask is not None:
+                common = common[mask[common]]
+            if not len(common):
+                continue
+            norm = k1 * (1 - b + b * recording.lengths[common] / average_length)
+            scores = np.zeros(len(common), dtype=np.float64)
+            for key, ids, tf in counts:
+                df = document_frequency[key]
+                idf = np.log(1 + (n_sentences - df + 0.5) / (df + 0.5))
+                tf = tf[np.searchsorted(ids, common)]
+                scores += idf * tf * (k1 + 1) / (tf + norm)
+            candidates.append((index, common, scores))
+        return candidates
+
+    def _near(self, recordings, term_ids, distance, topics):
+        """
+        Trechos com todas as palavras em uma janela de até distance posições
+        (da primeira à última palavra); pontuação 1 / (1 + largura da janela).
+        """
+        if None in term_ids:
+            return []
+        candidates = []
+        for index, recording in enumerate(recordings):
+            postings = [recording.postings(term_id) for term_id in term_ids]
+            if not all(len(positions) for positions, _ in postings):
+                continue
+            # A menor janela começa em alguma ocorrência de alguma palavra e termina na
+            # primeira ocorrência seguinte da palavra mais distante; testando cada palavra
+            # como início da janela, o resultado não depende da ordem da consulta
+            all_sentences = []
+            all_widths = []
+            for first, (positions, sentence_ids) in enumerate(postings):
+                positions = positions.astype(np.int64)
+                end = positions.copy()
+                for i, (other, _) in enumerate(postings):
+                    if i != first:
+                        end = np.maximum(end, _next_occurrence(positions, other))
+                width = end - positions
+                found = width <= distance
+                all_sentences.append(sentence_ids[found])
+                all_widths.append(width[found])
+            sentence_ids = np.concatenate(all_sentences)
+            width = np.concatenate(all_widths)
+            mask = recording.topic_filter(topics)
+            if mask is not None:
+                keep = mask[sentence_ids]
+                sentence_ids, width = sentence_ids[keep], width[keep]
+            if not len(sentence_ids):
+                continue
+            # Uma pontuação por sentença (a do início da janela): a da janela mais estreita
+            order = np.lexsort((width, sentence_ids))
+            ids, firsts = np.unique(sentence_ids[order], return_index=True)
+            candidates.append((index, ids, 1.0 / (1.0 + width[order][firsts])))
+        return candidates
+
+    def _semantic(self, recordings, query_vector, topics, limit):
+        """Similaridade de cosseno entre o vetor da consulta e o de cada sentença"""
+        if query_vector is None or not np.any(query_vector):
+            return []
+        query_vector = normalize_rows(np.asarray(query_vector, dtype=np.float32)[None])[0]
+        candidates = []
+        for index, recording in enumerate(recordings):
+            embeddings = recording.embeddings
+            if embeddings.shape[1] != len(query_vector) or not len(embeddings):
+                continue
+            scores = embeddings @ query_vector
+            mask = recording.topic_filter(topics)
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+            # Só as limit melhores de cada gravação disputam o resultado final
+            ids = np.argpartition(-scores, limit - 1)[:limit] if len(scores) > limit else np.arange(len(scores))
+            ids = ids[np.isfinite(scores[ids]) & (scores[ids] > 0)]
+            candidates.append((index, ids, scores[ids]))
+        return candidates
+
+    def _top_hits(self, recordings, candidates, limit):
+        """Junta os candidatos de todas as gravações e monta os limit melhores resultados"""
+        candidates = [candidate for candidate in candidates if len(candidate[1])]
+        if not candidates:
+            return []
+        owners = np.concatenate([np.full(len(ids), index) for index, ids, _ in candidates])
+        ids = np.concatenate([ids for _, ids, _ in candidates])
+        scores = np.concatenate([scores for _, _, scores in candidates])
+        if len(scores) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            best = np.arange(len(scores))
+        # Empates ficam em ordem de gravação e de tempo
+        best = best[np.lexsort((ids[best], owners[best], -scores[best]))]
+        
+        hits = []
+        for owner, sentence, score in zip(owners[best], ids[best], scores[best]):
+            recording = recordings[owner]
+            hits.append({
+                "file": recording.entry["audio_path"],
+                "sha256": recording.entry["file_hash"],
+                "sentence": int(sentence),
+                "start": float(recording.starts[sentence]),
+                "end": float(recording.ends[sentence]),
+                "text": recording.texts[sentence],
+                "score": float(score)
+            })
+        return hits
+
+
+# Palavras relacionadas a cada tema sensível
+DEFAULT_TOPIC_RELATED_WORDS = {
+    "Nenhum": [],
+    "Drogas": [
+        "cocaína", "maconha", "crack", "heroína", "tráfico",
+        "vício", "substância", "entorpecente", "dependente", "overdose"
+    ],
+    "Morte": [
+        "falecimento", "assassinato", "homicídio", "suicídio", "funeral",
+        "velório", "cemitério", "luto", "óbito", "cadáver"
+    ],
+    "Crimes Sexuais": [
+        "estupro", "abuso", "assédio", "pedofilia", "violência",
+        "exploração", "atentado", "violação", "molestamento", "agressão"
+    ],
+    "Família": [
+        "pai", "mãe", "filho", "irmão", "parente",
+        "casamento", "divórcio", "adoção", "guarda", "pensão"
+    ],
+    "Palavras Ofensivas": [
+        "merda", "porra", "caralho", "puta", "viado",
+        "buceta", "idiota", "imbecil", "babaca", "cuzão"
+    ],
+    "Violência": [
+        "agressão", "briga", "pancada", "espancamento", "soco",
+        "chute", "arma", "facada", "tiro", "ameaça"
+    ],
+    "Dinheiro": [
+        "roubo", "fraude", "propina", "suborno", "extorsão",
+        "lavagem", "desvio", "corrupção", "sonegação", "golpe"
+    ],
+    "Armas": [
+        "revólver", "pistola", "fuzil", "metralhadora", "munição",
+        "explosivo", "granada", "bomba", "armamento", "calibre"
+    ],
+    "Tráfico Humano": [
+        "escravidão", "exploração", "sequestro", "cárcere", "prostituição",
+        "aliciamento", "contrabando", "coação", "trabalho forçado", "servidão"
+    ],
+    "Discriminação": [
+        "racismo", "homofobia", "preconceito", "xenofobia", "intolerância",
+        "machismo", "segregação", "bullying", "injúria", "difamação"
+    ]
+}
+
+# Cores claras para highlight no PDF
+DEFAULT_PDF_HIGHLIGHT_COLORS = {
+    "Nenhum": "#E0E0E0",      # Cinza claro
+    "Drogas": "#FFB6C1",      # Rosa claro
+    "Morte": "#B0C4DE",       # Azul claro
+    "Crimes Sexuais": "#98FB98", # Verde claro
+    "Família": "#DDA0DD",     # Roxo claro
+    "Palavras Ofensivas": "#F0E68C", # Amarelo claro
+    "Violência": "#F08080",   # Vermelho claro
+    "Dinheiro": "#87CEEB",    # Azul céu claro
+    "Armas": "#FFA07A",       # Salmão claro
+    "Tráfico Humano": "#B0C4DE", # Azul aço claro
+    "Discriminação": "#FFA07A"  # Salmão claro
+}
+
+
+class AudioAnalyzer:
+    """
+    Transcrição, detecção de temas e geração de relatório, sem interface gráfica.
+    Usado pela interface (AudioAnalyzerApp) e pelo processamento em lote (raio_batch).
+    Os modelos são carregados uma única vez e reaproveitados entre arquivos.
+    """
+
+    def __init__(self, model_name="medium", data_directory=None):
+        data_directory = data_directory or os.path.join(os.path.expanduser("~"), ".raio")
+        
+        # Os modelos (Whisper e spaCy) são carregados sob demanda
+        self.model_name = model_name
+        self.model = None
+        self.loaded_model_key = None
+        
+        # Rastreamento das etapas (desligado por padrão)
+        self.tracer = Tracer()
+        self.trace_directory = os.path.join(data_directory, "traces")
+        
+        # Inferência na CPU: número de threads intra-op do torch
+        self.torch_threads = os.cpu_count() or 1
+        self.nlp = None
+        self.nlp_model_name = "pt_core_news_md"
+        self.nlp_disabled_pipes = []
+        
+        # Opções de decodificação repassadas ao model.transcribe
+        self.transcribe_options = {}
+        
+        # Transcrição paralela em trechos sobrepostos (1 processo = modo original)
+        self.transcription_workers = 1
+        self.chunk_seconds = 300
+        self.chunk_overlap_seconds = 5
+        
+        # Cache das transcrições, endereçado pelo hash do áudio
+        self.transcription_cache = TranscriptionCache(
+            os.path.join(data_directory, "transcriptions")
+        )
+        
+        # Áudio decodificado uma única vez em um PCM mapeado em memória
+        self.pcm_cache = PcmCache(os.path.join(data_directory, "pcm"))
+        self.pcm_directory = self.pcm_cache.directory
+        
+        # Janelas já transcritas de transcrições interrompidas, para retomada
+        self.checkpoint_directory = os.path.join(data_directory, "checkpoints")
+        
+        # Índice de busca entre todas as gravações analisadas
+        self.search_index = SearchIndex(os.path.join(data_directory, "index"))
+        
+        # Parâmetros do processamento em lote das sentenças (nlp.pipe)
+        self.nlp_batch_size = 256
+        self.nlp_n_process = 1
+        
+        # Identificação de falantes na CPU, sobre o PCM já decodificado
+        self.diarize_speakers = True
+        self.diarizer = SpeakerDiarizer()
+        
+        # Similarity threshold for topic detection
+        self.similarity_threshold = 0.5
+        
+        # Índice vetorial dos temas (reconstruído quando topic_related_words muda)
+        self.topic_index = None
+        
+        # Cache persistente palavra -> temas, compartilhado entre execuções
+        self.word_cache = WordTopicCache(
+            os.path.join(data_directory, "word_topic_cache.json")
+        )
+        
+        # Dictionary of related words for each topic
+        self.topic_related_words = {
+            topic: list(words) for topic, words in DEFAULT_TOPIC_RELATED_WORDS.items()
+        }
+        
+        # Cores claras para highlight no PDF
+        self.pdf_highlight_colors = dict(DEFAULT_PDF_HIGHLIGHT_COLORS)
+
+    def load_nlp(self):
+        """Carrega o spaCy com o modelo médio, que inclui vetores de palavras"""
+        import spacy
+        nlp = spacy.load(self.nlp_model_name)
+        
+        # A detecção de temas usa apenas atributos léxicos (vetor, is_stop, is_punct),
+        # que vêm do tokenizador e do vocabulário: os demais componentes ficam desligados
+        self.nlp_disabled_pipes = list(nlp.pipe_names)
+        self.nlp = nlp
+        return nlp
+
+    def load_whisper_model(self, model_name, quantize_int8):
+        """Carrega o Whisper com a configuração informada, se ainda não estiver carregado"""
+        key = (model_name, quantize_int8)
+        if self.model is None or self.loaded_model_key != key:
+            self.model = None  # Libera o modelo anterior antes de carregar o novo
+            self.model = load_whisper_model(model_name, quantize_int8, self.torch_threads)
+            self.loaded_model_key = key
+        return self.model
+
+    def prepare_audio(self, filename):
+        """
+        Calcula o hash do arquivo e decodifica o áudio (uma única vez por conteúdo).
+        Retorna (hash SHA-256, caminho do PCM, amostras mapeadas em memória).
+        """
+        with self.tracer.span("hash", bytes=os.path.getsize(filename)):
+            file_hash = self.calculate_file_hash(filename)
+        with self.tracer.span("decode"):
+            pcm_path = decode_to_pcm(filename, self.pcm_cache.path(file_hash))
+            self.pcm_cache.evict(keep=file_hash)
+            samples = open_pcm(pcm_path)
+        return file_hash, pcm_path, samples
+
+    def diarize_segments(self, samples, segments):
+        """
+        Identifica o falante de cada segmento transcrito ("Falante 1", "Falante 2", ...).
+        Retorna None se a identificação de falantes estiver desligada.
+        """
+        if not self.diarize_speakers:
+            return None
+        with self.tracer.span("diarization", segments=len(segments)):
+            labels = self.diarizer.diarize(samples, segments)
+        return [f"Falante {label + 1}" for label in labels]
+
+    def analyze_segments(self, segments, topics, on_sentence, progress_callback=None,
+                         speakers=None):
+        """
+        Analisa os temas das sentenças transcritas. Cada sentença passa uma única vez
+        pelo spaCy e os temas são calculados por lote. on_sentence recebe cada sentença
+        ({"text", "start", "end", "themes", "speaker"}) assim que seus temas ficam
+        prontos e progress_callback recebe (sentenças analisadas, total).
+        speakers é a lista com o falante de cada segmento (ver diarize_segments).
+        Retorna o TokenStore da transcrição, reutilizado ao analisar novos temas.
+        """
+        sentences = [(segment["text"].strip(), segment["start"], segment["end"])
+                     for segment in segments]
+        speakers = speakers or [None] * len(sentences)
+        total_sentences = len(sentences)
+        
+        with self.tracer.span("analysis", sentences=total_sentences) as analysis_span:
+            index = self.get_topic_index()
+            cache = self.get_word_cache()
+            docs = self.parse_sentences(text for text, _, _ in sentences)
+            stores = []
+            done = 0
+            while True:
+                # O spaCy processa o lote enquanto ele é consumido
+                with self.tracer.span("spacy") as span:
+                    batch = list(itertools.islice(docs, self.nlp_batch_size))
+                    span.count(sentences=len(batch))
+                if not batch:
+                    break
+                with self.tracer.span("topic_match") as span:
+                    store = TokenStore(batch)
+                    themes = store.match(index, self.similarity_threshold, topics, cache)
+                    span.count(tokens=len(store.words))
+                stores.append(store)
+                
+                for (text, start, end), speaker, sentence_themes in zip(
+                    sentences[done:done + len(batch)], speakers[done:done + len(batch)], themes
+                ):
+                    on_sentence({
+                        "text": text,
+                        "start": start,
+                        "end": end,
+                        "themes": sentence_themes,
+                        "speaker": speaker
+                    })
+                done += len(batch)
+                if progress_callback:
+                    progress_callback(done, total_sentences)
+            
+            token_store = TokenStore.concat(stores)
+            analysis_span.count(tokens=len(token_store.words))
+        return token_store
+
+    def get_topic_index(self):
+        """Retorna o índice vetorial dos temas, reconstruindo-o se os temas mudaram"""
+        key = TopicIndex.make_key(self.topic_related_words)
+        if self.topic_index is None or self.topic_index.key != key:
+            self.topic_index = TopicIndex(
+                self.nlp,
+                self.topic_related_words,
+                self.nlp_disabled_pipes
+            )
+        return self.topic_index
+
+    def get_word_cache(self):
+        """Retorna o cache palavra -> temas, invalidado se a configuração mudou"""
+        self.word_cache.validate(WordTopicCache.make_key(
+            self.nlp,
+            self.similarity_threshold,
+            self.topic_related_words
+        ))
+        return self.word_cache
+
+    def parse_sentences(self, texts):
+        """
+        Stream the sentences through spaCy in batches, parsing each one exactly once.
+        Yields the parsed documents in the same order as the input texts.
+        """
+        return self.nlp.pipe(
+            (text.lower() for text in texts),
+            batch_size=self.nlp_batch_size,
+            n_process=self.nlp_n_process,
+            disable=self.nlp_disabled_pipes
+        )
+
+    def find_topics_in_doc(self, doc, topics=None):
+        """
+        Score every candidate token of a parsed document against all topics at once.
+        Returns a dict {topic: [similar words]} with the topics found in the document.
+        """
+        store = TokenStore([doc])
+        return store.match(
+            self.get_topic_index(),
+            self.similarity_threshold,
+            topics,
+            self.get_word_cache()
+        )[0]
+
+    def match_topic_themes(self, token_store, topics):
+        """
+        Palavras de cada tema informado em cada sentença, a partir do token_store,
+        sem passar a transcrição pelo spaCy novamente. Não altera as sentenças e
+        pode rodar fora da thread que as usa; o resultado vai para apply_topic_themes.
+        """
+        existing = {topic: self.topic_related_words[topic]
+                    for topic in topics if topic in self.topic_related_words}
+        with self.tracer.span("topic_refresh", topics=len(topics), tokens=len(token_store.words)):
+            index = TopicIndex(self.nlp, existing, self.nlp_disabled_pipes)
+            themes = token_store.match(index, self.similarity_threshold)
+        return {
+            topic: [sentence_themes.get(topic) for sentence_themes in themes] if topic in existing else None
+            for topic in topics
+        }
+
+    @staticmethod
+    def apply_topic_themes(sentences, topic_themes):
+        """Grava nas sentenças o resultado de match_topic_themes; temas sem resultado são removidos"""
+        for topic, words_per_sentence in topic_themes.items():
+            if words_per_sentence is None:
+                sentences.clear_topic(topic)
+            else:
+                sentences.set_topic(topic, words_per_sentence)
+
+    def refresh_topic_themes(self, sentences, token_store, topics):
+        """
+        Recalcula os temas informados em todas as sentenças a partir do token_store.
+        Temas que não existem mais em topic_related_words são removidos das sentenças.
+        """
+        self.apply_topic_themes(sentences, self.match_topic_themes(token_store, topics))
+
+    def find_similar_words(self, text, topic):
+        """
+        Find words in text that are semantically similar to the topic and its related words.
+        Returns a list of similar words.
+        """
+        doc = self.nlp(text.lower(), disable=self.nlp_disabled_pipes)
+        return self.find_topics_in_doc(doc, [topic]).get(topic, [])
+
+    def find_sensitive_content(self, sentence, topic):
+        """
+        Check if a sentence contains content similar to a sensitive topic.
+        Returns a tuple of (bool, list of similar words) indicating if sensitive content was found.
+        """
+        similar_words = self.find_similar_words(sentence, topic)
+        return len(similar_words) > 0, similar_words
+
+    def transcription_key(self, file_hash, quantize_int8=False):
+        """Chave da transcrição no cache: áudio, modelo e opções de decodificação"""
+        # A divisão em trechos altera o resultado e por isso faz parte da chave
+        key_options = dict(self.transcribe_options)
+        if self.transcription_workers > 1:
+            key_options["_chunking"] = [self.chunk_seconds, self.chunk_overlap_seconds]
+        model_key = f"{self.model_name}-int8" if quantize_int8 else self.model_name
+        return TranscriptionCache.make_key(file_hash, model_key, key_options)
+
+    def transcribe_audio(self, file_hash, pcm_path, samples, use_cache=True,
+                         progress_callback=None, quantize_int8=False):
+        """
+        Transcreve o PCM decodificado, reutilizando a transcrição em cache quando
+        o mesmo áudio já foi processado com o mesmo modelo e as mesmas opções.
+        Cada janela concluída é gravada em um checkpoint em checkpoint_directory;
+        uma transcrição interrompida (queda, reinício ou cancelamento) é retomada
+        do ponto salvo na próxima execução com o mesmo áudio, modelo e opções.
+        Para cancelar, o progress_callback lança uma exceção (ex.: TranscriptionCancelled).
+        """
+        parallel = self.transcription_workers > 1
+        key = self.transcription_key(file_hash, quantize_int8)
+        
+        if use_cache:
+            with self.tracer.span("transcription_cache") as span:
+                result = self.transcription_cache.get(key)
+                span.count(hits=int(result is not None))
+            if result is not None:
+                return result
+        
+        progress_callback = progress_callback or (lambda fraction: None)
+        # O checkpoint usa a mesma chave do cache: só é retomado com a mesma configuração
+        checkpoint_prefix = os.path.join(self.checkpoint_directory, key)
+        if parallel:
+            with self.tracer.span("transcription", audio_seconds=len(samples) / PCM_SAMPLE_RATE) as span:
+                result = transcribe_parallel(
+                    pcm_path,
+                    self.model_name,
+                    self.transcribe_options,
+                    checkpoint_prefix,
+                    self.transcription_workers,
+                    self.chunk_seconds,
+                    self.chunk_overlap_seconds,
+                    progress_callback,
+                    quantize_int8
+                )
+                span.count(segments=len(result["segments"]))
+        else:
+            with self.tracer.span("whisper_load"):
+                model = self.load_whisper_model(self.model_name, quantize_int8)
+            checkpoint = TranscriptionCheckpoint(f"{checkpoint_prefix}.jsonl")
+            with self.tracer.span("transcription", audio_seconds=len(samples) / PCM_SAMPLE_RATE) as span:
+                result = transcribe_resumable(
+                    model,
+                    samples,
+                    self.transcribe_options,
+                    checkpoint,
+                    progress_callback
+                )
+                span.count(segments=len(result["segments"]))
+        self.transcription_cache.put(key, {
+            "text": result["text"],
+            "segments": result["segments"],
+            "language": result["language"]
+        })
+        self.remove_checkpoints(checkpoint_prefix)
+        return result
+
+    def remove_checkpoints(self, checkpoint_prefix):
+        """Apaga os checkpoints de uma transcrição concluída"""
+        directory, prefix = os.path.split(checkpoint_prefix)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".jsonl"):
+                os.remove(os.path.join(directory, name))
+
+    def calculate_file_hash(self, filepath):
+        """Calcula o hash SHA-256 do arquivo"""
+        sha256_hash = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            # Ler o arquivo em blocos para não sobrecarregar a memória
+            for byte_block in iter(lambda: f.read(4096), b""):
+                sha256_hash.update(byte_block)
+        return sha256_hash.hexdigest()
+
+    def write_export(self, file_path, export_format, file_hash, sentences, topics=None):
+        """
+        Exporta as sentenças em JSONL (com temas e palavras detectadas) ou a
+        transcrição em SRT/WebVTT, gravando uma linha por vez.
+        """
+        with self.tracer.span("export", sentences=len(sentences)):
+            return write_lines(file_path, export_lines(export_format, sentences, file_hash, topics))
+
+    def index_recording(self, file_hash, audio_path, sentences, token_store=None, duration=None):
+        """Adiciona a gravação analisada ao índice de busca entre gravações"""
+        with self.tracer.span("index", sentences=len(sentences)):
+            return self.search_index.add_recording(
+                file_hash, audio_path, sentences, token_store, duration
+            )
+
+    def search_recordings(self, query, mode="keywords", topics=None, limit=50, distance=10):
+        """
+        Busca em todas as gravações indexadas (ver SearchIndex.search).
+        A busca semântica usa o spaCy para calcular o vetor da consulta.
+        """
+        query_vector = None
+        if mode == "semantic":
+            store = TokenStore(list(self.parse_sentences([query])))
+            query_vector = sentence_embeddings(store, 1)[0]
+        with self.tracer.span("search") as span:
+            hits = self.search_index.search(query, mode, topics, limit, distance, query_vector)
+            span.count(hits=len(hits))
+        return hits
+
+    def save_case(self, path, audio_path, file_hash, sentences, token_store, envelope,
+                  transcription=None, transcription_key=None, topic_colors=None,
+                  selected_topics=None):
+        """Salva a análise atual como um caso, com os temas e cores em uso"""
+        bundle = CaseBundle(
+            audio_path,
+            file_hash,
+            sentences,
+            token_store,
+            envelope,
+            transcription,
+            transcription_key,
+            self.topic_related_words,
+            topic_colors,
+            self.pdf_highlight_colors,
+            selected_topics
+        )
+        with self.tracer.span("save_case", sentences=len(sentences)):
+            return bundle.save(path)
+
+    def open_case(self, path):
+        """
+        Abre um caso salvo e adota seus temas e cores de highlight. A transcrição do
+        caso volta ao cache (se tiver saído dele), para que uma nova análise do mesmo
+        áudio não precise transcrevê-lo de novo.
+        """
+        with self.tracer.span("open_case") as span:
+            bundle = CaseBundle.load(path)
+            span.count(sentences=len(bundle.sentences))
+        self.topic_related_words = {
+            topic: list(words) for topic, words in bundle.topic_related_words.items()
+        }
+        self.pdf_highlight_colors.update(bundle.pdf_highlight_colors)
+        
+        key = bundle.transcription_key
+        if (bundle.transcription is not None and key is not None
+                and not os.path.exists(self.transcription_cache.entry_path(key))):
+            self.transcription_cache.put(key, bundle.transcription)
+        return bundle
+
+    def write_pdf_report(self, file_path, filename, file_hash, sentences, topics):
+        """
+        Gera o relatório PDF com a transcrição e os trechos de cada tema informado.
+        sentences é o SentenceStore com os temas já detectados no processamento.
+        """
+        with self.tracer.span("pdf", sentences=len(sentences), topics=len(topics)):
+            self._write_pdf_report(file_path, filename, file_hash, sentences, topics)
+
+    def _write_pdf_report(self, file_path, filename, file_hash, sentences, topics,
+                          batch_size=512):
+        with ReportPdf(file_path) as pdf:
+            # Título
+            pdf.set_font('B', 16)
+            pdf.cell(10, 'Relatório de Análise de Áudio', align='C')
+            pdf.ln(5)
+            
+            # Informações do arquivo
+            pdf.set_font('', 10)
+            current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+            pdf.cell(6, f'Data: {current_time}')
+            pdf.cell(6, f'Arquivo: {os.path.basename(filename)}')
+            
+            # Hash do arquivo
+            pdf.set_font('B', 10)
+            pdf.cell(6, 'Hash SHA-256:')
+            pdf.set_font('', 8)  # Fonte menor para o hash
+            pdf.cell(6, file_hash)
+            pdf.ln(5)
+            
+            # Transcrição, diagramada em lotes de sentenças
+            pdf.set_font('B', 12)
+            pdf.cell(10, 'Transcrição:')
+            
+            pdf.set_font('', 10)
+            for batch_start in range(0, len(sentences), batch_size):
+                batch = range(batch_start, min(batch_start + batch_size, len(sentences)))
+                starts = sentences.starts[batch_start:batch.stop].tolist()
+                ends = sentences.ends[batch_start:batch.stop].tolist()
+                for index, start, end in zip(batch, starts, ends):
+                    timestamp = f'[{start:.2f}s - {end:.2f}s]'
+                    speaker = sentences.speaker(index)
+                    if speaker:
+                        timestamp = f'{timestamp} {speaker}'
+                    # Os tempos ocupam uma linha e não passam pelo cache de larguras
+                    pdf.cell(6, timestamp)
+                    pdf.paragraph(6, [(sentences.texts[index], None)])
+                    pdf.ln(2)
+            
+            # Temas Sensíveis
+            pdf.add_page()
+            pdf.set_font('B', 12)
+            pdf.cell(10, 'Temas Sensíveis Detectados:')
+            
+            # Usa os temas já detectados no processamento (inclusive temas
+            # adicionados depois), sem executar a análise de linguagem novamente
+            matcher = HighlightMatcher()
+            found_topics = False
+            for topic in topics:
+                indices = sentences.sentences_with(topic)
+                if not len(indices):
+                    continue
+                found_topics = True
+                color = hex_to_rgb(self.pdf_highlight_colors[topic])
+                # Listas de palavras internadas: a expressão de cada lista é compilada uma vez
+                topic_matches = sentences.matches[sentences.columns[topic]]
+                
+                # Cabeçalho do tema
+                pdf.set_font('B', 12)
+                pdf.ln(5)
+                pdf.cell(10, f'Tema: {topic}', fill=color)
+                pdf.ln(2)
+                
+                # Listar trechos do tema
+                pdf.set_font('', 10)
+                for batch_start in range(0, len(indices), batch_size):
+                    batch = indices[batch_start:batch_start + batch_size].tolist()
+                    words = [topic_matches[index] for index in batch]
+                    # Todas as ocorrências das palavras detectadas, de uma vez para o lote
+                    spans = [
+                        matcher.spans(sentences.texts[index], index_words)
+                        for index, index_words in zip(batch, words)
+                    ]
+                    for index, index_words, index_spans in zip(batch, words, spans):
+                        timestamp = f'[{sentences.starts[index]:.2f}s - {sentences.ends[index]:.2f}s]'
+                        speaker = sentences.speaker(index)
+                        if speaker:
+                            timestamp = f'{timestamp} - {speaker}'
+                        pdf.cell(6, f'Tempo: {timestamp}')
+                        
+                        # Destacar palavras sensíveis no texto
+                        text = sentences.texts[index]
+                        runs = [('Texto: ', None)]
+                        current_pos = 0
+                        for start, end in index_spans:
+                            runs.append((text[current_pos:start], None))
+                            runs.append((text[start:end], color))
+                            current_pos = end
+                        runs.append((text[current_pos:], None))
+                        pdf.paragraph(6, runs)
+                        
+                        pdf.paragraph(6, [(f'Palavras detectadas: {", ".join(index_words)}', None)])
+                        pdf.ln(3)
+            
+            if not found_topics:
+                pdf.paragraph(6, [('Nenhum tema sensível detectado.', None)])
@@ -0,0 +1,589 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import shutil
+import argparse
+import threading
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from raio_core import (
+    AudioAnalyzer,
+    SentenceStore,
+    EXPORT_FORMATS,
+    PCM_SAMPLE_RATE,
+    WHISPER_MODELS,
+    export_lines
+)
+
+
+# Tipo de conteúdo de cada formato de exportação
+EXPORT_CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8"
+}
+
+
+class JobCancelled(Exception):
+    """Interrompe o processamento de um job cancelado pelo cliente"""
+
+
+class AnalysisJob:
+    """
+    Um arquivo enviado ao serviço. Guarda o estado, o progresso, o tempo gasto
+    em cada etapa e, ao final, o resultado e o caminho do relatório PDF.
+    """
+
+    def __init__(self, job_id, filename, directory, topics, write_pdf=True):
+        self.id = job_id
+        self.filename = filename
+        self.directory = directory
+        self.upload_path = os.path.join(directory, "upload" + os.path.splitext(filename)[1])
+        self.pdf_path = None
+        self.topics = topics
+        self.write_pdf = write_pdf
+
+        # queued -> running -> done | error | cancelled
+        self.status = "queued"
+        self.stage = None
+        self.progress = 0.0
+        self.timings = {}  # Etapa -> segundos
+        self.error = None
+        self.result = None
+        self.file_hash = None
+        self.sentences = None  # SentenceStore do job concluído, para as exportações
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "error", "cancelled")
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    @contextmanager
+    def run_stage(self, name):
+        """Marca a etapa atual e registra sua duração em timings"""
+        self.check_cancelled()
+        self.stage = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 4),
+            "timings": self.timings,
+            "error": self.error,
+            "topics": self.topics,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result_url": f"/jobs/{self.id}/result" if self.status == "done" else None,
+            "report_url": f"/jobs/{self.id}/report.pdf" if self.pdf_path else None,
+            "export_urls": {
+                export_format: f"/jobs/{self.id}/transcript.{export_format}"
+                for export_format in EXPORT_FORMATS
+            } if self.status == "done" else None
+        }
+
+
+class AnalysisService:
+    """
+    Fila de análise do serviço HTTP. Os modelos são carregados uma única vez e
+    compartilhados pelos workers; a fila é limitada e, quando cheia, novos envios
+    são recusados (o cliente deve tentar novamente mais tarde).
+    Jobs cancelados enquanto aguardam deixam de ocupar a fila na hora.
+    A transcrição e a análise de temas de um job por vez usam os modelos
+    (o Whisper não aceita transcrições simultâneas no mesmo modelo); a
+    decodificação e a geração do PDF de outros jobs correm em paralelo.
+    """
+
+    def __init__(self, analyzer, work_directory, workers=1, max_queued=8, max_finished=100,
+                 quantize_int8=False, use_cache=True):
+        self.analyzer = analyzer
+        self.work_directory = work_directory
+        self.workers = workers
+        self.max_finished = max_finished
+        self.quantize_int8 = quantize_int8
+        self.use_cache = use_cache
+
+        # A fila não tem limite próprio: a capacidade conta só os jobs ainda "queued",
+        # e os cancelados que continuam nela são descartados pelos workers
+        self.pending = queue.Queue()
+        self.max_queued = max_queued
+        self.queued = 0
+        self.jobs = {}  # Id -> AnalysisJob, em ordem de criação
+        self.jobs_lock = threading.Lock()
+        self.model_lock = threading.Lock()
+        self.models_ready = threading.Event()
+        self.models_error = None
+
+    def start(self):
+        """Carrega os modelos e inicia os workers em segundo plano"""
+        # Os jobs ficam só em memória: diretórios de execuções anteriores são descartados
+        shutil.rmtree(os.path.join(self.work_directory, "jobs"), ignore_errors=True)
+        threading.Thread(target=self.load_models, daemon=True).start()
+        for _ in range(self.workers):
+            threading.Thread(target=self.worker_loop, daemon=True).start()
+
+    def load_models(self):
+        try:
+            self.analyzer.load_nlp()
+            if self.analyzer.transcription_workers == 1:
+                self.analyzer.load_whisper_model(self.analyzer.model_name, self.quantize_int8)
+        except Exception as e:
+            self.models_error = e
+        finally:
+            self.models_ready.set()
+
+    def available_topics(self):
+        return [topic for topic in self.analyzer.topic_related_words if topic != "Nenhum"]
+
+    def create_job(self, filename, topics, write_pdf=True):
+        """Cria o job e seu diretório de trabalho; o áudio é gravado em job.upload_path"""
+        job_id = uuid.uuid4().hex
+        directory = os.path.join(self.work_directory, "jobs", job_id)
+        os.makedirs(directory, exist_ok=True)
+        return AnalysisJob(job_id, filename, directory, topics, write_pdf)
+
+    def submit(self, job):
+        """Enfileira o job; levanta queue.Full se a fila estiver cheia"""
+        with self.jobs_lock:
+            if self.queued >= self.max_queued:
+                shutil.rmtree(job.directory, ignore_errors=True)
+                raise queue.Full()
+            self.queued += 1
+            self.jobs[job.id] = job
+        self.pending.put(job)
+        return job
+
+    def is_full(self):
+        with self.jobs_lock:
+            return self.queued >= self.max_queued
+
+    def get(self, job_id):
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self.jobs_lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancela o job. Um job na fila passa a "cancelled" na hora e libera seu lugar
+        (o worker o descarta ao retirá-lo); um job em andamento é interrompido no
+        próximo ponto de verificação.
+        """
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.is_finished:
+                return job
+            job.cancel_event.set()
+            if job.status != "queued":
+                return job
+            job.status = "cancelled"
+            job.finished = time.time()
+            self.queued -= 1
+        if os.path.exists(job.upload_path):
+            os.remove(job.upload_path)
+        return job
+
+    def claim(self, job):
+        """Marca o job retirado da fila como em andamento; False se ele foi cancelado"""
+        with self.jobs_lock:
+            if job.status != "queued":
+                return False
+            job.status = "running"
+            self.queued -= 1
+            return True
+
+    def worker_loop(self):
+        while True:
+            job = self.pending.get()
+            try:
+                if self.claim(job):
+                    self.run_job(job)
+            finally:
+                self.pending.task_done()
+                self.forget_old_jobs()
+
+    def run_job(self, job):
+        job.started = time.time()
+        job.timings["queue"] = job.started - job.created
+        try:
+            job.check_cancelled()
+            with job.run_stage("waiting_models"):
+                self.models_ready.wait()
+            if self.models_error is not None:
+                raise RuntimeError(f"Falha ao carregar os modelos: {self.models_error}")
+
+            with job.run_stage("decode"):
+                file_hash, pcm_path, samples = self.analyzer.prepare_audio(job.upload_path)
+
+            def transcription_progress(fraction):
+                job.check_cancelled()
+                job.progress = 0.6 * fraction
+
+            def analysis_progress(done, total_sentences):
+                job.check_cancelled()
+                job.progress = 0.6 + 0.3 * (done / total_sentences)
+
+            with self.model_lock:
+                with job.run_stage("transcription"):
+                    result = self.analyzer.transcribe_audio(
+                        file_hash,
+                        pcm_path,
+                        samples,
+                        self.use_cache,
+                        transcription_progress,
+                        self.quantize_int8
+                    )
+            job.progress = 0.6
+
+            # A identificação de falantes usa só o PCM, sem os modelos compartilhados
+            with job.run_stage("diarization"):
+                speakers = self.analyzer.diarize_segments(samples, result["segments"])
+
+            sentences = SentenceStore()
+            with self.model_lock:
+                with job.run_stage("analysis"):
+                    self.analyzer.analyze_segments(
+                        result["segments"],
+                        job.topics,
+                        lambda sentence: sentences.append(**sentence),
+                        analysis_progress,
+                        speakers
+                    )
+                    self.analyzer.word_cache.save()
+            job.progress = 0.9
+
+            if job.write_pdf:
+                with job.run_stage("report"):
+                    pdf_path = os.path.join(job.directory, "report.pdf")
+                    self.analyzer.write_pdf_report(
+                        pdf_path, job.filename, file_hash, sentences, job.topics
+                    )
+                    job.pdf_path = pdf_path
+
+            job.file_hash = file_hash
+            job.sentences = sentences
+            job.result = {
+                "file": job.filename,
+                "sha256": file_hash,
+                "language": result.get("language"),
+                "duration": len(samples) / PCM_SAMPLE_RATE,
+                "topics": job.topics,
+                "topic_counts": {
+                    topic: len(sentences.sentences_with(topic)) for topic in job.topics
+                },
+                "speakers": sentences.speaker_names,
+                "sentences": list(sentences)
+            }
+            job.progress = 1.0
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "error"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.stage = None
+            job.finished = time.time()
+            # O PCM decodificado fica no cache; o arquivo enviado não é mais necessário
+            if os.path.exists(job.upload_path):
+                os.remove(job.upload_path)
+
+    def forget_old_jobs(self):
+        """Mantém no máximo max_finished jobs concluídos, removendo os mais antigos"""
+        with self.jobs_lock:
+            finished = [job for job in self.jobs.values() if job.is_finished]
+            for job in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[job.id]
+                shutil.rmtree(job.directory, ignore_errors=True)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    API HTTP do serviço:
+      POST   /jobs?filename=gravacao.mp3[&topics=Drogas,Morte][&pdf=0]  corpo = bytes do áudio
+      GET    /jobs                  lista os jobs
+      GET    /jobs/<id>             estado, progresso e tempos por etapa
+      GET    /jobs/<id>/result      sentenças e temas detectados
+      GET    /jobs/<id>/report.pdf  relatório PDF
+      GET    /jobs/<id>/transcript.jsonl|srt|vtt  sentenças em JSONL ou legendas, em fluxo
+      DELETE /jobs/<id>             cancela o job
+      GET    /health                modelos carregados e ocupação da fila
+    """
+
+    server_version = "RAIO"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, {"error": message}, headers)
+
+    def route(self):
+        """Separa o caminho em (partes, parâmetros da query)"""
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, parse_qs(url.query)
+
+    def find_job(self, job_id):
+        job = self.service.get(job_id)
+        if job is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Job não encontrado")
+        return job
+
+    def do_GET(self):
+        parts, _ = self.route()
+        if parts == ["health"]:
+            service = self.service
+            self.send_json(HTTPStatus.OK, {
+                "models_ready": service.models_ready.is_set() and service.models_error is None,
+                "models_error": str(service.models_error) if service.models_error else None,
+                "model": service.analyzer.model_name,
+                "queued": service.queued,
+                "max_queued": service.max_queued,
+                "topics": service.available_topics()
+            })
+        elif parts == ["jobs"]:
+            self.send_json(HTTPStatus.OK, [job.to_dict() for job in self.service.list_jobs()])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.find_job(parts[1])
+            if job is not None:
+                self.send_json(HTTPStatus.OK, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            job = self.find_job(parts[1])
+            if job is None:
+                return
+            if job.status != "done":
+                self.send_error_json(HTTPStatus.CONFLICT, f"Job não concluído ({job.status})")
+                return
+            self.send_json(HTTPStatus.OK, dict(job.result, timings=job.timings))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "report.pdf":
+            job = self.find_job(parts[1])
+            if job is None:
+                return
+            if job.pdf_path is None or not os.path.exists(job.pdf_path):
+                self.send_error_json(HTTPStatus.NOT_FOUND, "Relatório não disponível")
+                return
+            self.send_file(job.pdf_path, "application/pdf")
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2].startswith("transcript."):
+            job = self.find_job(parts[1])
+            if job is None:
+                return
+            export_format = parts[2].split(".", 1)[1]
+            if export_format not in EXPORT_FORMATS:
+                self.send_error_json(HTTPStatus.NOT_FOUND, "Formato de exportação desconhecido")
+                return
+            if job.status != "done":
+                self.send_error_json(HTTPStatus.CONFLICT, f"Job não concluído ({job.status})")
+                return
+            self.send_lines(
+                export_lines(export_format, job.sentences, job.file_hash, job.topics),
+                EXPORT_CONTENT_TYPES[export_format]
+            )
+        else:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Rota não encontrada")
+
+    def send_file(self, path, content_type):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def send_lines(self, lines, content_type):
+        """
+        Envia as linhas de um gerador à medida que são produzidas, sem montar a
+        resposta inteira em memória (sem Content-Length: a conexão é fechada ao final)
+        """
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        # O wfile não tem buffer: as linhas são enviadas em blocos de ~64 KB
+        block = []
+        block_size = 0
+        for line in lines:
+            data = line.encode("utf-8")
+            block.append(data)
+            block_size += len(data)
+            if block_size >= 1 << 16:
+                self.wfile.write(b"".join(block))
+                block, block_size = [], 0
+        if block:
+            self.wfile.write(b"".join(block))
+
+    def do_POST(self):
+        parts, params = self.route()
+        if parts != ["jobs"]:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Rota não encontrada")
+            return
+        service = self.service
+        if service.models_error is not None:
+            self.send_error_json(HTTPStatus.SERVICE_UNAVAILABLE, f"Modelos indisponíveis: {service.models_error}")
+            return
+
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.send_error_json(HTTPStatus.LENGTH_REQUIRED, "Content-Length obrigatório")
+            return
+        length = int(length)
+        if length <= 0:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "Arquivo de áudio vazio")
+            return
+        if length > self.server.max_upload_bytes:
+            self.send_error_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Arquivo de áudio muito grande")
+            return
+
+        filename = os.path.basename(
+            params.get("filename", [self.headers.get("X-Filename", "upload")])[0]
+        ) or "upload"
+        available = service.available_topics()
+        topics = available
+        if "topics" in params:
+            topics = [topic.strip() for topic in params["topics"][0].split(",") if topic.strip()]
+            unknown = [topic for topic in topics if topic not in available]
+            if unknown:
+                self.send_error_json(HTTPStatus.BAD_REQUEST, f"Temas desconhecidos: {', '.join(unknown)}")
+                return
+        write_pdf = params.get("pdf", ["1"])[0] != "0"
+
+        # Recusa antes de receber o corpo se a fila estiver cheia
+        if service.is_full():
+            self.send_error_json(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "Fila de processamento cheia",
+                {"Retry-After": "10"}
+            )
+            return
+
+        # O corpo é gravado em disco em blocos, sem ficar inteiro em memória
+        job = service.create_job(filename, topics, write_pdf)
+        remaining = length
+        with open(job.upload_path, "wb") as f:
+            while remaining > 0:
+                block = self.rfile.read(min(remaining, 1 << 20))
+                if not block:
+                    break
+                f.write(block)
+                remaining -= len(block)
+        if remaining > 0:
+            shutil.rmtree(job.directory, ignore_errors=True)
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "Envio incompleto")
+            return
+
+        try:
+            service.submit(job)
+        except queue.Full:
+            self.send_error_json(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "Fila de processamento cheia",
+                {"Retry-After": "10"}
+            )
+            return
+        self.send_json(HTTPStatus.ACCEPTED, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Rota não encontrada")
+            return
+        job = self.service.cancel(parts[1])
+        if job is None:
+            self.send_error_json(HTTPStatus.NOT_FOUND, "Job não encontrado")
+            return
+        self.send_json(HTTPStatus.OK, job.to_dict())
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, max_upload_bytes=2 * 1024 ** 3):
+        super().__init__(address, AnalysisRequestHandler)
+        self.service = service
+        self.max_upload_bytes = max_upload_bytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serviço HTTP local do RAIO: análise de gravações enviadas como jobs."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("-m", "--model", default="medium", choices=WHISPER_MODELS,
+                        help="modelo do Whisper (padrão: medium)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="jobs em andamento ao mesmo tempo (padrão: 2)")
+    parser.add_argument("--max-queued", type=int, default=8,
+                        help="jobs aguardando na fila antes de recusar envios (padrão: 8)")
+    parser.add_argument("--max-upload-mb", type=int, default=2048,
+                        help="tamanho máximo de um envio em MB (padrão: 2048)")
+    parser.add_argument("--data-directory",
+                        help="diretório dos jobs e caches (padrão: ~/.raio)")
+    parser.add_argument("--int8", action="store_true",
+                        help="quantização int8 do Whisper na CPU")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="não reutiliza transcrições em cache")
+    args = parser.parse_args(argv)
+
+    analyzer = AudioAnalyzer(args.model, args.data_directory)
+    work_directory = os.path.join(
+        args.data_directory or os.path.join(os.path.expanduser("~"), ".raio"),
+        "server"
+    )
+    service = AnalysisService(
+        analyzer,
+        work_directory,
+        workers=args.workers,
+        max_queued=args.max_queued,
+        quantize_int8=args.int8,
+        use_cache=not args.no_cache
+    )
+    service.start()
+
+    server = AnalysisServer((args.host, args.port), service, args.max_upload_mb * 1024 ** 2)
+    print(f"Servidor RAIO em http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import os
+import re
+import sys
+import zlib
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from raio_core import AudioAnalyzer, ReportPdf, SentenceStore, find_unicode_fonts
+
+
+def pdf_lines(path):
+    """
+    Texto de cada operador Tj do PDF, na ordem das páginas, decodificado pelo
+    ToUnicode da fonte em uso (fontes Type0 com Identity-H, como as do FPDF).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    objects = {
+        int(match.group(1)): match.group(2)
+        for match in re.finditer(rb"(\d+) 0 obj(.*?)endobj", data, re.S)
+    }
+
+    def stream(object_id):
+        body = objects[object_id]
+        raw = re.search(rb"stream\r?\n(.*?)\r?\nendstream", body, re.S).group(1)
+        return zlib.decompress(raw) if b"/FlateDecode" in body else raw
+
+    def reference(body, key):
+        return int(re.search(rb"/" + key + rb" (\d+) 0 R", body).group(1))
+
+    pages = re.search(rb"/Kids \[([^\]]*)\]", objects[1]).group(1)
+    lines = []
+    for page_id in map(int, re.findall(rb"(\d+) 0 R", pages)):
+        page = objects[page_id]
+        resources = objects[reference(page, b"Resources")]
+        fonts = {}
+        for name, font_id in re.findall(rb"/(F\d+) (\d+) 0 R", resources):
+            cmap = stream(reference(objects[int(font_id)], b"ToUnicode"))
+            fonts[name] = {
+                int(code, 16): chr(int(char, 16))
+                for code, char in re.findall(rb"<([0-9A-F]{4})> <([0-9A-F]{4})>", cmap)
+            }
+        font = None
+        content = stream(reference(page, b"Contents"))
+        for match in re.finditer(rb"/(F\d+) [\d.]+ Tf|\(((?:\\.|[^\\)])*)\) Tj", content, re.S):
+            if match.group(1):
+                font = fonts[match.group(1)]
+                continue
+            raw = re.sub(rb"\\(.)", lambda m: b"\r" if m.group(1) == b"r" else m.group(1), match.group(2), flags=re.S)
+            codes = [int.from_bytes(raw[i:i + 2], "big") for i in range(0, len(raw), 2)]
+            lines.append("".join(font[code] for code in codes))
+    return lines
+
+
+@unittest.skipIf(find_unicode_fonts() is None, "DejaVu Sans não encontrada")
+class ReportPdfTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="raio-pdf-test-")
+        self.path = os.path.join(self.directory, "relatorio.pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_text_outside_latin1_is_kept(self):
+        with ReportPdf(self.path) as pdf:
+            pdf.set_font("B", 12)
+            pdf.cell(10, "Tema: Ação — Łódź")
+            pdf.set_font("", 10)
+            pdf.paragraph(6, [("Texto: привет ", None), ("ő€", (255, 0, 0)), (" (fim)", None)])
+        self.assertEqual(pdf_lines(self.path), ["Tema: Ação — Łódź", "Texto: привет ő€ (fim)"])
+
+    def test_long_paragraph_wraps_across_pages(self):
+        words = [f"palavra{idx}" for idx in range(3000)]
+        with ReportPdf(self.path) as pdf:
+            pdf.paragraph(6, [(" ".join(words), None)])
+        lines = pdf_lines(self.path)
+        self.assertGreater(len(lines), 40)
+        self.assertEqual(" ".join(lines).split(), words)
+
+    def test_report_keeps_transcript_and_highlights(self):
+        analyzer = AudioAnalyzer("tiny", self.directory)
+        topic = next(topic for topic in analyzer.topic_related_words if topic != "Nenhum")
+        sentences = SentenceStore()
+        sentences.append("Zdravo, ovo je Željko.", 0.0, 2.0, {}, "Falante 1")
+        sentences.append("Ele disse «ameaça» duas vezes: ameaça.", 2.0, 4.5, {topic: ["ameaça"]}, None)
+
+        analyzer.write_pdf_report(self.path, "gravação.wav", "0" * 64, sentences, [topic])
+        lines = pdf_lines(self.path)
+        self.assertIn("Arquivo: gravação.wav", lines)
+        self.assertIn("[0.00s - 2.00s] Falante 1", lines)
+        self.assertIn("Zdravo, ovo je Željko.", lines)
+        self.assertIn(f"Tema: {topic}", lines)
+        self.assertIn("Texto: Ele disse «ameaça» duas vezes: ameaça.", lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
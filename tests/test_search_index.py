@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from raio_core import SearchIndex, SentenceStore
+
+
+def filler(n):
+    return " ".join(["palavra"] * n)
+
+
+class NearSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="raio-index-")
+        self.index = SearchIndex(self.directory)
+        # pistola na posição 0, dinheiro na 10 e carro na 20
+        sentences = SentenceStore()
+        sentences.append(
+            f"pistola {filler(9)} dinheiro {filler(9)} carro",
+            0.0, 10.0, {}
+        )
+        self.index.add_recording("0" * 64, "gravacao.wav", sentences)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_window_covers_all_terms(self):
+        for query in ("pistola dinheiro carro", "dinheiro pistola carro", "carro dinheiro pistola"):
+            with self.subTest(query=query):
+                self.assertEqual(self.index.search(query, "near", distance=10), [])
+                self.assertEqual(len(self.index.search(query, "near", distance=20)), 1)
+
+    def test_term_order_does_not_change_score(self):
+        first = self.index.search("pistola dinheiro", "near", distance=10)
+        second = self.index.search("dinheiro pistola", "near", distance=10)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first, second)
+        self.assertAlmostEqual(first[0]["score"], 1.0 / 11.0)
+
+
+# Segura a trava de escrita do índice em outro processo até ser encerrado
+HOLD_LOCK = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from raio_core import SearchIndex
+with SearchIndex(sys.argv[2]).write_lock():
+    print("locked", flush=True)
+    time.sleep(float(sys.argv[3]))
+"""
+
+
+class WriteLockTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="raio-index-")
+        self.index = SearchIndex(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def hold_lock(self, seconds):
+        process = subprocess.Popen(
+            [sys.executable, "-c", HOLD_LOCK,
+             os.path.dirname(os.path.dirname(os.path.abspath(__file__))), self.directory, str(seconds)],
+            stdout=subprocess.PIPE, text=True
+        )
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        self.assertEqual(process.stdout.readline().strip(), "locked")
+        return process
+
+    def test_waits_for_the_holder(self):
+        self.hold_lock(1.0)
+        start = time.monotonic()
+        with self.index.write_lock():
+            self.assertGreater(time.monotonic() - start, 0.5)
+
+    def test_lock_of_a_killed_process_is_released(self):
+        process = self.hold_lock(60)
+        process.kill()
+        process.wait()
+        start = time.monotonic()
+        with self.index.write_lock():
+            self.assertLess(time.monotonic() - start, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from raio_core import AudioAnalyzer
+from raio_server import AnalysisServer, AnalysisService
+
+
+class AnalysisServerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="raio-server-test-")
+        # Sem workers nem modelos: os jobs enviados ficam na fila
+        self.service = AnalysisService(
+            AudioAnalyzer("tiny", self.directory),
+            os.path.join(self.directory, "server"),
+            workers=0,
+            max_queued=2
+        )
+        self.server = AnalysisServer(("127.0.0.1", 0), self.service)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_port, timeout=10)
+        try:
+            connection.request(method, path, body=body)
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), json.loads(response.read())
+        finally:
+            connection.close()
+
+    def submit(self):
+        return self.request("POST", "/jobs?filename=gravacao.wav&pdf=0", b"RIFF")
+
+    def test_full_queue_is_rejected(self):
+        self.assertEqual(self.submit()[0], 202)
+        self.assertEqual(self.submit()[0], 202)
+        status, headers, data = self.submit()
+        self.assertEqual(status, 503)
+        self.assertEqual(headers["Retry-After"], "10")
+        self.assertIn("error", data)
+
+    def test_cancel_queued_job_frees_its_slot(self):
+        _, _, first = self.submit()
+        self.submit()
+        self.assertEqual(self.submit()[0], 503)
+
+        status, _, data = self.request("DELETE", f"/jobs/{first['id']}")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["status"], "cancelled")
+        self.assertEqual(self.request("GET", f"/jobs/{first['id']}")[2]["status"], "cancelled")
+        self.assertEqual(self.request("GET", "/health")[2]["queued"], 1)
+
+        # O lugar liberado aceita um novo envio
+        self.assertEqual(self.submit()[0], 202)
+        self.assertEqual(self.submit()[0], 503)
+
+    def test_worker_skips_cancelled_job(self):
+        _, _, first = self.submit()
+        _, _, second = self.submit()
+        self.request("DELETE", f"/jobs/{first['id']}")
+
+        ran = []
+        finished = threading.Event()
+
+        def run_job(job):
+            ran.append(job.id)
+            job.status = "done"
+            finished.set()
+
+        self.service.run_job = run_job
+        threading.Thread(target=self.service.worker_loop, daemon=True).start()
+        self.assertTrue(finished.wait(10))
+        self.assertEqual(ran, [second["id"]])
+        self.assertEqual(self.request("GET", "/health")[2]["queued"], 0)
+
+    def test_delete_unknown_job(self):
+        self.assertEqual(self.request("DELETE", "/jobs/desconhecido")[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
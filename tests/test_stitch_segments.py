@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from raio_core import stitch_segments
+
+
+def segment(start, end, text, words=None):
+    result = {"start": start, "end": end, "text": text}
+    if words is not None:
+        result["words"] = [{"start": s, "end": e, "word": w} for s, e, w in words]
+    return result
+
+
+class StitchSegmentsTest(unittest.TestCase):
+    def texts(self, merged):
+        return [item["text"].strip() for item in merged]
+
+    def test_repeated_words_across_chunks_are_removed(self):
+        # Trechos de 300 s com 5 s de sobreposição: o segundo começa em 295 s
+        chunks = [
+            (0.0, [segment(280.0, 290.0, " Bom dia"), segment(290.0, 299.0, " Olá mundo tudo bem")]),
+            (295.0, [segment(297.6, 302.0, " mundo tudo bem com você"), segment(302.0, 305.0, " Tchau")])
+        ]
+        merged = stitch_segments(chunks, 5)
+        self.assertEqual(self.texts(merged), ["Bom dia", "Olá mundo tudo bem", "com você", "Tchau"])
+        self.assertEqual([item["id"] for item in merged], [0, 1, 2, 3])
+
+    def test_words_after_midpoint_are_kept(self):
+        # O fim do primeiro trecho passa do ponto médio (297,5 s) e o segmento do
+        # segundo trecho que o contém começa antes dele
+        chunks = [
+            (0.0, [segment(294.0, 297.0, " Ele disse"), segment(298.0, 300.0, " que vai")]),
+            (295.0, [segment(296.0, 301.0, " disse que vai amanhã"), segment(301.0, 303.0, " embora")])
+        ]
+        merged = stitch_segments(chunks, 5)
+        self.assertEqual(self.texts(merged), ["Ele disse", "que vai amanhã", "embora"])
+
+    def test_word_timestamps_cut_by_time(self):
+        chunks = [
+            (0.0, [segment(290.0, 298.0, " um dois", [(290.0, 294.0, " um"), (294.0, 298.0, " dois")])]),
+            (295.0, [segment(294.5, 300.0, " dois três", [(294.5, 298.0, " dois"), (298.0, 300.0, " três")])])
+        ]
+        merged = stitch_segments(chunks, 5)
+        self.assertEqual(self.texts(merged), ["um dois", "três"])
+        self.assertEqual(merged[1]["start"], 298.0)
+
+    def test_identical_segment_is_dropped(self):
+        chunks = [
+            (0.0, [segment(296.0, 299.0, " Até logo.")]),
+            (295.0, [segment(296.1, 299.0, " até logo"), segment(299.0, 301.0, " Fim")])
+        ]
+        self.assertEqual(self.texts(stitch_segments(chunks, 5)), ["Até logo.", "Fim"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import types
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from raio_core import (
+    PCM_SAMPLE_RATE,
+    TranscriptionCancelled,
+    TranscriptionCheckpoint,
+    transcribe_resumable
+)
+
+TIMESTAMP_BEGIN = 1000
+WINDOW_SAMPLES = 30 * PCM_SAMPLE_RATE
+
+
+class FakeTokenizer:
+    timestamp_begin = TIMESTAMP_BEGIN
+
+    def decode(self, tokens):
+        return "".join(f" s{token}" for token in tokens)
+
+
+def fake_whisper(calls):
+    """
+    Whisper de mentira: cada amostra do áudio vale o seu tempo em segundos, e o
+    decode devolve segmentos de 10 s a partir do início da janela e um último
+    segmento sem marca de fim aos 25 s (a janela seguinte recomeça dali).
+    """
+    def pad_or_trim(array):
+        return np.pad(array, (0, max(WINDOW_SAMPLES - len(array), 0)))[:WINDOW_SAMPLES]
+
+    def decode(model, mel, options):
+        start = float(mel[0])
+        calls.append((round(start, 2), options.prompt))
+        remaining = np.count_nonzero(mel[1:]) / PCM_SAMPLE_RATE
+        ts = lambda seconds: TIMESTAMP_BEGIN + round(seconds / 0.02)
+        if remaining < 25:
+            tokens = [ts(0), round(start), ts(remaining)]  # Fim do áudio: marca isolada
+        else:
+            tokens = [ts(0), round(start), ts(10), ts(10), round(start) + 10, ts(20),
+                      ts(20), round(start) + 20, ts(25), ts(25), round(start) + 25]
+        return types.SimpleNamespace(
+            tokens=tokens, language="pt", temperature=options.temperature,
+            avg_logprob=-0.2, compression_ratio=1.2, no_speech_prob=0.01
+        )
+
+    whisper = types.ModuleType("whisper")
+    whisper.pad_or_trim = pad_or_trim
+    whisper.log_mel_spectrogram = lambda array, n_mels: array
+    whisper.decode = decode
+    whisper.DecodingOptions = lambda **kwargs: types.SimpleNamespace(**kwargs)
+    whisper.tokenizer = types.ModuleType("whisper.tokenizer")
+    whisper.tokenizer.get_tokenizer = lambda *args, **kwargs: FakeTokenizer()
+    torch = types.ModuleType("torch")
+    torch.from_numpy = lambda array: array
+    return {"whisper": whisper, "whisper.tokenizer": whisper.tokenizer, "torch": torch}
+
+
+class TranscribeResumableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="raio-transcribe-test-")
+        self.checkpoint = TranscriptionCheckpoint(os.path.join(self.directory, "checkpoint.jsonl"))
+        # 70 s de áudio; o valor de cada amostra é o seu tempo (nunca zero)
+        self.audio = (np.arange(70 * PCM_SAMPLE_RATE, dtype=np.float32) + 1) / PCM_SAMPLE_RATE
+        self.model = types.SimpleNamespace(
+            dims=types.SimpleNamespace(n_mels=80), is_multilingual=True, num_languages=99
+        )
+        self.calls = []
+        patcher = mock.patch.dict(sys.modules, fake_whisper(self.calls))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def transcribe(self, progress_callback=None):
+        return transcribe_resumable(self.model, self.audio, {}, self.checkpoint, progress_callback)
+
+    def test_windows_advance_to_last_closed_timestamp(self):
+        result = self.transcribe()
+        self.assertEqual([call[0] for call in self.calls], [0.0, 25.0, 50.0])
+        self.assertEqual(
+            [(round(segment["start"], 2), round(segment["end"], 2)) for segment in result["segments"]],
+            [(0, 10), (10, 20), (20, 25), (25, 35), (35, 45), (45, 50), (50, 70)]
+        )
+        self.assertEqual([segment["id"] for segment in result["segments"]], list(range(7)))
+        self.assertEqual(result["language"], "pt")
+        # O texto das janelas anteriores é o prompt da seguinte
+        self.assertIsNone(self.calls[0][1])
+        self.assertEqual(self.calls[1][1], " s0 s10 s20")
+
+    def test_each_window_is_checkpointed(self):
+        self.transcribe()
+        _, position, language = self.checkpoint.load()
+        self.assertAlmostEqual(position, 70.0)
+        self.assertEqual(language, "pt")
+        with open(self.checkpoint.path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_cancelled_transcription_resumes_from_last_window(self):
+        def cancel_after_second_window(fraction):
+            if len(self.calls) == 2:
+                raise TranscriptionCancelled()
+
+        with self.assertRaises(TranscriptionCancelled):
+            self.transcribe(cancel_after_second_window)
+        _, position, _ = self.checkpoint.load()
+        self.assertAlmostEqual(position, 50.0)
+
+        self.calls.clear()
+        result = self.transcribe()
+        self.assertEqual([call[0] for call in self.calls], [50.0])
+        self.assertEqual(len(result["segments"]), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()